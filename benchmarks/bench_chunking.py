@@ -0,0 +1,58 @@
+﻿"""Benchmark the outbound formatting stage (clean + word-aware chunking) on admin replies.
+
+    python benchmarks/bench_chunking.py --iterations 5000 --limit 200
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from crcon.formatting import clean_for_game, format_admin_reply
+
+# Typical pieces of admin replies, with the Discord markup admins actually use
+PHRASES = [
+    "Bonjour,", "merci pour ton signalement.", "**On regarde ça tout de suite.**",
+    "Le joueur <@&123456789012345678> a été averti.", "Peux-tu nous donner le nom exact du joueur ?",
+    "Rappel : le teamkill volontaire est interdit sur le serveur.",
+    "Lis les [règles du serveur](https://example.org/regles) avant de rejoindre une escouade.",
+    "Merci <:salute:112233445566778899> !", "`!admin` reste dispo si besoin.",
+    "> Il détruit nos garnisons depuis 10 minutes", "Le chef d'escouade doit rester en vocal.",
+    "~~Kick~~ Avertissement pour cette fois.", "Si ça recommence, ban temporaire de 24 h.",
+    "Bonne partie et à bientôt sur le serveur !",
+]
+
+def make_reply(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(PHRASES))
+    return " ".join(words)
+
+def legacy(text: str, limit: int) -> list:
+    """Previous behaviour: one raw message, cut by the game at the limit"""
+    return [f"[ADMIN]: {text}"[:limit]]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--iterations", type=int, default=5000)
+    ap.add_argument("--limit", type=int, default=200)
+    args = ap.parse_args()
+
+    rng = random.Random(42)
+    print(f"limit={args.limit} chars, {args.iterations} iterations per length\n")
+    print(f"{'reply':>7} {'µs/format':>10} {'chunks':>7} {'delivered':>10} {'legacy lost':>12}")
+    for length in (40, 120, 200, 400, 800, 1500):
+        reply = make_reply(rng, length)
+        seconds = timeit.timeit(lambda: format_admin_reply(reply, args.limit), number=args.iterations)
+        chunks = format_admin_reply(reply, args.limit)
+        assert all(len(c) <= args.limit for c in chunks)
+        cleaned = clean_for_game(reply)
+        delivered = sum(len(c.split(": ", 1)[1]) for c in chunks)
+        lost = max(0, len(f"[ADMIN]: {reply}") - len(legacy(reply, args.limit)[0]))
+        print(f"{len(reply):>7} {seconds / args.iterations * 1e6:>10.1f} {len(chunks):>7} "
+              f"{delivered:>5}/{len(cleaned):<4} {lost:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+﻿"""Measure the memory cost of the Discord client profile on a large synthetic guild.
+
+Each profile runs in a fresh subprocess: the client comes from DiscordBot.build_client
+(lean) or is built as the bot used to (Intents.default() + message content), then synthetic
+gateway events are fed to its connection state: one large GUILD_CREATE followed by a
+stream of MESSAGE_CREATE events across the guild's text channels and forum threads.
+
+    python benchmarks/bench_discord_memory.py --members 5000 --messages 50000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+class BenchConfig(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+def rss_kib() -> int:
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def make_bot(profile: str):
+    import discord
+    from discord.ext import commands
+    from discord_bot.bot import DiscordBot
+    if profile == 'lean':
+        return DiscordBot.build_client(BenchConfig())
+    # The client as the bot built it before the lean profile
+    intents = discord.Intents.default()
+    intents.message_content = True
+    return commands.Bot(command_prefix='!', intents=intents)
+
+def user(i: int) -> dict:
+    return {'id': str(100_000 + i), 'username': f'membre{i}', 'discriminator': '0',
+            'global_name': f'Membre {i}', 'avatar': None}
+
+def guild_payload(members: int, channels: int, threads: int) -> dict:
+    text = [{'id': str(1000 + c), 'type': 0, 'name': f'salon-{c}', 'position': c,
+             'permission_overwrites': [], 'guild_id': '10'} for c in range(channels)]
+    forum = {'id': '999', 'type': 15, 'name': 'tickets-admin', 'position': 0,
+             'permission_overwrites': [], 'available_tags': [], 'guild_id': '10'}
+    thread_list = [{'id': str(50_000 + t), 'type': 11, 'name': f'2026-10-17 21:00 - Joueur{t}',
+                    'parent_id': '999', 'owner_id': '1', 'guild_id': '10',
+                    'thread_metadata': {'archived': False, 'auto_archive_duration': 1440,
+                                        'archive_timestamp': '2026-10-17T21:00:00+00:00', 'locked': False},
+                    'message_count': 5, 'member_count': 3} for t in range(threads)]
+    return {
+        'id': '10', 'name': 'Serveur HLL', 'owner_id': '1', 'roles': [{'id': '10', 'name': '@everyone',
+                'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'emojis': [], 'stickers': [], 'features': [], 'member_count': members, 'large': True,
+        'channels': [forum] + text, 'threads': thread_list, 'voice_states': [], 'presences': [],
+        'members': [{'user': user(i), 'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00',
+                     'deaf': False, 'mute': False, 'flags': 0} for i in range(min(members, 1000))],
+    }
+
+def message_payload(i: int, channel_id: str, members: int) -> dict:
+    author = user(i % members)
+    return {
+        'id': str(10**17 + i), 'channel_id': channel_id, 'guild_id': '10', 'author': author,
+        'member': {'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0},
+        'content': f"message {i} " + "texte de discussion " * 6, 'timestamp': '2026-10-17T21:00:00+00:00',
+        'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+        'mention_roles': [], 'attachments': [], 'pinned': False, 'type': 0,
+        'embeds': [{'title': 'Réponse du joueur', 'description': 'ligne ' * 20}] if i % 5 == 0 else [],
+    }
+
+async def run_profile(args) -> dict:
+    # Import before measuring so module import cost is not counted
+    make_bot(args.profile)
+    gc.collect()
+    base = rss_kib()
+    tracemalloc.start()
+    bot = make_bot(args.profile)
+    # What login() does before any gateway event can be dispatched
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.parse_ready({'user': {**user(0), 'id': '1', 'bot': True}, 'guilds': [{'id': '10', 'unavailable': True}],
+                       'session_id': 'bench', 'application': {'id': '1', 'flags': 0}})
+    state.parse_guild_create(guild_payload(args.members, args.channels, args.threads))
+    channel_ids = [str(1000 + c) for c in range(args.channels)] + [str(50_000 + t) for t in range(args.threads)]
+    for i in range(args.messages):
+        state.parse_message_create(message_payload(i, channel_ids[i % len(channel_ids)], args.members))
+        if i % 200 == 0:
+            # Let the dispatched on_message handlers run, as the gateway loop would
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.1)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    guild = bot.get_guild(10)
+    return {
+        'profile': args.profile, 'rss_delta_kib': rss_kib() - base, 'traced_kib': current // 1024,
+        'cached_messages': len(state._messages or []), 'cached_members': len(guild.members) if guild else 0,
+        'cached_users': len(state._users),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--members", type=int, default=5000)
+    ap.add_argument("--channels", type=int, default=60)
+    ap.add_argument("--threads", type=int, default=200)
+    ap.add_argument("--messages", type=int, default=50000)
+    ap.add_argument("--profile", choices=["default", "lean"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.profile:
+        print(json.dumps(asyncio.run(run_profile(args))))
+        return
+
+    print(f"{args.members} members, {args.channels} text channels, {args.threads} forum threads, "
+          f"{args.messages} messages\n")
+    for profile in ("default", "lean"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--profile", profile, "--members", str(args.members),
+             "--channels", str(args.channels), "--threads", str(args.threads), "--messages", str(args.messages)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{profile:<8} rss +{r['rss_delta_kib'] / 1024:6.1f} MiB  traced {r['traced_kib'] / 1024:6.1f} MiB  "
+              f"messages={r['cached_messages']:<5} members={r['cached_members']:<5} users={r['cached_users']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+﻿"""Compare in-game message latency: direct RCON pool vs the CRCON HTTP API.
+
+Both paths run against local stand-ins with the same simulated server latency:
+    python benchmarks/bench_rcon_latency.py --messages 200 --latency-ms 2
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from aiohttp import web
+
+from crcon.client import CRCONClient
+from crcon.rcon_stub import StubRconServer
+
+class BenchConfig:
+    def __init__(self, values: dict):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+def make_players(count: int) -> dict:
+    return {f"Player {i:03d}": f"7656119800000{i:04d}" for i in range(count)}
+
+async def start_crcon_stub(players: dict, latency: float) -> web.AppRunner:
+    async def live_game_stats(request):
+        await asyncio.sleep(latency)
+        stats = [{"player": name, "player_id": pid, "side": "allies"} for name, pid in players.items()]
+        return web.json_response({"result": {"stats": stats}})
+
+    async def message_player(request):
+        await asyncio.sleep(latency)
+        await request.json()
+        return web.json_response({"result": "SUCCESS", "failed": False})
+
+    app = web.Application()
+    app.router.add_get("/api/get_live_game_stats", live_game_stats)
+    app.router.add_post("/api/message_player", message_player)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+async def time_sends(client: CRCONClient, names: list, concurrency: int) -> list:
+    sem = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(name):
+        async with sem:
+            start = time.perf_counter()
+            ok = await client.send_message_to_player(name, "Votre ticket admin a bien été reçu !")
+            timings.append(time.perf_counter() - start)
+            assert ok, name
+
+    await asyncio.gather(*(one(n) for n in names))
+    return timings
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} n={len(timings):<5} mean={statistics.mean(timings) * 1000:7.2f}ms "
+          f"p50={statistics.median(timings) * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms")
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--messages", type=int, default=200)
+    ap.add_argument("--players", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=2.0)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--pool-size", type=int, default=4)
+    args = ap.parse_args()
+
+    latency = args.latency_ms / 1000
+    players = make_players(args.players)
+    names = [list(players)[i % len(players)] for i in range(args.messages)]
+
+    rcon_server = StubRconServer(password="bench", players=players, latency=latency)
+    await rcon_server.start()
+    runner = await start_crcon_stub(players, latency)
+    http_port = runner.addresses[0][1]
+
+    http_client = CRCONClient(BenchConfig({
+        "crcon.base_url": f"http://127.0.0.1:{http_port}",
+        "crcon.api_token": "bench",
+    }))
+    rcon_client = CRCONClient(BenchConfig({
+        "crcon.base_url": f"http://127.0.0.1:{http_port}",
+        "crcon.api_token": "bench",
+        "rcon.enabled": True,
+        "rcon.host": "127.0.0.1",
+        "rcon.port": rcon_server.port,
+        "rcon.password": "bench",
+        "rcon.pool_size": args.pool_size,
+    }))
+    try:
+        await rcon_client.rcon_pool.start()
+        report("crcon-http", await time_sends(http_client, names, args.concurrency))
+        report("rcon-pool", await time_sends(rcon_client, names, args.concurrency))
+    finally:
+        await http_client.close_session()
+        await rcon_client.close_session()
+        await runner.cleanup()
+        await rcon_server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+﻿"""Benchmark RCON roster parsing over 100-player get playerids / get players responses.
+
+    python benchmarks/bench_rcon_parsers.py --iterations 20000
+
+Compares against the parser this replaced (copied verbatim from the baseline
+commit). The game server answers with a single count-prefixed, tab-separated
+line, which the baseline split on '\\n' and read as one player: its record count
+is printed so that is visible. The gain is memory per roster, measured against
+the baseline's record shape (one name/team/role/steam_id dict per player) filled
+with the same 100 players; parse times are printed as measured.
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from crcon.commands import RconCommands
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+def baseline_parse_players_response(response: str) -> list:
+    """RconCommands.parse_players_response as of the baseline commit (f79bbb9)"""
+    players = []
+    if not response:
+        return players
+    
+    lines = response.strip().split('\n')
+    for line in lines:
+        if line.strip() and not line.startswith('Name:'):
+            # Parse player info - format may vary
+            # Example: "PlayerName [Team] [Role] [Steam64ID]"
+            parts = line.split('\t') if '\t' in line else [line]
+            if parts:
+                player_info = {
+                    'name': parts[0].strip(),
+                    'team': parts[1].strip() if len(parts) > 1 else '',
+                    'role': parts[2].strip() if len(parts) > 2 else '',
+                    'steam_id': parts[3].strip() if len(parts) > 3 else ''
+                }
+                players.append(player_info)
+    
+    return players
+
+def baseline_shape(response: str) -> list:
+    """The same players the new parser finds, held in the baseline's dict shape"""
+    return [{'name': p.name, 'team': '', 'role': '', 'steam_id': p.player_id or ''}
+            for p in RconCommands.iter_players(response)]
+
+def retained_bytes(func, payload: str) -> int:
+    """Bytes held by the parse result: list, records and their distinct strings"""
+    # Walked with getsizeof rather than tracemalloc: dicts reused from CPython's
+    # free list are not seen as new allocations
+    result = func(payload)
+    seen = set()
+    total = sys.getsizeof(result)
+    for record in result:
+        total += sys.getsizeof(record)
+        values = record.values() if isinstance(record, dict) else (record.name, record.player_id)
+        for value in values:
+            if value is not None and id(value) not in seen:
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+    return total
+
+def run(label: str, func, payload: str, iterations: int):
+    records = len(func(payload))
+    held = retained_bytes(func, payload)
+    if iterations:
+        seconds = timeit.timeit(lambda: func(payload), number=iterations)
+        timing = f"{seconds / iterations * 1e6:8.2f} µs/parse"
+    else:
+        timing = f"{'-':>8}"
+    print(f"{label:<34} {timing}  records={records:<4d} retained={held / 1024:6.1f} KiB")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iterations", type=int, default=20000)
+    args = ap.parse_args()
+
+    playerids = (FIXTURES / "playerids_100.txt").read_text(encoding="utf-8")
+    players = (FIXTURES / "players_100.txt").read_text(encoding="utf-8")
+
+    print(f"{args.iterations} iterations\n")
+    run("baseline parser (playerids)", baseline_parse_players_response, playerids, args.iterations)
+    run("current parser (playerids)", RconCommands.parse_players_response, playerids, args.iterations)
+    run("baseline dict shape (playerids)", baseline_shape, playerids, 0)
+    print()
+    run("baseline parser (players)", baseline_parse_players_response, players, args.iterations)
+    run("current parser (players)", RconCommands.parse_players_response, players, args.iterations)
+    run("baseline dict shape (players)", baseline_shape, players, 0)
+
+if __name__ == "__main__":
+    main()
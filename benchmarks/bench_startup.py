@@ -0,0 +1,164 @@
+﻿"""Startup time: cold imports and time-to-first-ticket-ready against stubbed services.
+
+Cold imports are timed in fresh interpreters (and crcon.client is checked not to pull in
+discord.py). The in-process part follows main.py's sequence: the CRCON client starts
+probing and connecting the WS stream while discord_bot.bot is imported off the loop, then
+a stub Discord login fires on_ready (forum tags + warm start). "Ticket-ready" is when the
+CRCON client starts dispatching frames (CRCONClient.streaming).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --probe-ms 150 --ws-ms 200 --login-ms 800 --warm-ms 300
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import io
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+FORUM_ID = 1000
+
+class BenchConfig:
+    def __init__(self, values: dict):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+def cold_import(module: str) -> tuple:
+    """(seconds, discord imported?) for importing module in a fresh interpreter"""
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t, 'discord' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True, check=True)
+    seconds, has_discord = out.stdout.split()
+    return float(seconds), has_discord == "True"
+
+async def start_crcon_stub(probe: float, ws: float):
+    from aiohttp import web
+
+    def result(value):
+        return web.json_response({"result": value, "failed": False})
+
+    async def status(request):
+        await asyncio.sleep(probe)
+        return result({"name": "bench"})
+
+    async def context(request):
+        await asyncio.sleep(probe)
+        return result({})
+
+    async def ws_logs(request):
+        await asyncio.sleep(ws)
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        async for _ in socket:
+            pass
+        return socket
+
+    app = web.Application()
+    app.router.add_get("/api/get_status", status)
+    for endpoint in ("get_gamestate", "get_map", "get_team_view"):
+        app.router.add_get(f"/api/{endpoint}", context)
+    app.router.add_get("/ws/logs", ws_logs)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+async def run(args) -> dict:
+    runner = await start_crcon_stub(args.probe_ms / 1000, args.ws_ms / 1000)
+    port = runner.addresses[0][1]
+    config = BenchConfig({
+        'crcon.base_url': f"http://127.0.0.1:{port}",
+        'crcon.api_token': "bench",
+        'discord.token': "bench",
+        'discord.admin_channel_id': FORUM_ID,
+        'state.dir': tempfile.mkdtemp(prefix="bench-startup-"),
+    })
+    marks = {}
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        started = time.perf_counter()
+        from crcon.client import CRCONClient
+        client = CRCONClient(config)
+        monitor = asyncio.create_task(client.start_monitoring())
+
+        bot_module = await asyncio.to_thread(importlib.import_module, 'discord_bot.bot')
+        marks['discord_imported'] = time.perf_counter() - started
+        import discord
+
+        class StubGuild:
+            async def active_threads(self):
+                await asyncio.sleep(args.warm_ms / 1000)
+                return []
+
+        class StubTag:
+            def __init__(self, name, tag_id):
+                self.name, self.id = name, tag_id
+
+        class StubForum(discord.ForumChannel):
+            available_tags = [StubTag(n, i) for i, n in enumerate(('NEW', 'REPLIED', 'CLOSED'), 1)]
+            threads = []
+            guild = StubGuild()
+            id = FORUM_ID
+            name = "admin-forum"
+
+            def __init__(self):
+                pass
+
+        forum = StubForum()
+        bot = bot_module.DiscordBot(config, client)
+        bot.bot.get_channel = lambda cid: forum if cid == FORUM_ID else None
+
+        async def login(token):
+            await asyncio.sleep(args.login_ms / 1000)
+            marks['discord_logged_in'] = time.perf_counter() - started
+            await bot.bot.on_ready()
+            await asyncio.Event().wait()
+
+        bot.bot.start = login
+        discord_task = asyncio.create_task(bot.start())
+        await asyncio.wait_for(client.streaming.wait(), 30)
+        marks['ticket_ready'] = time.perf_counter() - started
+
+        client.stop_monitoring()
+        for task in (monitor, discord_task):
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+        await bot.scheduler.stop()
+        await bot.outbox.stop()
+        await client.close_session()
+    await runner.cleanup()
+    return marks
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--probe-ms", type=float, default=100, help="CRCON REST latency (probe, context)")
+    ap.add_argument("--ws-ms", type=float, default=150, help="WS handshake latency")
+    ap.add_argument("--login-ms", type=float, default=600, help="Discord login + gateway READY")
+    ap.add_argument("--warm-ms", type=float, default=200, help="warm start thread listing")
+    args = ap.parse_args()
+
+    crcon_import, crcon_pulls_discord = cold_import("crcon.client")
+    bot_import, _ = cold_import("discord_bot.bot")
+    print(f"cold import crcon.client:    {crcon_import * 1000:.0f} ms (imports discord.py: {crcon_pulls_discord})")
+    print(f"cold import discord_bot.bot: {bot_import * 1000:.0f} ms")
+
+    logging.disable(logging.ERROR)
+    marks = asyncio.run(run(args))
+    serial = bot_import + args.probe_ms / 1000 + args.login_ms / 1000 + args.warm_ms / 1000 + args.ws_ms / 1000
+    for name, seconds in marks.items():
+        print(f"{name + ':':<22} {seconds * 1000:.0f} ms")
+    print(f"serial sum of the same steps: {serial * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+﻿"""Ticket creation path (handle_admin_request) against stubbed Discord and CRCON REST.
+
+Opens N tickets for distinct players through a real DiscordBot whose forum, threads
+and messages are the replay stubs, and whose CRCON API is the replay aiohttp stub.
+Reports per-ticket latency, the Discord/CRCON REST calls per ticket and how many
+channel-cache lookups the bot made (the routing context resolves the forum once).
+
+    python benchmarks/bench_ticket_creation.py --tickets 200
+    python benchmarks/bench_ticket_creation.py --tickets 200 --discord-latency-ms 40 --crcon-latency-ms 15
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from replay_capture import FORUM_ID, BenchConfig, StubDiscord, StubForum, start_crcon_stub
+from crcon.client import CRCONClient
+from discord_bot.bot import DiscordBot
+
+async def run(args) -> dict:
+    roster = {f"Joueur{i:04d}": f"7656119{8000000000 + i:010d}" for i in range(args.tickets)}
+    crcon_calls: Counter = Counter()
+    runner = await start_crcon_stub(roster, args.crcon_latency_ms / 1000, crcon_calls)
+    port = runner.addresses[0][1]
+    config = BenchConfig({
+        'crcon.base_url': f"http://127.0.0.1:{port}",
+        'crcon.api_token': "bench",
+        'discord.admin_channel_id': FORUM_ID,
+        'discord.admin_roles': (111, 222),
+        'state.dir': tempfile.mkdtemp(prefix="bench-tickets-"),
+        # Keep every ticket on the normal (pinging) path
+        'surge.threshold': args.tickets + 1,
+    })
+
+    stub = StubDiscord(args.discord_latency_ms / 1000)
+    forum = StubForum(stub)
+    client = CRCONClient(config)
+    bot = DiscordBot(config, client)
+    lookups = Counter()
+
+    def get_channel(cid):
+        lookups['get_channel'] += 1
+        return forum if cid == FORUM_ID else stub.threads.get(cid)
+
+    bot.bot.get_channel = get_channel
+    bot.rebuild_routing()
+    lookups.clear()
+    bot.outbox.start()
+
+    latencies = []
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        # Warm the shared game context and roster caches like a running bot would have
+        await client.game_context.get_context()
+        crcon_calls.clear()
+        start = time.perf_counter()
+        for name in roster:
+            t0 = time.perf_counter()
+            await bot.handle_admin_request(name, "un joueur tue toute l'escouade")
+            latencies.append(time.perf_counter() - t0)
+        total = time.perf_counter() - start
+        deadline = time.monotonic() + 10
+        while len(bot.outbox) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    await bot.outbox.stop()
+    await client.close_session()
+    await runner.cleanup()
+
+    return {
+        'tickets': stub.calls['forum.create_thread'],
+        'total': total,
+        'latencies': latencies,
+        'discord_calls': dict(stub.calls),
+        'crcon_calls': dict(crcon_calls),
+        'lookups': dict(lookups),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tickets", type=int, default=200)
+    ap.add_argument("--discord-latency-ms", type=float, default=0)
+    ap.add_argument("--crcon-latency-ms", type=float, default=0)
+    args = ap.parse_args()
+    logging.disable(logging.ERROR)
+
+    result = asyncio.run(run(args))
+    n = max(result['tickets'], 1)
+    lat = sorted(result['latencies'])
+    print(f"tickets: {result['tickets']} in {result['total']:.2f}s ({result['tickets'] / result['total']:.0f}/s)")
+    print(f"per ticket: median {statistics.median(lat) * 1000:.2f} ms, "
+          f"p95 {lat[int(len(lat) * 0.95) - 1] * 1000:.2f} ms, max {lat[-1] * 1000:.2f} ms")
+    print(f"discord REST/ticket: {sum(result['discord_calls'].values()) / n:.2f}  {dict(sorted(result['discord_calls'].items()))}")
+    print(f"crcon REST/ticket:   {sum(result['crcon_calls'].values()) / n:.2f}  {dict(sorted(result['crcon_calls'].items()))}")
+    print(f"channel cache lookups/ticket: {result['lookups'].get('get_channel', 0) / n:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+﻿"""Replay captured CRCON WebSocket frames through the real classification/dispatch path.
+
+Frames recorded with crcon.capture_dir are fed to CRCONClient.handle_ws_frame (with the
+capture's receive time as the classification clock) and dispatched into a real DiscordBot
+wired to stubbed Discord objects and a stub CRCON HTTP API. Reports throughput, tickets
+and the REST calls each side would have received.
+
+    python benchmarks/replay_capture.py benchmarks/fixtures/ws_capture_sample.jsonl.gz --speed max
+    python benchmarks/replay_capture.py /srv/captures --speed 10
+    python benchmarks/replay_capture.py FIXTURE --speed max --check FIXTURE_expected.json
+    python benchmarks/replay_capture.py --make-sample benchmarks/fixtures/ws_capture_sample.jsonl.gz
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import io
+import itertools
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import discord
+from aiohttp import web
+
+from crcon.capture import read_frames
+from crcon.client import CRCONClient
+from discord_bot.bot import DiscordBot
+
+FORUM_ID = 1000
+
+class BenchConfig:
+    def __init__(self, values: dict):
+        self.values = values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+# --- Stub Discord -------------------------------------------------------------
+
+class StubDiscord:
+    """Shared id source, simulated REST latency and per-call counters"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.ids = itertools.count(10_000)
+        self.calls = Counter()
+        self.threads = {}
+
+    async def call(self, name: str):
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class StubTag:
+    def __init__(self, name: str, tag_id: int):
+        self.name = name
+        self.id = tag_id
+
+class StubMessage:
+    def __init__(self, stub: StubDiscord, channel, embed=None, content=None):
+        self.stub = stub
+        self.id = next(stub.ids)
+        self.channel = channel
+        self.content = content
+        self.embeds = [embed] if embed is not None else []
+        self.components = []
+
+    async def edit(self, **kwargs):
+        await self.stub.call('message.edit')
+        if kwargs.get('embed') is not None:
+            self.embeds = [kwargs['embed']]
+        return self
+
+    async def delete(self):
+        await self.stub.call('message.delete')
+
+    async def add_reaction(self, emoji):
+        await self.stub.call('message.add_reaction')
+
+    async def remove_reaction(self, emoji, member):
+        await self.stub.call('message.remove_reaction')
+
+    async def pin(self):
+        await self.stub.call('message.pin')
+
+class StubThread:
+    def __init__(self, stub: StubDiscord, parent, name: str, applied_tags):
+        self.stub = stub
+        self.parent = parent
+        self.id = next(stub.ids)
+        self.name = name
+        self.applied_tags = list(applied_tags or [])
+        self.archived = False
+        self.created_at = datetime.now(timezone.utc)
+        stub.threads[self.id] = self
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        await self.stub.call('thread.send')
+        return StubMessage(self.stub, self, embed=embed, content=content)
+
+    async def edit(self, **kwargs):
+        await self.stub.call('thread.edit')
+        if 'applied_tags' in kwargs:
+            self.applied_tags = list(kwargs['applied_tags'])
+        if kwargs.get('archived'):
+            self.archived = True
+
+    def get_partial_message(self, message_id: int):
+        message = StubMessage(self.stub, self)
+        message.id = message_id
+        return message
+
+    async def fetch_message(self, message_id: int):
+        await self.stub.call('thread.fetch_message')
+        return self.get_partial_message(message_id)
+
+class StubForum(discord.ForumChannel):
+    """Passes the bot's isinstance(ForumChannel) checks; only what the ticket path uses"""
+
+    available_tags = [StubTag(name, i) for i, name in enumerate(('NEW', 'REPLIED', 'CLOSED'), 1)]
+
+    def __init__(self, stub: StubDiscord):
+        self.stub = stub
+
+    @property
+    def id(self):
+        return FORUM_ID
+
+    @property
+    def name(self):
+        return "admin-forum"
+
+    async def create_thread(self, name, content=None, embed=None, applied_tags=None, view=None, **kwargs):
+        await self.stub.call('forum.create_thread')
+        thread = StubThread(self.stub, self, name, applied_tags)
+        return thread, StubMessage(self.stub, thread, embed=embed, content=content)
+
+# --- Stub CRCON API -----------------------------------------------------------
+
+async def start_crcon_stub(roster: dict, latency: float, calls: Counter) -> web.AppRunner:
+    @web.middleware
+    async def count(request, handler):
+        calls[request.path.rsplit('/', 1)[-1]] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await handler(request)
+
+    def result(value):
+        return web.json_response({"result": value, "failed": False})
+
+    async def status(request):
+        return result({"name": "replay"})
+
+    async def live_game_stats(request):
+        stats = [{"player": name, "player_id": pid, "side": "allies" if i % 2 else "axis"}
+                 for i, (name, pid) in enumerate(roster.items())]
+        return result({"stats": stats})
+
+    async def message_player(request):
+        await request.json()
+        return result("SUCCESS")
+
+    async def gamestate(request):
+        return result({"allied_score": 2, "axis_score": 3, "time_remaining": 2712,
+                       "current_map": {"id": "stmereeglise_warfare", "pretty_name": "St. Mère Église"}})
+
+    async def current_map(request):
+        return result({"id": "stmereeglise_warfare", "pretty_name": "St. Mère Église"})
+
+    async def team_view(request):
+        players = [{"name": name, "player_id": pid} for name, pid in roster.items()]
+        return result({
+            "allies": {"squads": {"able": {"players": players[0::2]}}},
+            "axis": {"squads": {"baker": {"players": players[1::2]}}},
+        })
+
+    async def profile(request):
+        return result({"total_playtime_seconds": 360000, "sessions_count": 120, "penalty_count": {}})
+
+    app = web.Application(middlewares=[count])
+    app.router.add_get("/api/get_status", status)
+    app.router.add_get("/api/get_live_game_stats", live_game_stats)
+    app.router.add_post("/api/message_player", message_player)
+    app.router.add_get("/api/get_gamestate", gamestate)
+    app.router.add_get("/api/get_map", current_map)
+    app.router.add_get("/api/get_team_view", team_view)
+    app.router.add_get("/api/get_player_profile", profile)
+    app.router.add_get("/api/get_detailed_player_info", profile)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+# --- Replay -------------------------------------------------------------------
+
+def capture_roster(frames: list) -> dict:
+    """Everyone who chatted in the capture is 'connected' for the stub roster"""
+    roster = {}
+    for _, raw in frames:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        for entry in data.get('logs') or []:
+            log = entry.get('log') or {}
+            name = log.get('player_name_1')
+            if name and name not in roster:
+                roster[name] = log.get('player_id_1') or f"7656119{len(roster):010d}"
+    return roster
+
+async def drain(bot: DiscordBot, timeout: float):
+    """Wait for coalescing buffers and the outbound queue to settle"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        busy = any(not t.done() for t in bot.response_flush_tasks.values()) or len(bot.outbox)
+        if not busy:
+            return
+        await asyncio.sleep(0.05)
+
+async def replay(args) -> dict:
+    frames = list(read_frames(args.capture))
+    if not frames:
+        raise SystemExit("No frames found in capture")
+    roster = capture_roster(frames)
+
+    crcon_calls: Counter = Counter()
+    runner = await start_crcon_stub(roster, args.crcon_latency_ms / 1000, crcon_calls)
+    port = runner.addresses[0][1]
+    state_dir = tempfile.mkdtemp(prefix="replay-")
+    config = BenchConfig({
+        'crcon.base_url': f"http://127.0.0.1:{port}",
+        'crcon.api_token': "replay",
+        'discord.admin_channel_id': FORUM_ID,
+        'state.dir': state_dir,
+        'outbound.retry_base_seconds': 0.1,
+    })
+
+    stub = StubDiscord(args.discord_latency_ms / 1000)
+    forum = StubForum(stub)
+    client = CRCONClient(config)
+    bot = DiscordBot(config, client)
+    bot.bot.get_channel = lambda cid: forum if cid == FORUM_ID else stub.threads.get(cid)
+    bot.rebuild_routing()
+
+    # Classification counts (deterministic for a given capture)
+    counts = Counter()
+    admin_cb, response_cb, catchup_cb = client.message_callback, client.player_response_callback, client.catchup_callback
+
+    async def on_admin(player_name, message):
+        counts['admin_requests'] += 1
+        await admin_cb(player_name, message)
+
+    async def on_response(player_name, message, event_time):
+        counts['player_lines'] += 1
+        await response_cb(player_name, message, event_time)
+
+    async def on_catchup(digests):
+        counts['catchup_players'] += len(digests)
+        counts['catchup_lines'] += sum(len(lines) for lines in digests.values())
+        await catchup_cb(digests)
+
+    client.set_message_callback(on_admin)
+    client.set_player_response_callback(on_response)
+    client.set_catchup_callback(on_catchup)
+    bot.outbox.start()
+
+    entries = 0
+    start = time.perf_counter()
+    quiet = io.StringIO() if not args.verbose else None
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        first_t = frames[0][0]
+        for t, raw in frames:
+            if args.speed != 'max':
+                delay = (t - first_t) / float(args.speed) - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                entries += len(json.loads(raw).get('logs') or [])
+            except (ValueError, AttributeError):
+                pass
+            await client.handle_ws_frame(raw, now=t)
+        dispatched = time.perf_counter() - start
+        await drain(bot, args.drain_timeout)
+    total = time.perf_counter() - start
+
+    await bot.outbox.stop()
+    await client.close_session()
+    await runner.cleanup()
+
+    counts['frames'] = len(frames)
+    counts['entries'] = entries
+    counts['tickets'] = stub.calls['forum.create_thread']
+    return {
+        'counts': dict(counts),
+        'dispatch_seconds': dispatched,
+        'total_seconds': total,
+        'capture_seconds': frames[-1][0] - first_t,
+        'discord_calls': dict(stub.calls),
+        'crcon_calls': dict(crcon_calls),
+        'outbox': bot.outbox.stats(),
+    }
+
+def report(result: dict, speed: str):
+    counts = result['counts']
+    print(f"capture: {counts['frames']} frames / {counts['entries']} log entries "
+          f"over {result['capture_seconds'] / 60:.1f} min, replayed at {speed}")
+    print(f"dispatch: {result['dispatch_seconds']:.2f}s "
+          f"({counts['entries'] / max(result['dispatch_seconds'], 1e-9):.0f} entries/s), "
+          f"settled after {result['total_seconds']:.2f}s")
+    print(f"tickets: {counts.get('tickets', 0)}  admin requests: {counts.get('admin_requests', 0)}  "
+          f"player lines: {counts.get('player_lines', 0)}  "
+          f"catch-up: {counts.get('catchup_lines', 0)} line(s) / {counts.get('catchup_players', 0)} player(s)")
+    print(f"discord REST: {sum(result['discord_calls'].values())}  {dict(sorted(result['discord_calls'].items()))}")
+    print(f"crcon REST:   {sum(result['crcon_calls'].values())}  {dict(sorted(result['crcon_calls'].items()))}")
+    print(f"outbox: {result['outbox']}")
+
+# --- Sample capture -----------------------------------------------------------
+
+CHAT = [
+    "gg", "qui a un camion ?", "garnison posée au nord", "merci le SL", "on attaque le point",
+    "char ennemi à l'est", "besoin de munitions", "mdr", "push push", "quelqu'un en vocal ?",
+    "recon en approche", "nice", "on défend", "commandant bombarde stp", "go go go",
+]
+ADMIN = [
+    "!admin un joueur tue toute l'escouade", "!admin spawn kill en boucle", "!admin insultes dans le chat",
+    "!admin le SL ne pose pas de garnison et nous insulte", "!admin tank qui bloque la spawn",
+]
+REPLIES = ["c'est le joueur en recon", "il vient de recommencer", "merci", "ok", "toujours là", "il a quitté"]
+
+def make_sample(path: str, minutes: int, players: int, seed: int):
+    """Synthetic Saturday-night-shaped capture (busy server, a ticket storm, a reconnect backlog)"""
+    rng = random.Random(seed)
+    names = [f"Joueur{i:03d}" for i in range(players)]
+    ids = {n: f"7656119{8000000000 + i:010d}" for i, n in enumerate(names)}
+    start = datetime(2026, 10, 17, 19, 0, tzinfo=timezone.utc).timestamp()
+    seq = itertools.count(1)
+    open_tickets = set()
+    lines = []
+
+    def entry(t, name, text):
+        n = next(seq)
+        return {"id": f"{n:08d}", "log": {
+            "action": rng.choice(["CHAT[Allies][Unit]", "CHAT[Axis][Team]"]),
+            "player_name_1": name, "player_id_1": ids[name], "message": f"{text} ({ids[name]})",
+            "event_time": datetime.fromtimestamp(t, timezone.utc).isoformat(),
+        }}
+
+    t = start
+    end = start + minutes * 60
+    storm = start + minutes * 60 * 0.6
+    while t < end:
+        t += rng.expovariate(2.0)
+        batch = []
+        in_storm = storm <= t < storm + 90
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            name = rng.choice(names)
+            roll = rng.random()
+            if name in open_tickets and roll < 0.5:
+                text = rng.choice(REPLIES)
+            elif roll < (0.08 if in_storm else 0.004):
+                text = rng.choice(ADMIN)
+                open_tickets.add(name)
+            else:
+                text = rng.choice(CHAT)
+            batch.append(entry(t, name, text))
+        frame = {"last_seen_id": batch[-1]["id"], "logs": batch}
+        lines.append({"t": t + rng.uniform(0.01, 0.2), "data": json.dumps(frame, ensure_ascii=False)})
+        if rng.random() < 0.02 and len(open_tickets) > 3:
+            open_tickets.discard(rng.choice(sorted(open_tickets)))
+
+    # A reconnect halfway through delivers ten minutes of backlog in one frame
+    cut = len(lines) // 2
+    t_reconnect = lines[cut]["t"]
+    backlog = [entry(t_reconnect - 600 + i * 20, rng.choice(names),
+                     rng.choice(ADMIN) if i % 6 == 0 else rng.choice(CHAT)) for i in range(25)]
+    lines.insert(cut, {"t": t_reconnect, "data": json.dumps(
+        {"last_seen_id": backlog[-1]["id"], "logs": backlog}, ensure_ascii=False)})
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        for line in lines:
+            file.write(json.dumps(line, ensure_ascii=False) + "\n")
+    print(f"Wrote {len(lines)} frames to {path}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("capture", nargs="*", help="capture segments or directories")
+    ap.add_argument("--speed", default="max", help="'max', or a multiplier of real time (1 = as captured)")
+    ap.add_argument("--discord-latency-ms", type=float, default=0)
+    ap.add_argument("--crcon-latency-ms", type=float, default=0)
+    ap.add_argument("--drain-timeout", type=float, default=30)
+    ap.add_argument("--check", help="expected counts JSON; exit 1 on mismatch")
+    ap.add_argument("--write-expected", help="write the classification counts to this JSON file")
+    ap.add_argument("--make-sample", help="write a synthetic capture to this path and exit")
+    ap.add_argument("--minutes", type=int, default=30)
+    ap.add_argument("--players", type=int, default=90)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--verbose", action="store_true", help="keep the bot's console output")
+    args = ap.parse_args()
+
+    if args.make_sample:
+        make_sample(args.make_sample, args.minutes, args.players, args.seed)
+        return
+    if not args.capture:
+        ap.error("no capture given")
+    if args.speed != 'max':
+        float(args.speed)
+
+    logging.basicConfig(level=logging.WARNING if not args.verbose else logging.INFO)
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+    result = asyncio.run(replay(args))
+    report(result, args.speed)
+
+    counts = result['counts']
+    if args.write_expected:
+        Path(args.write_expected).write_text(json.dumps(counts, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    if args.check:
+        expected = json.loads(Path(args.check).read_text(encoding="utf-8"))
+        diff = {k: (v, counts.get(k)) for k, v in expected.items() if counts.get(k) != v}
+        if diff:
+            print(f"MISMATCH (expected, got): {diff}")
+            sys.exit(1)
+        print("counts match", args.check)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
-﻿import subprocess
+﻿import importlib
 import sys
 import os
 
 def main():
     try:
-        # Change to src directory and run main.py
-        os.chdir('src')
-        result = subprocess.run([sys.executable, 'main.py'])
-        return result.returncode
+        # Run main.py in this interpreter, from the src directory (relative config/.env paths)
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+        os.chdir(src)
+        sys.path.insert(0, src)
+        importlib.import_module('main').run(handoff='--handoff' in sys.argv[1:])
+        return 0
     except KeyboardInterrupt:
         print("\n Bot stopped by user")
         return 0
@@ -1,3 +1,4 @@
 ﻿from .client import CRCONClient
+from .rcon import RconPool
 
-__all__ = ['CRCONClient']
+__all__ = ['CRCONClient', 'RconPool']
@@ -0,0 +1,154 @@
+﻿import gzip
+import json
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class FrameRecorder:
+    """Appends raw WebSocket frames to rotating gzip segments (one JSON line per frame)
+
+    Each line is {"t": <receive time>, "data": <raw frame text>}. A segment is
+    closed after segment_bytes of frame data or segment_seconds, whichever comes
+    first; only the newest keep_segments files are kept.
+
+    write() only enqueues: serialization, gzip and disk I/O run in a writer thread so
+    the WebSocket consumer never waits on them. When the queue is full (disk stalled)
+    frames are dropped and counted rather than buffered without bound.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 segment_seconds: float = 3600, keep_segments: int = 48, max_queued: int = 10000):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.keep_segments = keep_segments
+        self._file = None
+        self._opened_at = 0.0
+        self._written = 0
+        # (stamp, rotation index) of the current segment
+        self._segment: Tuple[str, int] = ('', 0)
+        self.frames = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Tuple[float, str]]]" = queue.Queue(maxsize=max_queued)
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config) -> Optional["FrameRecorder"]:
+        directory = config.get('crcon.capture_dir')
+        if not directory:
+            return None
+        return cls(
+            directory,
+            segment_bytes=int(float(config.get('crcon.capture_segment_mb', 16)) * 1024 * 1024),
+            segment_seconds=float(config.get('crcon.capture_segment_minutes', 60)) * 60,
+            keep_segments=int(config.get('crcon.capture_keep_segments', 48)),
+        )
+
+    def write(self, data: str, received_at: Optional[float] = None):
+        received_at = time.time() if received_at is None else received_at
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ws-capture', daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((received_at, data))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"WebSocket capture falling behind, {self.dropped} frame(s) dropped")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(*item)
+        self._close_file()
+
+    def _write(self, received_at: float, data: str):
+        try:
+            if self._file is None or self._written >= self.segment_bytes or \
+                    received_at - self._opened_at >= self.segment_seconds:
+                self._rotate(received_at)
+            line = json.dumps({'t': received_at, 'data': data}, ensure_ascii=False) + "\n"
+            self._file.write(line)
+            self._written += len(line)
+            self.frames += 1
+        except Exception as e:
+            logger.error(f"WebSocket capture failed: {e}")
+
+    def _rotate(self, now: float):
+        self._close_file()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        # Always above every index used for this second, even ones already pruned:
+        # reusing a freed lower index would sort newer frames before older ones
+        used = [segment_order(p)[1] for p in self.directory.glob(f"ws-{stamp}*.jsonl.gz")]
+        if self._segment[0] == stamp:
+            used.append(self._segment[1])
+        index = max(used) + 1 if used else 0
+        self._segment = (stamp, index)
+        path = self.directory / (f"ws-{stamp}-{index}.jsonl.gz" if index else f"ws-{stamp}.jsonl.gz")
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._opened_at = now
+        self._written = 0
+        logger.info(f"WebSocket capture segment: {path}")
+
+        segments = sorted(self.directory.glob('ws-*.jsonl.gz'), key=segment_order)
+        for old in segments[:max(0, len(segments) - self.keep_segments)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def close(self, timeout: float = 5.0):
+        """Write out the queued frames, then close the segment"""
+        if self._thread is None:
+            self._close_file()
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def segment_order(path: Path) -> Tuple[str, int]:
+    """Sort key for ws-<stamp>[-<n>].jsonl.gz: stamp, then rotation index within that second"""
+    name = path.name[:-len('.jsonl.gz')] if path.name.endswith('.jsonl.gz') else path.name
+    parts = name.split('-')
+    if len(parts) == 4 and parts[3].isdigit():
+        return '-'.join(parts[:3]), int(parts[3])
+    return name, 0
+
+def capture_segments(paths: Iterable[str]) -> List[Path]:
+    """Expand files/directories into segment files, oldest first"""
+    segments: List[Path] = []
+    for item in paths:
+        path = Path(item)
+        if path.is_dir():
+            segments.extend(sorted(path.glob('*.jsonl.gz'), key=segment_order))
+        else:
+            segments.append(path)
+    return segments
+
+def read_frames(paths: Iterable[str]) -> Iterator[Tuple[float, str]]:
+    """(receive time, raw frame) from capture segments, in capture order"""
+    for segment in capture_segments(paths):
+        with gzip.open(segment, 'rt', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    yield float(record['t']), record['data']
+                except (ValueError, KeyError, TypeError):
+                    # A segment cut short by a crash ends with a partial line
+                    continue
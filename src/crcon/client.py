@@ -1,12 +1,17 @@
 ﻿import aiohttp
 import asyncio
 import logging
-from typing import Optional, Callable, Set, Dict
+from typing import Optional, Callable, Set, Dict, List, Tuple
 import json
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 import re
-import discord
-from discord.ext import commands
+from .rcon import RconPool, RconUnavailable
+from .game_context import GameContextCache
+from .profiles import PlayerProfileCache
+from .capture import FrameRecorder
+from .tracing import RequestTracer
+from utils.state import StateStore
 
 logger = logging.getLogger(__name__)
 
@@ -19,31 +24,72 @@ class CRCONClient:
         self.monitoring = False
         self.message_callback: Optional[Callable] = None
         self.player_response_callback: Optional[Callable] = None
+        self.catchup_callback: Optional[Callable] = None
         self.processed_log_ids: Set[int] = set()
         self.headers = {"Authorization": f"Bearer {self.api_token}"}
         
         # Track active admin threads - player_name -> thread info
         self.active_threads: Dict[str, dict] = {}
         
-        # WebSocket stream cursor/dedupe
-        self.ws_last_seen_id: Optional[str] = None
+        # Opened by the Discord side once open tickets are known (warm start)
+        self.dispatch_gate = asyncio.Event()
+        # Set once the WS stream is being read and dispatched (ready for tickets)
+        self.streaming = asyncio.Event()
+        # Set once a WS handshake succeeded (standby readiness, frames may still be held)
+        self.ws_connected = asyncio.Event()
+        # Last WS text frame (monotonic), for readiness checks
+        self.last_frame_at: Optional[float] = None
+        self.frames_received = 0
+
+        # WebSocket stream cursor/dedupe (cursor persisted so a restart resumes where it stopped)
+        self.state = StateStore.from_config(config)
         self.ws_seen_ids: Set[str] = set()
+        # Numeric log ids at or below this were dispatched by a previous instance
+        self.ws_floor_id: Optional[int] = None
+        self.ws_last_seen_id: Optional[str] = self._load_cursor()
+        self._cursor_saved_at = time.monotonic()
+        self._ws = None
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
         
         logger.info(f"CRCON Config - URL: {self.base_url}")
+
+        # Shared TTL/single-flight cache for gamestate, map and team view
+        self.game_context = GameContextCache(self.get_api_result, config)
+        # LRU+TTL cache of player profiles (playtime, sanctions) for ticket triage
+        self.profiles = PlayerProfileCache(self.get_api_result, config)
+
+        # Optional direct HLL RCON transport for messages and roster (None when disabled)
+        self.rcon_pool: Optional[RconPool] = RconPool.from_config(config)
+        if self.rcon_pool:
+            logger.info(f"Direct RCON enabled: {self.rcon_pool.host}:{self.rcon_pool.port}")
         
+        # Optional raw WS frame capture for replay (crcon.capture_dir)
+        self.recorder: Optional[FrameRecorder] = FrameRecorder.from_config(config)
+
+        # Per-endpoint HTTP timings (pool wait, DNS, connect, server time, size) on /metrics
+        self.tracer: Optional[RequestTracer] = RequestTracer.from_config(config)
+
         # WS-only mode: we do not poll HTTP logs anymore
         self.use_websocket_stream = True
+        # API probe started alongside the first WS connect (see start_monitoring)
+        self._probe: Optional[asyncio.Task] = None
     
     async def create_session(self):
         """Create HTTP session"""
         if not self.session:
-            self.session = aiohttp.ClientSession(headers=self.headers)
+            trace_configs = [self.tracer.trace_config()] if self.tracer else None
+            self.session = aiohttp.ClientSession(headers=self.headers, trace_configs=trace_configs)
     
     async def close_session(self):
         """Close HTTP session"""
         if self.session:
             await self.session.close()
             self.session = None
+        if self.rcon_pool:
+            await self.rcon_pool.close()
+        if self.recorder:
+            self.recorder.close()
     
     async def test_connection(self) -> bool:
         """Test API connection"""
@@ -83,55 +129,155 @@ class CRCONClient:
             print(f" CRCON: Tried to unregister {player_name} but they weren't tracked")
     
     async def send_message_to_player(self, player_name: str, message: str):
-        """Send message to player via API"""
+        """Send message to player via direct RCON when enabled, else via API"""
+        if await self._send_via_rcon(player_name, message):
+            return True
+
         try:
-            await self.create_session()
-            
             # First get player info to get player_id
-            players = await self.get_players()
-            player_id = None
-            
-            for player in players:
-                if player.get('name') == player_name:
-                    player_id = player.get('player_id') or player.get('steam_id_64')
-                    break
+            player_id = await self.resolve_player_id(player_name)
             
             if not player_id:
                 logger.warning(f"Player not found: {player_name}")
                 return False
             
-            # Use the correct endpoint: message_player
-            url = f'{self.base_url}/api/message_player'
-            data = {
-                "player_name": player_name,
-                "player_id": player_id,
-                "message": message,
-                "by": "Discord Admin"
-            }
-            
-            print(f"Sending POST to: {url}")
-            print(f"Data: {data}")
-            
-            async with self.session.post(url, json=data) as response:
-                response_text = await response.text()
-                print(f"Response status: {response.status}")
-                print(f"Response: {response_text[:200]}...")
-                
-                if response.status == 200:
-                    logger.info(f"Sent message to {player_name}: {message}")
-                    return True
-                else:
-                    logger.error(f"Failed to send message, status: {response.status}, response: {response_text}")
-                    return False
+            return await self._post_message(player_name, player_id, message)
                     
         except Exception as e:
             logger.error(f"Error sending message to {player_name}: {e}")
             import traceback
             traceback.print_exc()
             return False
+
+    async def send_messages_to_player(self, player_name: str, messages: List[str]) -> int:
+        """Send several messages to one player in order, resolving the player once
+
+        Stops at the first failure so the player never sees a gap; returns how
+        many messages were delivered.
+        """
+        player_id = None
+        for index, message in enumerate(messages):
+            if await self._send_via_rcon(player_name, message):
+                continue
+            try:
+                if player_id is None:
+                    player_id = await self.resolve_player_id(player_name)
+                    if not player_id:
+                        logger.warning(f"Player not found: {player_name}")
+                        return index
+                if not await self._post_message(player_name, player_id, message):
+                    return index
+            except Exception as e:
+                logger.error(f"Error sending message {index + 1}/{len(messages)} to {player_name}: {e}")
+                return index
+        return len(messages)
+
+    async def resolve_player_id(self, player_name: str) -> Optional[str]:
+        """player_id of a connected player, from the current roster"""
+        for player in await self.get_players():
+            if player.get('name') == player_name:
+                return player.get('player_id') or player.get('steam_id_64')
+        return None
+
+    async def get_roster(self) -> Dict[str, str]:
+        """Connected players: name -> player_id"""
+        roster = {}
+        for player in await self.get_players():
+            roster[player.get('name')] = player.get('player_id') or player.get('steam_id_64')
+        return roster
+
+    async def message_players(self, targets: List[str], message: str,
+                              roster: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Send one message to several players, resolved against a single roster snapshot
+
+        Returns player name -> 'sent', 'absent' (not on the server) or 'failed',
+        in the order of targets. Sends run concurrently, at most
+        crcon.fanout_concurrency at a time. Pass `roster` (get_roster) to reuse one
+        snapshot across several messages.
+        """
+        targets = list(dict.fromkeys(t for t in targets if t))
+        if not targets:
+            return {}
+
+        if roster is None:
+            roster = await self.get_roster()
+
+        limit = asyncio.Semaphore(int(self.config.get('crcon.fanout_concurrency', 5)))
+        results: Dict[str, str] = {}
+
+        async def deliver(name: str):
+            player_id = roster.get(name)
+            if not player_id:
+                results[name] = 'absent'
+                return
+            async with limit:
+                try:
+                    sent = await self._send_via_rcon(name, message) or \
+                        await self._post_message(name, player_id, message)
+                except Exception as e:
+                    logger.error(f"Error sending message to {name}: {e}")
+                    sent = False
+            results[name] = 'sent' if sent else 'failed'
+
+        await asyncio.gather(*(deliver(name) for name in targets))
+        sent = sum(1 for r in results.values() if r == 'sent')
+        logger.info(f"Fan-out message delivered to {sent}/{len(targets)} player(s)")
+        return {name: results[name] for name in targets}
+
+    async def _send_via_rcon(self, player_name: str, message: str) -> bool:
+        """Try the direct RCON transport; False means fall back to the CRCON API"""
+        if not self.rcon_pool:
+            return False
+        try:
+            if await self.rcon_pool.message_player(player_name, message):
+                logger.info(f"Sent message to {player_name} via RCON: {message}")
+                return True
+            logger.warning(f"RCON refused message to {player_name}, falling back to CRCON API")
+        except RconUnavailable:
+            # Circuit open (logged once when it opened): straight to the CRCON API
+            pass
+        except Exception as e:
+            logger.warning(f"RCON message to {player_name} failed ({e}), falling back to CRCON API")
+        return False
+
+    async def _post_message(self, player_name: str, player_id: str, message: str) -> bool:
+        """POST /api/message_player for an already resolved player"""
+        await self.create_session()
+
+        # Use the correct endpoint: message_player
+        url = f'{self.base_url}/api/message_player'
+        data = {
+            "player_name": player_name,
+            "player_id": player_id,
+            "message": message,
+            "by": "Discord Admin"
+        }
+        
+        print(f"Sending POST to: {url}")
+        print(f"Data: {data}")
+        
+        async with self.session.post(url, json=data) as response:
+            response_text = await response.text()
+            print(f"Response status: {response.status}")
+            print(f"Response: {response_text[:200]}...")
+            
+            if response.status == 200:
+                logger.info(f"Sent message to {player_name}: {message}")
+                return True
+            else:
+                logger.error(f"Failed to send message, status: {response.status}, response: {response_text}")
+                return False
     
     async def get_players(self) -> list:
-        """Get current players from live game stats"""
+        """Get current players from direct RCON when enabled, else from live game stats"""
+        if self.rcon_pool:
+            try:
+                return await self.rcon_pool.get_players()
+            except RconUnavailable:
+                pass
+            except Exception as e:
+                logger.warning(f"RCON player list failed ({e}), falling back to CRCON API")
+
         try:
             await self.create_session()
             url = f'{self.base_url}/api/get_live_game_stats'
@@ -158,6 +304,34 @@ class CRCONClient:
             logger.error(f"Error getting players: {e}")
             return []
     
+    async def get_api_result(self, endpoint: str, params: Optional[dict] = None):
+        """GET /api/<endpoint> and return its 'result' payload (None on failure)"""
+        try:
+            await self.create_session()
+            url = f'{self.base_url}/api/{endpoint}'
+
+            async with self.session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get('result')
+                logger.error(f"{endpoint} failed, status: {response.status}")
+                return None
+        except Exception as e:
+            logger.error(f"Error calling {endpoint}: {e}")
+            return None
+
+    async def get_gamestate(self):
+        """Current gamestate (scores, time remaining, current/next map), cached"""
+        return await self.game_context.get('get_gamestate')
+
+    async def get_map(self):
+        """Current map, cached"""
+        return await self.game_context.get('get_map')
+
+    async def get_team_view(self):
+        """Teams/squads/players breakdown, cached"""
+        return await self.game_context.get('get_team_view')
+
     async def get_new_logs(self) -> list:
         """Polling disabled. WS-only mode."""
         logger.info("get_new_logs called but polling is disabled (WS-only mode)")
@@ -199,16 +373,10 @@ class CRCONClient:
                         continue
                     
                     # Check if this is an !admin request
-                    if player_name and content and 'admin' in content.lower():
+                    if player_name and content and self.is_admin_request(content):
                         print(f"🚨 ADMIN REQUEST: {player_name} - {content}")                        
-                        # Extract admin message
-                        admin_message = ""
-                        if 'admin' in content.lower():
-                            parts = content.lower().split('admin')
-                            if len(parts) > 1:
-                                after_admin = parts[1].strip()
-                                after_admin = re.sub(r'\(76561\d+\)', '', after_admin).strip()
-                                admin_message = after_admin
+                        # Extract admin message (text after the first trigger word)
+                        admin_message = self.admin_message_of(content)
                         
                         if not admin_message:
                             admin_message = "Player requested admin assistance"
@@ -254,14 +422,23 @@ class CRCONClient:
         """Set callback for player responses"""
         self.player_response_callback = callback
         print(f" Player response callback set!")
+
+    def set_catchup_callback(self, callback: Callable):
+        """Set callback for stale chat folded into catch-up digests"""
+        self.catchup_callback = callback
+        print(f" Catch-up digest callback set!")
     
     async def start_monitoring(self):
-        """Start monitoring for admin requests (WebSocket-only)."""
-        if not await self.test_connection():
-            logger.error("Cannot start monitoring - failed to connect to CRCON API")
-            return
+        """Start monitoring for admin requests (WebSocket-only).
 
+        The API probe, the game context warmup and the first WS handshake run
+        concurrently (and alongside the Discord login); frames are only read once
+        the probe succeeded and the Discord side opened the dispatch gate.
+        """
         self.monitoring = True
+        self._monitor_task = asyncio.current_task()
+        self._probe = asyncio.create_task(self.test_connection())
+        asyncio.create_task(self.warm_up())
         reconnect_delay = int(self.config.get('crcon.ws_reconnect_initial_seconds', 3))
         max_delay = int(self.config.get('crcon.ws_reconnect_max_seconds', 30))
         logger.info("Starting WebSocket log monitoring (WS-only)")
@@ -271,17 +448,142 @@ class CRCONClient:
                 await self.monitor_via_websocket()
             except Exception as e:
                 logger.error(f"WebSocket loop error: {e}")
+            if self._probe is not None and self._probe.done() and not self._probe.result():
+                # Handshake failed and the API probe too: same as before, give up
+                logger.error("Cannot start monitoring - failed to connect to CRCON API")
+                self.monitoring = False
             if not self.monitoring:
                 break
             logger.warning(f"WebSocket disconnected. Reconnecting in {reconnect_delay}s…")
-            await asyncio.sleep(reconnect_delay)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), reconnect_delay)
+            except asyncio.TimeoutError:
+                pass
             reconnect_delay = min(reconnect_delay * 2, max_delay)
     
+    async def warm_up(self, roster: bool = False):
+        """Prefetch the shared game context (and the roster, keeping its connections alive)
+        so the first ticket does not pay for it"""
+        try:
+            await self.game_context.get_context()
+            if roster:
+                await self.get_players()
+        except Exception as e:
+            logger.debug(f"Game context warmup failed: {e}")
+
+    async def wait_until_ready(self) -> bool:
+        """Wait for the API probe and the dispatch gate; False if the API is unreachable"""
+        if self._probe is not None:
+            ok = await self._probe
+            self._probe = None
+            if not ok:
+                logger.error("Cannot start monitoring - failed to connect to CRCON API")
+                self.monitoring = False
+                return False
+
+        # Don't dispatch before the Discord side has rebuilt its open tickets,
+        # otherwise chat from those players would open duplicate posts
+        gate_timeout = float(self.config.get('crcon.dispatch_gate_timeout_seconds', 120))
+        if not self.dispatch_gate.is_set():
+            logger.info("Waiting for Discord warm start before dispatching chat")
+            try:
+                await asyncio.wait_for(self.dispatch_gate.wait(), gate_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Discord not ready after {gate_timeout:.0f}s, dispatching anyway")
+                self.dispatch_gate.set()
+        return True
+
+    def open_dispatch_gate(self):
+        """Allow the WS monitor to start dispatching chat"""
+        if not self.dispatch_gate.is_set():
+            self.dispatch_gate.set()
+            logger.info("Dispatch gate opened")
+
     def stop_monitoring(self):
         """Stop monitoring"""
         self.monitoring = False
+        self._stopping.set()
         logger.info("Stopped monitoring for admin requests")
 
+    async def demote(self, timeout: float = 5.0):
+        """Stop dispatching and go back to standby (HA leader lease lost)
+
+        Unlike shutdown() the cursor is not saved: the new leader owns it. The gate is
+        closed again, so the next start_monitoring() holds frames until activate().
+        """
+        self.stop_monitoring()
+        self.dispatch_gate.clear()
+        task = self._monitor_task
+        if self._ws is not None:
+            try:
+                await asyncio.wait_for(self._ws.close(), min(timeout, 2))
+            except Exception:
+                pass
+        if task is not None and not task.done():
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                task.cancel()
+                await asyncio.wait({task}, timeout=1)
+        self._monitor_task = None
+        self.streaming.clear()
+        self.ws_connected.clear()
+        self._stopping.clear()
+        logger.info("Demoted to standby: dispatch gate closed")
+
+    async def shutdown(self, timeout: float):
+        """Stop reading frames, let the batch being dispatched finish, persist the cursor"""
+        self.stop_monitoring()
+        task = self._monitor_task
+        if task is not None and not task.done():
+            if not self.streaming.is_set():
+                # Still probing / waiting for Discord: nothing in flight
+                task.cancel()
+            elif self._ws is not None:
+                try:
+                    await asyncio.wait_for(self._ws.close(), min(timeout, 2))
+                except Exception:
+                    pass
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                # The cursor still points before the interrupted batch (see handle_ws_frame)
+                logger.warning(f"WS dispatch still busy after {timeout:.0f}s, cancelling")
+                task.cancel()
+                await asyncio.wait({task}, timeout=1)
+        if self.streaming.is_set():
+            # Only an instance that dispatched owns the cursor (a standby must not overwrite it)
+            self.save_cursor()
+
+    def _load_cursor(self) -> Optional[str]:
+        saved = self.state.load('ws_cursor', {}) or {}
+        max_age = float(self.config.get('crcon.ws_cursor_max_age_seconds', 3600) or 0)
+        if not saved.get('last_seen_id'):
+            return None
+        if max_age and time.time() - float(saved.get('saved_at') or 0) > max_age:
+            logger.info("Saved WS cursor is too old, starting from the live stream")
+            return None
+        logger.info(f"Resuming WS stream after log id {saved['last_seen_id']}")
+        try:
+            self.ws_floor_id = int(saved['last_seen_id'])
+        except (TypeError, ValueError):
+            self.ws_floor_id = None
+        return saved['last_seen_id']
+
+    def reload_cursor(self):
+        """Take over the cursor persisted by the instance that dispatched before us (handoff)"""
+        cursor = self._load_cursor()
+        if cursor:
+            self.ws_last_seen_id = cursor
+
+    def save_cursor(self):
+        """Persist the last WS log id whose batch was fully dispatched"""
+        if not self.ws_last_seen_id:
+            return
+        try:
+            self.state.save('ws_cursor', {'last_seen_id': self.ws_last_seen_id, 'saved_at': time.time()})
+            self._cursor_saved_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Could not persist WS cursor: {e}")
+
     async def monitor_via_websocket(self):
         """Monitor logs using CRCON WebSocket stream at /ws/logs (WS-only)."""
         await self.create_session()
@@ -293,6 +595,8 @@ class CRCONClient:
 
         try:
             async with self.session.ws_connect(ws_url, headers=headers, heartbeat=30) as ws:
+                self._ws = ws
+                self.ws_connected.set()
                 init_payload = {
                     "last_seen_id": self.ws_last_seen_id,
                     "actions": ["CHAT"],
@@ -300,70 +604,25 @@ class CRCONClient:
                 await ws.send_json(init_payload)
                 logger.info("WebSocket stream started (CHAT filter)")
 
+                # Connected early: frames are held until the probe and Discord warm start are done
+                gated = await self.hold_frames(ws)
+                if gated is None:
+                    return
+                held, pending = gated
+                self.streaming.set()
+                for raw in held:
+                    if await self.handle_ws_frame(raw) is False:
+                        await asyncio.sleep(1)
+
                 while self.monitoring:
-                    msg = await ws.receive()
+                    # A receive started while gated is picked up, not cancelled (it may hold a frame)
+                    msg = await pending if pending is not None else await ws.receive()
+                    pending = None
                     if msg.type == aiohttp.WSMsgType.TEXT:
-                        try:
-                            data = json.loads(msg.data)
-                        except Exception:
-                            try:
-                                data = msg.json()
-                            except Exception:
-                                data = None
-
-                        if not isinstance(data, dict):
-                            continue
-
-                        if data.get('error'):
-                            logger.error(f"WebSocket server error: {data.get('error')}")
+                        self.note_frame(msg.data)
+                        if await self.handle_ws_frame(msg.data) is False:
                             # Keep the connection alive; wait briefly and continue
                             await asyncio.sleep(1)
-                            continue
-
-                        batch = data.get('logs') or []
-                        last_seen = data.get('last_seen_id')
-
-                        # Always process the first batch; rely on ws_seen_ids to dedupe
-                        if last_seen:
-                            self.ws_last_seen_id = last_seen
-
-                        for entry in batch:
-                            sid = entry.get('id')
-                            if sid and sid in self.ws_seen_ids:
-                                continue
-                            if sid:
-                                self.ws_seen_ids.add(sid)
-                                if len(self.ws_seen_ids) > 5000:
-                                    self.ws_seen_ids.clear()
-
-                            log = entry.get('log') or {}
-                            action = log.get('action') or ''
-                            if not str(action).startswith('CHAT'):
-                                continue
-                            player_name = log.get('player_name_1')
-                            content = log.get('message') or log.get('raw') or ''
-                            event_time = log.get('event_time')
-
-                            # Helper: clean trailing SteamID patterns but keep full message
-                            def _clean_message(msg: str) -> str:
-                                if not msg:
-                                    return ""
-                                return re.sub(r'\(76561\d+\)', '', msg).strip()
-
-                            try:
-                                # If a ticket already exists for this player, always forward the full message
-                                if player_name and content and (player_name in self.active_threads):
-                                    full_msg = _clean_message(content)
-                                    if self.player_response_callback:
-                                        await self.player_response_callback(player_name, full_msg, event_time)
-                                # Otherwise, only create a new ticket when the message pings admin
-                                elif player_name and content and ('admin' in content.lower()):
-                                    full_msg = _clean_message(content)
-                                    if self.message_callback:
-                                        await self.message_callback(player_name, full_msg)
-                                # Else: ignore non-admin general chat when no ticket exists
-                            except Exception as proc_err:
-                                logger.error(f"Error processing WS log line: {proc_err}")
 
                     elif msg.type == aiohttp.WSMsgType.CLOSED:
                         logger.warning("WebSocket closed by server")
@@ -378,431 +637,205 @@ class CRCONClient:
             logger.error(f"WebSocket connection error: {e}")
             raise
 
-class ClaimTicketView(discord.ui.View):
-    def __init__(self, player_name: str, discord_bot):
-        super().__init__(timeout=None)
-        self.player_name = player_name
-        self.discord_bot = discord_bot
-
-    @discord.ui.button(
-        label="Claim Ticket",
-        style=discord.ButtonStyle.primary,
-        custom_id="claim_ticket_button"
-    )
-    async def claim_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+    def note_frame(self, raw: str):
+        self.last_frame_at = time.monotonic()
+        self.frames_received += 1
+        if self.recorder:
+            self.recorder.write(raw)
+
+    async def hold_frames(self, ws) -> Optional[Tuple[List[str], Optional[asyncio.Task]]]:
+        """Read without dispatching until wait_until_ready(); None to stop
+
+        Returns the held text frames and the receive() still in flight, which the caller
+        must await before its next receive(). The socket has to be read while gated:
+        aiohttp only handles heartbeat pongs inside receive(), so an unread connection is
+        closed after ~1.5 heartbeats, and a handoff standby can stay gated much longer.
+        """
+        ready = asyncio.create_task(self.wait_until_ready())
+        held: List[str] = []
+        receive: Optional[asyncio.Task] = None
         try:
-            # Build a light blue claimed embed
-            claimed_embed = discord.Embed(
-                title="🎛️ Controles Modérateur",
-                description=f"{interaction.user.display_name} à pris en charge le ticket.",
-                color=discord.Color.blue(),
-                timestamp=discord.utils.utcnow()
-            )
-            # After claim, show Close button next
-            new_view = CloseTicketView(self.player_name, self.discord_bot)
-            await interaction.response.edit_message(embed=claimed_embed, view=new_view)
-
-            # Notify player in-game
-            try:
-                await self.discord_bot.crcon_client.send_message_to_player(
-                    self.player_name,
-                    "Un modérateur s'occupe maintenant de votre demande."
-                )
-            except Exception:
-                pass
-        except Exception:
-            try:
-                await interaction.response.send_message("Error claiming ticket", ephemeral=True)
-            except:
-                pass
+            while True:
+                if receive is None:
+                    receive = asyncio.create_task(ws.receive())
+                await asyncio.wait({ready, receive}, return_when=asyncio.FIRST_COMPLETED)
+                if receive.done():
+                    msg = receive.result()
+                    receive = None
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        self.note_frame(msg.data)
+                        held.append(msg.data)
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING,
+                                      aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.ERROR):
+                        logger.warning("WebSocket closed while waiting for the dispatch gate")
+                        return None
+                    continue
+                if not ready.result():
+                    receive.cancel()
+                    return None
+                break
+        except BaseException:
+            if receive is not None and not receive.done():
+                receive.cancel()
+            raise
+        finally:
+            if not ready.done():
+                ready.cancel()
+        if held:
+            logger.info(f"Dispatching {len(held)} WS frame(s) held during startup")
+        return held, receive
 
-class CloseTicketView(discord.ui.View):
-    def __init__(self, player_name: str, discord_bot):
-        super().__init__(timeout=None)
-        self.player_name = player_name
-        self.discord_bot = discord_bot
-    
-    @discord.ui.button(
-        label="Fermer le ticket", 
-        style=discord.ButtonStyle.danger, 
-        emoji="🔒",
-        custom_id="close_ticket_button"
-    )
-    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def handle_ws_frame(self, raw: str, now: Optional[float] = None) -> Optional[bool]:
+        """Parse one raw WS text frame and dispatch its logs; False on a server error frame
+
+        now overrides the clock used for catch-up classification (capture replay).
+        """
         try:
-            await interaction.response.defer()
-            
-            thread = interaction.channel
-            player_name = self.player_name
-            
-            # Extract player name from thread title if needed
-            if not player_name and isinstance(thread, discord.Thread):
-                thread_title = thread.name
-                player_name = thread_title.replace("Admin Request - ", "").strip()
-            
-            if not player_name:
-                await interaction.followup.send("Could not determine player name", ephemeral=True)
-                return
-            
-            print(f" Closing ticket for {player_name}")
-            
-            # Send confirmation message to player
-            try:
-                await self.discord_bot.crcon_client.send_message_to_player(
-                    player_name,
-                    "Votre ticket admin a été fermé. Merci !"
-                )
-                print(f"Sent close confirmation to player: {player_name}")
-            except Exception as msg_error:
-                print(f" Could not send close confirmation to player: {msg_error}")
-            
-            # Apply CLOSED tag to forum post
-            await self.discord_bot.apply_forum_tag(thread, "CLOSED")
-            
-            # Remove player from tracking
-            if player_name in self.discord_bot.active_threads:
-                del self.discord_bot.active_threads[player_name]
-                print(f"Discord: Removed {player_name} from active_threads")
-            
-            if player_name in self.discord_bot.active_button_messages:
-                del self.discord_bot.active_button_messages[player_name]
-                print(f" Discord: Removed {player_name} from button tracking")
-            
-            self.discord_bot.crcon_client.unregister_admin_thread(player_name)
-            
-            # Create confirmation embed as the interaction response (optional informational post)
-            closed_embed = discord.Embed(
-                title="🔒 Ticket fermé",
-                description=f"Le ticket de **{player_name}** a été clôturé par {interaction.user.mention}",
-                color=discord.Color.green(),
-                timestamp=discord.utils.utcnow()
-            )
-            # Removed extra closed post; controls panel is updated instead
-
-            # Update the existing controls panel (the button message) to closed state in green
-            controls_closed = discord.Embed(
-                title="🎛️ Controles Modérateur",
-                description=f"Le ticket de **{player_name}** est clôturé",
-                color=discord.Color.green(),
-                timestamp=discord.utils.utcnow()
-            )
-            # We deferred earlier; edit the message the button was attached to
-            await interaction.message.edit(embed=controls_closed, view=None)
-            
-            # Archive and lock the thread
-            if isinstance(thread, discord.Thread):
-                await thread.edit(archived=True, locked=True)
-                print(f"Thread archived and locked for {player_name}")
-            
-            print(f" Ticket fully closed for {player_name}")
-            logger.info(f"Ticket closed for {player_name} by {interaction.user}")
-            
-        except Exception as e:
-            logger.error(f"Error closing ticket: {e}")
-            await interaction.followup.send(" Error closing ticket", ephemeral=True)
+            data = json.loads(raw)
+        except Exception:
+            return None
 
-class DiscordBot:
-    def __init__(self, config, crcon_client):
-        self.config = config
-        self.crcon_client = crcon_client
-        self.active_threads: Dict[str, discord.Thread] = {}
-        self.active_button_messages: Dict[str, discord.Message] = {}
-        
-        # Forum tags (will be populated on startup)
-        self.forum_tags = {
-            'NEW': None,
-            'REPLIED': None, 
-            'CLOSED': None
+        if not isinstance(data, dict):
+            return None
+
+        if data.get('error'):
+            logger.error(f"WebSocket server error: {data.get('error')}")
+            return False
+
+        batch = data.get('logs') or []
+        last_seen = data.get('last_seen_id')
+
+        # Always process the first batch; rely on ws_seen_ids to dedupe. The cursor moves
+        # only once the batch is dispatched: a batch cancelled at shutdown keeps the previous
+        # cursor, so its entries are delivered again after the restart instead of skipped
+        await self.process_ws_batch(batch, now=now)
+        if last_seen:
+            self.ws_last_seen_id = last_seen
+        if last_seen and time.monotonic() - self._cursor_saved_at >= float(self.config.get('crcon.ws_cursor_flush_seconds', 5)):
+            self.save_cursor()
+        return True
+
+    def debug_state(self) -> dict:
+        """Cheap snapshot of the CRCON side for /debug/state"""
+        return {
+            'monitoring': self.monitoring,
+            'streaming': self.streaming.is_set(),
+            'ws_open': self._ws is not None and not self._ws.closed,
+            'ws_cursor': self.ws_last_seen_id,
+            'ws_frames': self.frames_received,
+            'ws_last_frame_age': round(time.monotonic() - self.last_frame_at, 1) if self.last_frame_at else None,
+            'tracked_players': len(self.active_threads),
+            'game_context': self.game_context.stats(),
+            'profiles': self.profiles.stats(),
+            'http': self.tracer.stats() if self.tracer else None,
         }
-        
-        # Set up Discord bot
-        intents = discord.Intents.default()
-        intents.message_content = True
-        
-        self.bot = commands.Bot(command_prefix='!', intents=intents)
-        
-        # Set up event handlers
-        self.setup_events()
-        
-        # Set CRCON callbacks
-        self.crcon_client.set_message_callback(self.handle_admin_request)
-        self.crcon_client.set_player_response_callback(self.handle_player_response)
-        
-        print(f" Discord bot initialized")
-        print(f" Admin channel ID: {self.config.get('discord.admin_channel_id')}")
-    
-    def setup_events(self):
-        """Set up Discord bot events"""
-        
-        @self.bot.event
-        async def on_ready():
-            print(f" {self.bot.user} has connected to Discord!")
-            logger.info(f'{self.bot.user} has connected to Discord!')
-            
-            # Add persistent views
-            self.bot.add_view(CloseTicketView("", self))
-            self.bot.add_view(ClaimTicketView("", self))
-            
-            # Setup forum tags
-            await self.setup_forum_tags()
-            
-        @self.bot.event
-        async def on_message(message):
-            if message.author == self.bot.user:
-                return
-            
-            if isinstance(message.channel, discord.Thread):
-                await self.handle_thread_message(message)
-            
-            await self.bot.process_commands(message)
-    
-    async def setup_forum_tags(self):
-        """Setup or get existing forum tags"""
-        try:
-            channel_id = self.config.get('discord.admin_channel_id')
-            if not channel_id:
-                print(f" No admin channel ID configured!")
-                return
-                
-            channel = self.bot.get_channel(int(channel_id))
-            
-            if not channel:
-                print(f" Could not find admin channel with ID: {channel_id}")
-                return
-            
-            if not isinstance(channel, discord.ForumChannel):
-                print(f"Channel is not a forum channel! Current type: {type(channel)}")
-                print(f"Please convert your admin channel to a Forum Channel in Discord")
-                return
-            
-            print(f"Found forum channel: {channel.name}")
-            
-            # Get existing tags or create them
-            existing_tags = {tag.name: tag for tag in channel.available_tags}
-            
-            for tag_name in ['NEW', 'REPLIED', 'CLOSED']:
-                if tag_name in existing_tags:
-                    self.forum_tags[tag_name] = existing_tags[tag_name]
-                    print(f"Found existing tag: {tag_name}")
-                else:
-                    # Create the tag
-                    emoji_map = {'NEW': '🆕', 'REPLIED': '💬', 'CLOSED': '🔒'}
-                    color_map = {'NEW': discord.Color.red(), 'REPLIED': discord.Color.orange(), 'CLOSED': discord.Color.green()}
-                    
-                    try:
-                        new_tag = await channel.create_tag(
-                            name=tag_name,
-                            emoji=emoji_map[tag_name],
-                            moderated=False
-                        )
-                        self.forum_tags[tag_name] = new_tag
-                        print(f"Created new tag: {tag_name}")
-                    except Exception as tag_error:
-                        print(f"Failed to create tag {tag_name}: {tag_error}")
-            
-            print(f"Forum tags setup complete!")
-            
-        except Exception as e:
-            print(f" Error setting up forum tags: {e}")
-            logger.error(f"Error setting up forum tags: {e}")
-    
-    async def apply_forum_tag(self, thread: discord.Thread, tag_name: str):
-        """Apply a forum tag to a thread"""
-        try:
-            if tag_name not in self.forum_tags or not self.forum_tags[tag_name]:
-                print(f" Tag {tag_name} not available")
-                return
-            
-            tag = self.forum_tags[tag_name]
-            
-            # Remove all existing status tags first
-            current_tags = [t for t in thread.applied_tags if t.name not in ['NEW', 'REPLIED', 'CLOSED']]
-            
-            # Add the new tag
-            new_tags = current_tags + [tag]
-            
-            await thread.edit(applied_tags=new_tags)
-            print(f" Applied {tag_name} tag to thread: {thread.name}")
-            
-        except Exception as e:
-            print(f" Error applying forum tag {tag_name}: {e}")
-            logger.error(f"Error applying forum tag: {e}")
-    
-    async def handle_admin_request(self, player_name: str, admin_message: str):
-        """Handle new admin request from game"""
-        try:
-            print(f" Discord handler called: {player_name} - {admin_message}")
-            
-            channel_id = self.config.get('discord.admin_channel_id')
-            if not channel_id:
-                print(f" No admin channel ID configured!")
-                return
-                
-            channel = self.bot.get_channel(int(channel_id))
-            
-            if not channel:
-                print(f"Could not find admin channel with ID: {channel_id}")
-                return
-            
-            if not isinstance(channel, discord.ForumChannel):
-                print(f"Channel is not a forum channel!")
-                return
-            
-            # Create forum post (thread)
-            thread_name = f"Admin Request - {player_name}"
-            
-            # Create initial embed
-            embed = discord.Embed(
-                title="🚨 Besoin d'un modérateur",
-                description=f"**Joueur:** {player_name}\n**Message:** {admin_message}",
-                color=discord.Color.red(),
-                timestamp=discord.utils.utcnow()
-            )
-            embed.set_footer(text="Repondez dans ce fil de discussion pour envoyer un message directement au joueur.")
-            
-            print(f"Creating forum post: {thread_name}")
-            
-            # Create forum post with NEW tag
-            new_tag = self.forum_tags.get('NEW')
-            initial_tags = [new_tag] if new_tag else []
-            
-            thread, message = await channel.create_thread(
-                name=thread_name,
-                embed=embed,
-                applied_tags=initial_tags
-            )
-            
-            print(f"Forum post created: {thread.name}")
-            
-            # Add close button
-            view = ClaimTicketView(player_name, self)
-            button_message = await thread.send(embed=discord.Embed(
-                title="🎛️ Controles modérateurs ",
-                description=f"Ticket de **{player_name}** — en attente",
-                color=discord.Color.blue()
-            ), view=view)
-            
-            # Store the thread and button message
-            self.active_threads[player_name] = thread
-            self.active_button_messages[player_name] = button_message
-            
-            self.crcon_client.register_admin_thread(player_name, {
-                'thread_id': thread.id,
-                'player_name': player_name
-            })
-            
-            # Send confirmation to player
+
+    def is_admin_request(self, content: str) -> bool:
+        """True when a chat line contains one of the ticket trigger words (tickets.triggers)"""
+        lowered = content.lower()
+        return any(trigger in lowered for trigger in self.config.get('tickets.triggers', ('admin',)))
+
+    def admin_message_of(self, content: str) -> str:
+        """Text following the first configured trigger word, SteamIDs removed"""
+        lowered = content.lower()
+        positions = [(lowered.find(t), t) for t in self.config.get('tickets.triggers', ('admin',)) if t in lowered]
+        if not positions:
+            return ""
+        index, trigger = min(positions)
+        return self._clean_message(content[index + len(trigger):])
+
+    @staticmethod
+    def _clean_message(msg: str) -> str:
+        """Clean trailing SteamID patterns but keep full message"""
+        if not msg:
+            return ""
+        return re.sub(r'\(76561\d+\)', '', msg).strip()
+
+    @staticmethod
+    def parse_event_time(value) -> Optional[float]:
+        """Convert a CRCON event_time (epoch s/ms or ISO string) to a UTC timestamp"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, (int, float)):
+            ts = float(value)
+        else:
+            text = str(value).strip()
             try:
-                await self.crcon_client.send_message_to_player(
-                    player_name, 
-                    " RequÃªte admin reÃ§ue ! Les admins ont Ã©tÃ© avertis."
-                )
-                print(f"Confirmation sent to player")
-            except Exception as msg_error:
-                print(f" Could not send confirmation to player: {msg_error}")
-            
-            print(f" Successfully created admin forum post for {player_name}")
-            logger.info(f"Created admin forum post for {player_name}")
-            
-        except Exception as e:
-            print(f" Error handling admin request: {e}")
-            logger.error(f"Error handling admin request: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    async def handle_player_response(self, player_name: str, message: str, event_time: str):
-        """Handle player response in game"""
-        try:
-            print(f" Player response received: {player_name} - {message}")
-            
-            if player_name not in self.active_threads:
-                print(f" No active thread for player: {player_name}")
-                return
-            
-            thread = self.active_threads[player_name]
-            
-            # Apply NEW tag (player has responded, needs admin attention)
-            await self.apply_forum_tag(thread, "NEW")
-            
-            # Create embed for player response
-            response_embed = discord.Embed(
-                title="💬 Réponse du joueur",
-                description=f"**{player_name}:** {message}",
-                color=discord.Color.blue(),
-                timestamp=discord.utils.utcnow()
-            )
-            
-            if event_time:
-                response_embed.set_footer(text=f"Game time: {event_time}")
-            
-            await thread.send(embed=response_embed)
-            print(f"Player response posted to Discord forum")
-            
-            # Move button to bottom
-            if player_name in self.active_button_messages:
+                ts = float(text)
+            except ValueError:
                 try:
-                    old_message = self.active_button_messages[player_name]
-                    await old_message.edit(view=None)
-                except:
-                    pass
-            
-            # Create new button message
-            button_embed = discord.Embed(
-                title="🎛️ Controles modérateurs",
-                description=f"Ticket de **{player_name}** — en attente",
-                color=discord.Color.blue()
-            )
-            
-            view = ClaimTicketView(player_name, self)
-            new_button_message = await thread.send(embed=button_embed, view=view)
-            self.active_button_messages[player_name] = new_button_message
-            
-        except Exception as e:
-            print(f"Error handling player response: {e}")
-            logger.error(f"Error handling player response: {e}")
-    
-    async def handle_thread_message(self, message):
-        """Handle admin replies in forum threads"""
-        try:
-            thread = message.channel
-            
-            if not isinstance(thread, discord.Thread):
-                return
-            
-            # Extract player name from thread title
-            player_name = None
-            if "Admin Request -" in thread.name:
-                player_name = thread.name.replace("Admin Request -", "").strip()
-            
-            if player_name and not message.author.bot:
-                admin_name = message.author.display_name
-                formatted_message = f"[ADMIN {admin_name}]: {message.content}"
-                
-                # Apply REPLIED tag
-                await self.apply_forum_tag(thread, "REPLIED")
-                
-                success = await self.crcon_client.send_message_to_player(player_name, formatted_message)
-                
-                if success:
-                    await message.add_reaction("âœ…")
-                    print(f"Admin message sent to {player_name}")
-                else:
-                    await message.add_reaction("âŒ")
-                    print(f"Failed to send admin message to {player_name}")
-                
-                logger.info(f"Sent message from {admin_name} to {player_name}: {message.content}")
-        
-        except Exception as e:
-            logger.error(f"Error handling thread message: {e}")
-    
-    async def start(self):
-        """Start the Discord bot"""
-        token = self.config.get('discord.token')
-        if not token:
-            logger.error("Discord token not found in configuration")
-            return
-        
-        try:
-            await self.bot.start(token)
-        except Exception as e:
-            logger.error(f"Failed to start Discord bot: {e}")
+                    dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+                except ValueError:
+                    return None
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                return dt.timestamp()
+        # CRCON sometimes sends milliseconds
+        if ts > 1e11:
+            ts /= 1000.0
+        return ts
+
+    async def process_ws_batch(self, batch: list, now: Optional[float] = None):
+        """Classify a WS batch and dispatch it; stale entries are folded into catch-up digests"""
+        max_age = float(self.config.get('crcon.catchup_max_age_seconds', 300) or 0)
+        if now is None:
+            now = datetime.now(timezone.utc).timestamp()
+        # player_name -> [(event_ts, message), ...] for entries older than max_age
+        digests: Dict[str, List[Tuple[Optional[float], str]]] = {}
+
+        for entry in batch:
+            sid = entry.get('id')
+            if sid and sid in self.ws_seen_ids:
+                continue
+            if sid and self.ws_floor_id is not None and str(sid).isdigit() and int(sid) <= self.ws_floor_id:
+                # Already handled before a restart/handoff (early connection replays from an older cursor)
+                continue
+            if sid:
+                self.ws_seen_ids.add(sid)
+                if len(self.ws_seen_ids) > 5000:
+                    self.ws_seen_ids.clear()
+
+            log = entry.get('log') or {}
+            action = log.get('action') or ''
+            if not str(action).startswith('CHAT'):
+                continue
+            player_name = log.get('player_name_1')
+            content = log.get('message') or log.get('raw') or ''
+            event_time = log.get('event_time')
+            if not player_name or not content:
+                continue
+
+            event_ts = self.parse_event_time(event_time)
+            if event_ts is None:
+                event_ts = self.parse_event_time(log.get('timestamp_ms'))
+
+            try:
+                # Catch-up mode: old lines never open a live ticket or reach the player in-game
+                if max_age and event_ts is not None and now - event_ts > max_age:
+                    if (player_name in self.active_threads or player_name in digests
+                            or self.is_admin_request(content)):
+                        digests.setdefault(player_name, []).append((event_ts, self._clean_message(content)))
+                    continue
+
+                # If a ticket already exists for this player, always forward the full message
+                if player_name in self.active_threads:
+                    full_msg = self._clean_message(content)
+                    if self.player_response_callback:
+                        await self.player_response_callback(player_name, full_msg, event_time)
+                # Otherwise, only create a new ticket when the message pings admin
+                elif self.is_admin_request(content):
+                    full_msg = self._clean_message(content)
+                    if self.message_callback:
+                        await self.message_callback(player_name, full_msg)
+                # Else: ignore non-admin general chat when no ticket exists
+            except Exception as proc_err:
+                logger.error(f"Error processing WS log line: {proc_err}")
+
+        if digests:
+            total = sum(len(lines) for lines in digests.values())
+            logger.info(f"Catch-up: folding {total} stale chat line(s) from {len(digests)} player(s)")
+            if self.catchup_callback:
+                try:
+                    await self.catchup_callback(digests)
+                except Exception as digest_err:
+                    logger.error(f"Error dispatching catch-up digests: {digest_err}")
@@ -1,8 +1,42 @@
-﻿from typing import Dict, Any
+﻿from typing import Dict, Any, Iterator, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# A '"' would end a quoted RCON argument early (and let the rest be read as more
+# arguments); control characters could end or split the command
+_TEXT_UNSAFE = str.maketrans({**{chr(c): ' ' for c in range(32)}, '\x7f': ' ', '"': "'"})
+
+def quote_text(text: str) -> str:
+    """Quote free text (message, reason) for an RCON command: '"' -> "'", controls -> ' '"""
+    return '"' + str(text).translate(_TEXT_UNSAFE) + '"'
+
+def quote_name(name: str) -> str:
+    """Quote a player name; ValueError when it cannot be addressed safely over RCON"""
+    name = str(name)
+    if '"' in name or any(ord(c) < 32 or ord(c) == 0x7f for c in name):
+        raise ValueError(f"player name {name!r} cannot be quoted for RCON")
+    return f'"{name}"'
+
+class PlayerRecord:
+    """Compact roster entry parsed from raw RCON output"""
+    __slots__ = ('name', 'player_id')
+
+    def __init__(self, name: str, player_id: Optional[str]):
+        self.name = name
+        self.player_id = player_id
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access so records can stand in for CRCON roster dicts"""
+        if key == 'name':
+            return self.name
+        if key in ('player_id', 'steam_id_64'):
+            return self.player_id
+        return default
+
+    def __repr__(self) -> str:
+        return f"PlayerRecord({self.name!r}, {self.player_id!r})"
+
 class RconCommands:
     """Helper class for common RCON commands"""
     
@@ -11,36 +45,41 @@ class RconCommands:
         """Get command to list all players"""
         return "get players"
     
+    @staticmethod
+    def get_playerids_command() -> str:
+        """Get command to list all players with their platform ids"""
+        return "get playerids"
+
     @staticmethod
     def get_player_info_command(player_name: str) -> str:
         """Get command to get specific player info"""
-        return f'playerinfo "{player_name}"'
+        return f'playerinfo {quote_name(player_name)}'
     
     @staticmethod
     def kick_player_command(player_name: str, reason: str = "") -> str:
         """Get command to kick a player"""
         if reason:
-            return f'kick "{player_name}" "{reason}"'
-        return f'kick "{player_name}"'
+            return f'kick {quote_name(player_name)} {quote_text(reason)}'
+        return f'kick {quote_name(player_name)}'
     
     @staticmethod
     def ban_player_command(player_name: str, reason: str = "", duration: str = "") -> str:
         """Get command to ban a player"""
         if duration and reason:
-            return f'ban "{player_name}" "{reason}" {duration}'
+            return f'ban {quote_name(player_name)} {quote_text(reason)} {int(duration)}'
         elif reason:
-            return f'ban "{player_name}" "{reason}"'
-        return f'ban "{player_name}"'
+            return f'ban {quote_name(player_name)} {quote_text(reason)}'
+        return f'ban {quote_name(player_name)}'
     
     @staticmethod
     def message_player_command(player_name: str, message: str) -> str:
-        """Get command to message a player"""
-        return f'message "{player_name}" "{message}"'
+        """Get command to message a player (ValueError for a name that cannot be quoted)"""
+        return f'message {quote_name(player_name)} {quote_text(message)}'
     
     @staticmethod
     def broadcast_command(message: str) -> str:
         """Get command to broadcast to all players"""
-        return f'broadcast "{message}"'
+        return f'broadcast {quote_text(message)}'
     
     @staticmethod
     def get_map_command() -> str:
@@ -53,29 +92,26 @@ class RconCommands:
         return "get name"
     
     @staticmethod
-    def parse_players_response(response: str) -> list:
-        """Parse the response from get players command"""
-        players = []
+    def iter_players(response: str) -> Iterator[PlayerRecord]:
+        """Yield player records from a complete get players / get playerids response"""
+        # Formats: "<count>\tName One\tName Two" (get players)
+        #          "<count>\tName One : 76561198000000001\tName Two : 1a2b3c..." (get playerids)
+        # The whole response is split once; records are __slots__ objects, not dicts
         if not response:
-            return players
-        
-        lines = response.strip().split('\n')
-        for line in lines:
-            if line.strip() and not line.startswith('Name:'):
-                # Parse player info - format may vary
-                # Example: "PlayerName [Team] [Role] [Steam64ID]"
-                parts = line.split('\t') if '\t' in line else [line]
-                if parts:
-                    player_info = {
-                        'name': parts[0].strip(),
-                        'team': parts[1].strip() if len(parts) > 1 else '',
-                        'role': parts[2].strip() if len(parts) > 2 else '',
-                        'steam_id': parts[3].strip() if len(parts) > 3 else ''
-                    }
-                    players.append(player_info)
-        
-        return players
-    
+            return
+        items = response.rstrip().split('\t')
+        for i in range(1, len(items)):
+            name, sep, player_id = items[i].rpartition(' : ')
+            if sep:
+                yield PlayerRecord(name, player_id)
+            elif player_id:
+                yield PlayerRecord(player_id, None)
+
+    @staticmethod
+    def parse_players_response(response: str) -> List[PlayerRecord]:
+        """Parse the response from get players / get playerids commands"""
+        return list(RconCommands.iter_players(response))
+
     @staticmethod
     def parse_map_response(response: str) -> Dict[str, Any]:
         """Parse the response from get map command"""
@@ -84,17 +120,28 @@ class RconCommands:
             'mode': '',
             'time_remaining': ''
         }
-        
-        if response:
-            lines = response.strip().split('\n')
-            for line in lines:
-                if 'Map:' in line:
-                    map_info['name'] = line.split('Map:')[1].strip()
-                elif 'Mode:' in line:
-                    map_info['mode'] = line.split('Mode:')[1].strip()
-                elif 'Time:' in line:
-                    map_info['time_remaining'] = line.split('Time:')[1].strip()
-        
+        if not response:
+            return map_info
+
+        # The game server answers with the bare map id, e.g. "stmereeglise_warfare"
+        if 'Map:' not in response:
+            name = response.strip()
+            map_info['name'] = name
+            for mode in ('warfare', 'offensive', 'skirmish', 'control'):
+                if f'_{mode}' in name:
+                    map_info['mode'] = mode
+                    break
+            return map_info
+
+        # Labelled form: "Map: ...\nMode: ...\nTime: ..."
+        for label, field in (('Map:', 'name'), ('Mode:', 'mode'), ('Time:', 'time_remaining')):
+            idx = response.find(label)
+            if idx == -1:
+                continue
+            idx += len(label)
+            stop = response.find('\n', idx)
+            map_info[field] = response[idx:].strip() if stop == -1 else response[idx:stop].strip()
+
         return map_info
 
 def handle_admin_command(player_id, message):
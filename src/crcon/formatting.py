@@ -0,0 +1,77 @@
+﻿import re
+from datetime import datetime
+from typing import List
+
+# Discord syntax that renders as junk in the in-game message box
+CODE_BLOCK_RE = re.compile(r'```(?:[\w+-]*\n)?(.*?)```', re.S)
+LINK_RE = re.compile(r'\[([^\]]+)\]\(<?(https?://[^)\s>]+)>?\)')
+CUSTOM_EMOJI_RE = re.compile(r'<a?:(\w+):\d+>')
+TIMESTAMP_RE = re.compile(r'<t:(\d+)(?::[tTdDfFR])?>')
+MENTION_RE = re.compile(r'<(?:@[!&]?|#)\d+>')
+EMPHASIS_RE = re.compile(r'(?<!\w)(\*\*\*|\*\*|\*|__|~~|\|\||`)(?=\S)(.+?)(?<=\S)\1', re.S)
+LINE_PREFIX_RE = re.compile(r'^[ \t]*(?:#{1,3} |-# |>>> |> |[*-] )', re.M)
+ESCAPE_RE = re.compile(r'\\([*_~`|>#\-\\])')
+# Escaped characters are parked in the private-use area while markdown is stripped
+ESCAPED_RE = re.compile('[\ue000-\ue07f]')
+SPACES_RE = re.compile(r'[ \t]+')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+TOKEN_RE = re.compile(r'\S+\s*')
+
+def clean_for_game(text: str) -> str:
+    """Strip Discord markdown, mentions and custom emoji, keeping the readable text"""
+    if not text:
+        return ""
+    text = ESCAPE_RE.sub(lambda m: chr(0xE000 + ord(m.group(1))), text)
+    text = CODE_BLOCK_RE.sub(lambda m: m.group(1).strip(), text)
+    text = LINK_RE.sub(r'\1 (\2)', text)
+    text = CUSTOM_EMOJI_RE.sub(r':\1:', text)
+    text = TIMESTAMP_RE.sub(lambda m: datetime.fromtimestamp(int(m.group(1))).strftime('%d/%m %H:%M'), text)
+    text = MENTION_RE.sub('', text)
+    # Nested emphasis (***, **_x_**) needs a few passes
+    for _ in range(3):
+        stripped = EMPHASIS_RE.sub(r'\2', text)
+        if stripped == text:
+            break
+        text = stripped
+    text = LINE_PREFIX_RE.sub('', text)
+    text = ESCAPED_RE.sub(lambda m: chr(ord(m.group()) - 0xE000), text)
+    text = SPACES_RE.sub(' ', text)
+    text = BLANK_LINES_RE.sub('\n\n', text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+def wrap(text: str, width: int) -> List[str]:
+    """Word-aware split into pieces of at most width characters (long words are cut)"""
+    chunks: List[str] = []
+    current = ""
+    for match in TOKEN_RE.finditer(text):
+        token = match.group()
+        word = token.rstrip()
+        if len(current) + len(word) <= width:
+            current += token
+            continue
+        if current.strip():
+            chunks.append(current.rstrip())
+        while len(word) > width:
+            chunks.append(word[:width])
+            word = word[width:]
+            token = word + token[len(token.rstrip()):]
+        current = token
+    if current.strip():
+        chunks.append(current.rstrip())
+    return chunks
+
+def split_message(text: str, limit: int = 200, prefix: str = "[ADMIN]") -> List[str]:
+    """'[ADMIN]: text' when it fits, else numbered '[ADMIN] 1/3: ...' chunks within limit"""
+    if not text:
+        return []
+    single = f"{prefix}: {text}"
+    if len(single) <= limit:
+        return [single]
+    # Reserve room for the widest header ("[ADMIN] 99/99: ")
+    width = max(20, limit - len(f"{prefix} 99/99: "))
+    parts = wrap(text, width)
+    return [f"{prefix} {index}/{len(parts)}: {part}" for index, part in enumerate(parts, 1)]
+
+def format_admin_reply(text: str, limit: int = 200, prefix: str = "[ADMIN]") -> List[str]:
+    """Outbound stage for admin replies: clean, then chunk to the in-game length limit"""
+    return split_message(clean_for_game(text), limit, prefix)
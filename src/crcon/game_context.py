@@ -0,0 +1,207 @@
+﻿import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIDE_LABELS = {'allies': 'Alliés', 'axis': 'Axe'}
+
+def _consume_exception(task: asyncio.Task):
+    # Waiter-less failures (every caller gone) must not log "exception never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+class GameContextCache:
+    """Shared single-flight cache for CRCON's heavy game-state endpoints"""
+
+    # endpoint -> config key under crcon.context_ttl_seconds, default TTL
+    ENDPOINTS = {
+        'get_gamestate': ('gamestate', 10),
+        'get_map': ('map', 30),
+        'get_team_view': ('team_view', 15),
+    }
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Any]], config):
+        self.fetch = fetch
+        self.ttls: Dict[str, float] = {}
+        self.configure(config)
+        # endpoint -> (fetched_at, value)
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._map_key: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def configure(self, config):
+        for endpoint, (key, default) in self.ENDPOINTS.items():
+            self.ttls[endpoint] = float(config.get(f'crcon.context_ttl_seconds.{key}', default))
+
+    def invalidate(self, *endpoints: str):
+        """Drop cached values (all endpoints when none are given)"""
+        for endpoint in endpoints or list(self._entries):
+            self._entries.pop(endpoint, None)
+
+    async def get(self, endpoint: str) -> Any:
+        """Cached value of an endpoint; concurrent misses share a single fetch"""
+        entry = self._entries.get(endpoint)
+        if entry and time.monotonic() - entry[0] < self.ttls.get(endpoint, 0):
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(endpoint)
+        if task:
+            self.coalesced += 1
+        else:
+            # The fetch runs detached from its first caller: a caller timing out (wait_for)
+            # neither strands the others nor prevents the result from being cached
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(endpoint))
+            task.add_done_callback(_consume_exception)
+            self._inflight[endpoint] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, endpoint: str) -> Any:
+        started = time.monotonic()
+        try:
+            value = await self.fetch(endpoint)
+            if value is not None:
+                self._entries[endpoint] = (started, value)
+                if endpoint == 'get_map':
+                    self._on_map(value, started)
+            return value
+        finally:
+            self._inflight.pop(endpoint, None)
+
+    def _on_map(self, value: Any, fetched_at: float):
+        """Invalidate state cached before a map change"""
+        key = self.map_key(value)
+        if self._map_key is not None and key != self._map_key:
+            logger.info(f"Map changed ({self._map_key} -> {key}), invalidating game context")
+            for endpoint, (ts, _) in list(self._entries.items()):
+                if endpoint != 'get_map' and ts < fetched_at:
+                    del self._entries[endpoint]
+        self._map_key = key
+
+    @staticmethod
+    def map_key(value: Any) -> Optional[str]:
+        if isinstance(value, dict):
+            return value.get('id') or value.get('name') or value.get('pretty_name')
+        return str(value) if value else None
+
+    @staticmethod
+    def map_label(value: Any) -> Optional[str]:
+        if isinstance(value, dict):
+            nested = value.get('map') if isinstance(value.get('map'), dict) else {}
+            return value.get('pretty_name') or nested.get('pretty_name') or value.get('id')
+        return str(value) if value else None
+
+    async def get_context(self) -> Dict[str, Any]:
+        """gamestate / map / team view, fetched concurrently and cached"""
+        results = await asyncio.gather(
+            *(self.get(endpoint) for endpoint in self.ENDPOINTS), return_exceptions=True
+        )
+        context = {}
+        for endpoint, result in zip(self.ENDPOINTS, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Game context: {endpoint} failed: {result}")
+                result = None
+            context[endpoint] = result
+
+        # A map change seen just now invalidated older gamestate/team view: refetch them
+        stale = [e for e in ('get_gamestate', 'get_team_view') if context[e] is not None and e not in self._entries]
+        if stale:
+            refreshed = await asyncio.gather(*(self.get(e) for e in stale), return_exceptions=True)
+            for endpoint, result in zip(stale, refreshed):
+                context[endpoint] = None if isinstance(result, Exception) else result
+        return context
+
+    async def player_context(self, player_name: str, player_id: Optional[str] = None) -> Dict[str, Any]:
+        """Map, side, squad and score summary for a ticket embed"""
+        context = await self.get_context()
+        info: Dict[str, Any] = {}
+
+        current_map = context.get('get_map')
+        gamestate = context.get('get_gamestate') or {}
+        if not current_map and isinstance(gamestate, dict):
+            current_map = gamestate.get('current_map')
+        label = self.map_label(current_map)
+        if label:
+            info['map'] = label
+
+        if isinstance(gamestate, dict) and gamestate:
+            allied, axis = gamestate.get('allied_score'), gamestate.get('axis_score')
+            if allied is not None and axis is not None:
+                info['score'] = f"{allied} - {axis}"
+            if gamestate.get('time_remaining') not in (None, ''):
+                remaining = gamestate.get('time_remaining')
+                if isinstance(remaining, (int, float)):
+                    remaining = f"{int(remaining) // 3600}:{int(remaining) % 3600 // 60:02d}:{int(remaining) % 60:02d}"
+                info['time_remaining'] = remaining
+
+        found = self.find_player(context.get('get_team_view'), player_name, player_id)
+        if found:
+            side, squad, player = found
+            info['side'] = SIDE_LABELS.get(side, side)
+            if squad:
+                info['squad'] = squad
+            if player.get('role'):
+                info['role'] = player.get('role')
+        return info
+
+    @staticmethod
+    def find_player(team_view: Any, player_name: str, player_id: Optional[str] = None):
+        """Locate a player in get_team_view output -> (side, squad, player dict)"""
+        if not isinstance(team_view, dict):
+            return None
+
+        def matches(player: Any) -> bool:
+            if not isinstance(player, dict):
+                return False
+            if player_id and player.get('player_id') == player_id:
+                return True
+            return player.get('name') == player_name
+
+        for side, team in team_view.items():
+            if not isinstance(team, dict):
+                continue
+            if matches(team.get('commander')):
+                return side, 'Commandant', team['commander']
+            squads = team.get('squads') or {}
+            for squad_name, squad in squads.items():
+                players = squad.get('players', []) if isinstance(squad, dict) else squad
+                for player in players or []:
+                    if matches(player):
+                        return side, (squad_name or '').capitalize() or None, player
+        return None
+
+    @staticmethod
+    def group_members(team_view: Any, player_name: str, player_id: Optional[str] = None,
+                      scope: str = 'squad') -> List[str]:
+        """Names sharing the player's squad (scope='squad') or side (scope='team')"""
+        if not isinstance(team_view, dict):
+            return []
+
+        def names(players) -> List[str]:
+            return [p.get('name') for p in players or [] if isinstance(p, dict) and p.get('name')]
+
+        for team in team_view.values():
+            if not isinstance(team, dict):
+                continue
+            commander = team.get('commander')
+            groups = [[commander] if isinstance(commander, dict) else []]
+            for squad in (team.get('squads') or {}).values():
+                groups.append(squad.get('players', []) if isinstance(squad, dict) else squad or [])
+            for players in groups:
+                for player in players:
+                    if not isinstance(player, dict):
+                        continue
+                    if (player_id and player.get('player_id') == player_id) or player.get('name') == player_name:
+                        if scope == 'team':
+                            return [name for group in groups for name in names(group)]
+                        return names(players)
+        return []
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
@@ -0,0 +1,330 @@
+﻿import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class OutboundQueue:
+    """Durable queue of in-game messages: dedupe, retry with backoff, spill to disk
+
+    Jobs are keyed (e.g. "<thread id>:<discord message id>") so a message is
+    queued at most once. A player's jobs are delivered in FIFO order; different
+    players are served concurrently. Failed deliveries are retried with
+    exponential backoff while the player is still on the roster. Beyond
+    outbound.max_in_memory jobs, new ones are appended to a JSON-lines spill
+    file and read back as the backlog drains. File writes (spill appends and
+    the periodic snapshot, which fsyncs) run in a worker thread, one at a time.
+    """
+
+    def __init__(self, client, store, config):
+        self.client = client
+        self.store = store
+        self.max_in_memory = int(config.get('outbound.max_in_memory', 200))
+        self.concurrency = int(config.get('outbound.concurrency', 3))
+        self.base_delay = float(config.get('outbound.retry_base_seconds', 2))
+        self.max_delay = float(config.get('outbound.retry_max_seconds', 60))
+        self.max_age = float(config.get('outbound.max_age_seconds', 600))
+        self.spill_path = store.directory / 'outbox_spill.jsonl'
+        # key -> job, in arrival order
+        self.jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._spilled_keys: Set[str] = set()
+        # Spilled jobs not yet appended to the spill file, in arrival order
+        self._spill_buffer: List[dict] = []
+        self._spill_offset = 0
+        self._done_keys: "OrderedDict[str, None]" = OrderedDict()
+        self._active: Set[str] = set()
+        # Awaited as on_result(job, delivered) when a job completes or is given up
+        self.on_result: Optional[Callable[[dict, bool], Awaitable[None]]] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._io_lock = asyncio.Lock()
+        self._io: Optional[asyncio.Future] = None
+        self._dirty = False
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+
+    def __len__(self) -> int:
+        return len(self.jobs) + len(self._spilled_keys)
+
+    def enqueue(self, player_name: str, messages: List[str], key: Optional[str] = None,
+                meta: Optional[dict] = None) -> bool:
+        """Queue messages for a player; False if this key was already queued or delivered"""
+        key = key or f"{player_name}:{time.time_ns()}"
+        if key in self.jobs or key in self._spilled_keys or key in self._done_keys:
+            return False
+        now = time.time()
+        job = {
+            'key': key, 'player': player_name, 'messages': list(messages), 'sent': 0,
+            'attempts': 0, 'next_at': now, 'created': now, 'meta': meta or {},
+        }
+        # Once anything is spilled, later jobs follow it to keep arrival order
+        if len(self.jobs) >= self.max_in_memory or self._spilled_keys:
+            self._spill(job)
+        else:
+            self.jobs[key] = job
+        self._dirty = True
+        self._wake.set()
+        return True
+
+    def _spill(self, job: dict):
+        # Buffered here; the flush loop (or the next refill) appends it to the file
+        self._spill_buffer.append(job)
+        self._spilled_keys.add(job['key'])
+
+    def _append_spill(self, jobs: List[dict]):
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, 'a', encoding='utf-8') as file:
+            file.write("".join(json.dumps(job, ensure_ascii=False) + "\n" for job in jobs))
+
+    def _read_spill(self, offset: int, room: int) -> Tuple[List[dict], int, bool]:
+        """Read up to room jobs from offset; removes the file once fully read"""
+        jobs = []
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as file:
+                file.seek(offset)
+                while len(jobs) < room:
+                    line = file.readline()
+                    if not line:
+                        break
+                    offset = file.tell()
+                    try:
+                        jobs.append(json.loads(line))
+                    except ValueError:
+                        continue
+                at_end = not file.readline()
+        except FileNotFoundError:
+            return jobs, 0, True
+        if at_end:
+            # Everything was read back: start a fresh spill file
+            offset = 0
+            try:
+                os.remove(self.spill_path)
+            except FileNotFoundError:
+                pass
+        return jobs, offset, at_end
+
+    async def _in_thread(self, func: Callable[..., Any], *args) -> Any:
+        """Run a blocking file operation in a worker thread (caller holds _io_lock)
+
+        Shielded and remembered so a cancelled caller never leaves the
+        operation racing the next one; stop() waits for it.
+        """
+        if self._io and not self._io.done():
+            await asyncio.wait([self._io])
+        self._io = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        return await asyncio.shield(self._io)
+
+    async def _write_spill(self):
+        """Append buffered spill jobs to the spill file (caller holds _io_lock)"""
+        if not self._spill_buffer:
+            return
+        batch, self._spill_buffer = self._spill_buffer, []
+        try:
+            await self._in_thread(self._append_spill, batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._spill_buffer[:0] = batch
+            logger.error(f"Could not append to outbound spill file: {e}")
+
+    async def _refill(self):
+        """Move spilled jobs back into memory as room frees up"""
+        if not self._spilled_keys or len(self.jobs) >= self.max_in_memory:
+            return
+        async with self._io_lock:
+            # File first, then whatever is still buffered, to keep arrival order
+            await self._write_spill()
+            jobs, self._spill_offset, at_end = await self._in_thread(
+                self._read_spill, self._spill_offset, self.max_in_memory - len(self.jobs))
+            if at_end:
+                # Only left in the buffer when the append failed
+                room = self.max_in_memory - len(self.jobs) - len(jobs)
+                jobs.extend(self._spill_buffer[:room])
+                del self._spill_buffer[:room]
+        for job in jobs:
+            self._spilled_keys.discard(job.get('key'))
+            if job.get('key') and job['key'] not in self._done_keys:
+                self.jobs[job['key']] = job
+        if at_end and not self._spill_buffer:
+            self._spilled_keys.clear()
+        self._dirty = True
+
+    def load(self):
+        """Restore queued jobs (memory snapshot + unread part of the spill file)"""
+        saved = self.store.load('outbox', {}) or {}
+        for job in saved.get('jobs', []):
+            if isinstance(job, dict) and job.get('key'):
+                self.jobs[job['key']] = job
+        self._spill_offset = int(saved.get('spill_offset', 0))
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as file:
+                file.seek(self._spill_offset)
+                for line in file:
+                    try:
+                        self._spilled_keys.add(json.loads(line)['key'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            self._spill_offset = 0
+        if len(self):
+            logger.info(f"Restored {len(self)} queued in-game message(s)")
+
+    def _snapshot(self) -> dict:
+        # Jobs are copied: deliveries keep updating them while the write runs
+        return {'jobs': [dict(job) for job in self.jobs.values()], 'spill_offset': self._spill_offset}
+
+    def flush(self):
+        """Persist the queue now, blocking (shutdown path)"""
+        try:
+            if self._spill_buffer:
+                self._append_spill(self._spill_buffer)
+                self._spill_buffer = []
+            self.store.save('outbox', self._snapshot())
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Could not persist outbound queue: {e}")
+
+    async def flush_async(self):
+        """Persist the queue from a worker thread; the snapshot is taken on the loop"""
+        async with self._io_lock:
+            await self._write_spill()
+            self._dirty = False
+            try:
+                await self._in_thread(self.store.save, 'outbox', self._snapshot())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"Could not persist outbound queue: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, flush: bool = True):
+        """Stop the tasks; flush=False when another instance now owns the persisted state"""
+        for task in (self._task, self._flush_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._flush_task = None
+        if self._io and not self._io.done():
+            await asyncio.wait([self._io])
+        if flush:
+            self.flush()
+
+    async def drain(self, timeout: float) -> bool:
+        """Keep delivering until the queue is empty, or only holds retries due after the deadline
+
+        Whatever is left is persisted by stop() and resumed on the next start.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            await self._refill()
+            if not self.jobs and not self._active:
+                return True
+            if not self._active and min(j['next_at'] for j in self.jobs.values()) > deadline:
+                return False
+            self._wake.set()
+            await asyncio.sleep(0.05)
+        return not self.jobs
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(2)
+            if self._dirty:
+                await self.flush_async()
+
+    async def _run(self):
+        while True:
+            await self._refill()
+            now = time.time()
+            # Only the oldest job of each player is eligible, so per-player order holds
+            heads: Dict[str, dict] = {}
+            for job in self.jobs.values():
+                heads.setdefault(job['player'], job)
+            waiting = [j for j in heads.values() if j['player'] not in self._active]
+            for job in waiting:
+                if len(self._active) >= self.concurrency:
+                    break
+                if job['next_at'] <= now:
+                    self._active.add(job['player'])
+                    asyncio.create_task(self._attempt(job))
+
+            self._wake.clear()
+            pending = [j['next_at'] for j in waiting if j['player'] not in self._active]
+            timeout = max(0.0, min(pending) - time.time()) if pending and len(self._active) < self.concurrency else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _attempt(self, job: dict):
+        player_name = job['player']
+        try:
+            remaining = job['messages'][job['sent']:]
+            job['sent'] += await self.client.send_messages_to_player(player_name, remaining)
+            if job['sent'] >= len(job['messages']):
+                await self._finish(job, True)
+                return
+
+            job['attempts'] += 1
+            if time.time() - job['created'] > self.max_age:
+                logger.warning(f"Giving up on message to {player_name} after {job['attempts']} attempt(s)")
+                await self._finish(job, False)
+                return
+            if await self._player_left(player_name):
+                logger.info(f"{player_name} left the server, dropping queued message")
+                await self._finish(job, False)
+                return
+            delay = min(self.max_delay, self.base_delay * 2 ** (job['attempts'] - 1))
+            job['next_at'] = time.time() + delay
+            self.retries += 1
+            self._dirty = True
+            logger.info(f"Message to {player_name} failed, retry {job['attempts']} in {delay:.0f}s")
+        except Exception as e:
+            logger.error(f"Outbound delivery to {player_name} crashed: {e}")
+            job['next_at'] = time.time() + self.max_delay
+        finally:
+            self._active.discard(player_name)
+            self._wake.set()
+
+    async def _player_left(self, player_name: str) -> bool:
+        """True only when the roster is known and the player is not on it"""
+        players = await self.client.get_players()
+        if not players:
+            # Empty roster usually means CRCON itself is failing: keep retrying
+            return False
+        return not any(p.get('name') == player_name for p in players)
+
+    async def _finish(self, job: dict, delivered: bool):
+        self.jobs.pop(job['key'], None)
+        self._done_keys[job['key']] = None
+        while len(self._done_keys) > 1000:
+            self._done_keys.popitem(last=False)
+        if delivered:
+            self.delivered += 1
+        else:
+            self.failed += 1
+        self._dirty = True
+        if self.on_result:
+            try:
+                await self.on_result(job, delivered)
+            except Exception as e:
+                logger.error(f"Outbound result callback failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': len(self.jobs), 'spilled': len(self._spilled_keys),
+            'delivered': self.delivered, 'failed': self.failed, 'retries': self.retries,
+        }
@@ -0,0 +1,131 @@
+﻿import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# CRCON penalty names -> labels shown to admins
+PENALTY_LABELS = {
+    'PUNISH': 'punitions',
+    'KICK': 'kicks',
+    'TEMPBAN': 'bans temporaires',
+    'PERMABAN': 'bans définitifs',
+}
+
+class PlayerProfileCache:
+    """LRU + TTL cache of CRCON player profiles, keyed by player_id"""
+
+    def __init__(self, fetch: Callable[..., Awaitable[Any]], config):
+        self.fetch = fetch
+        self.ttl = float(config.get('crcon.profile_cache.ttl_seconds', 900))
+        self.max_size = int(config.get('crcon.profile_cache.max_entries', 500))
+        # player_id -> (fetched_at, summary)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, player_id: str) -> Optional[dict]:
+        """Cached summary if present and fresh, without fetching"""
+        entry = self._entries.get(player_id)
+        if not entry:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[player_id]
+            return None
+        self._entries.move_to_end(player_id)
+        return entry[1]
+
+    def prefetch(self, player_id: str, player_name: Optional[str] = None) -> "asyncio.Future":
+        """Start (or join) a background fetch; the result is a summary dict or None"""
+        cached = self.peek(player_id)
+        if cached is not None:
+            self.hits += 1
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(cached)
+            return future
+        task = self._inflight.get(player_id)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._load(player_id, player_name))
+            self._inflight[player_id] = task
+        return task
+
+    async def get(self, player_id: str, player_name: Optional[str] = None) -> Optional[dict]:
+        return await self.prefetch(player_id, player_name)
+
+    async def _load(self, player_id: str, player_name: Optional[str]) -> Optional[dict]:
+        try:
+            profile = await self.fetch('get_player_profile', {'player_id': player_id})
+            if not profile:
+                params = {'player_id': player_id}
+                if player_name:
+                    params['player_name'] = player_name
+                profile = await self.fetch('get_detailed_player_info', params)
+            if not profile:
+                return None
+            summary = self.summarize(profile)
+            self._entries[player_id] = (time.monotonic(), summary)
+            self._entries.move_to_end(player_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return summary
+        except Exception as e:
+            logger.warning(f"Profile fetch failed for {player_id}: {e}")
+            return None
+        finally:
+            self._inflight.pop(player_id, None)
+
+    @staticmethod
+    def summarize(profile: dict) -> dict:
+        """Keep only what triage needs: playtime, sessions and sanctions"""
+        summary: Dict[str, Any] = {}
+        playtime = profile.get('total_playtime_seconds') or profile.get('playtime_seconds')
+        if playtime:
+            summary['playtime_hours'] = int(playtime) // 3600
+        sessions = profile.get('sessions_count')
+        if sessions:
+            summary['sessions'] = sessions
+
+        penalties = {}
+        counts = profile.get('penalty_count')
+        if isinstance(counts, dict):
+            penalties = {k: v for k, v in counts.items() if v}
+        else:
+            for action in profile.get('received_actions') or []:
+                kind = action.get('action_type') if isinstance(action, dict) else None
+                if kind in PENALTY_LABELS:
+                    penalties[kind] = penalties.get(kind, 0) + 1
+        summary['penalties'] = penalties
+
+        if profile.get('is_blacklisted') or profile.get('blacklist'):
+            summary['blacklisted'] = True
+        if profile.get('is_vip'):
+            summary['vip'] = True
+        return summary
+
+    @staticmethod
+    def describe(summary: Optional[dict]) -> str:
+        """One embed field value for a profile summary"""
+        if not summary:
+            return "Profil indisponible"
+        parts = []
+        if 'playtime_hours' in summary:
+            parts.append(f"⏱️ {summary['playtime_hours']} h de jeu")
+        if 'sessions' in summary:
+            parts.append(f"{summary['sessions']} sessions")
+        penalties = summary.get('penalties') or {}
+        if penalties:
+            parts.append(", ".join(f"{n} {PENALTY_LABELS.get(k, k.lower())}" for k, n in penalties.items()))
+        else:
+            parts.append("aucune sanction")
+        if summary.get('blacklisted'):
+            parts.append("⛔ blacklisté")
+        if summary.get('vip'):
+            parts.append("⭐ VIP")
+        return " - ".join(parts)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
@@ -0,0 +1,205 @@
+﻿import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from .commands import RconCommands
+
+logger = logging.getLogger(__name__)
+
+class RconError(Exception):
+    """Raised when the HLL RCON server refuses or drops a command"""
+
+class RconConnection:
+    """One authenticated HLL RCON socket (XOR-obfuscated text protocol)"""
+
+    READ_SIZE = 32768
+
+    def __init__(self, host: str, port: int, password: str, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.key: bytes = b""
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    def _xor(self, data: bytes, offset: int = 0) -> bytes:
+        key = self.key
+        size = len(key)
+        return bytes(b ^ key[(i + offset) % size] for i, b in enumerate(data))
+
+    async def connect(self):
+        """Open the socket, read the XOR key and log in"""
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        self.key = await asyncio.wait_for(self.reader.readexactly(4), self.timeout)
+        response = await self.execute(f"login {self.password}")
+        if response.strip() != "SUCCESS":
+            await self.close()
+            raise RconError("RCON login refused")
+        logger.info(f"RCON connection authenticated on {self.host}:{self.port}")
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+
+    async def execute(self, command: str, multipart: bool = False) -> str:
+        """Send one command and return the decoded response"""
+        if not self.connected:
+            raise RconError("RCON connection is not open")
+        self.writer.write(self._xor(command.encode("utf-8")))
+        await self.writer.drain()
+
+        # The protocol has no framing: list responses are "count\titem\titem..."
+        # and may span several reads, everything else fits in one read.
+        data = b""
+        while True:
+            chunk = await asyncio.wait_for(self.reader.read(self.READ_SIZE), self.timeout)
+            if not chunk:
+                await self.close()
+                raise RconError("RCON connection closed by server")
+            data += self._xor(chunk, len(data))
+            if not multipart or self._is_complete_list(data):
+                break
+        return data.decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _is_complete_list(data: bytes) -> bool:
+        head, sep, _ = data.partition(b"\t")
+        try:
+            count = int(head)
+        except ValueError:
+            return True
+        if count == 0:
+            return True
+        return bool(sep) and data.count(b"\t") >= count
+
+class RconUnavailable(RconError):
+    """Raised without touching the network while the circuit breaker is open"""
+
+class RconPool:
+    """Pool of persistent RCON connections; one command in flight per socket
+
+    After breaker_failures consecutive failed commands the circuit opens for
+    breaker_seconds: commands fail fast with RconUnavailable (callers fall back to
+    the CRCON API) instead of each waiting for the timeouts. The first command after
+    the window is a trial; a success closes the circuit, a failure reopens it.
+    """
+
+    def __init__(self, host: str, port: int, password: str, size: int = 2, timeout: float = 5.0,
+                 breaker_failures: int = 3, breaker_seconds: float = 30.0):
+        self.host = host
+        self.port = int(port)
+        self.password = password
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.breaker_failures = max(1, int(breaker_failures))
+        self.breaker_seconds = breaker_seconds
+        self.failures = 0
+        self.open_until = 0.0
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[RconConnection] = []
+
+    @classmethod
+    def from_config(cls, config) -> Optional["RconPool"]:
+        """Build a pool from the rcon.* section, or None when direct RCON is disabled"""
+        if not config.get('rcon.enabled', False):
+            return None
+        host = config.get('rcon.host')
+        port = config.get('rcon.port')
+        password = config.get('rcon.password')
+        if not host or not port or not password:
+            logger.warning("rcon.enabled is set but rcon.host/port/password are incomplete")
+            return None
+        return cls(
+            host, int(port), password,
+            size=int(config.get('rcon.pool_size', 2)),
+            timeout=float(config.get('rcon.timeout_seconds', 5)),
+            breaker_failures=int(config.get('rcon.breaker_failures', 3)),
+            breaker_seconds=float(config.get('rcon.breaker_seconds', 30)),
+        )
+
+    async def start(self):
+        """Open and authenticate every connection of the pool"""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = RconConnection(self.host, self.port, self.password, self.timeout)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+        await asyncio.gather(*(c.connect() for c in self._connections), return_exceptions=True)
+        ready = sum(1 for c in self._connections if c.connected)
+        logger.info(f"RCON pool ready: {ready}/{self.size} connection(s)")
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._idle = None
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    async def execute(self, command: str, multipart: bool = False) -> str:
+        """Run a command on the next idle connection, reconnecting once on failure"""
+        if self.circuit_open:
+            raise RconUnavailable(f"RCON unavailable, retrying in {self.open_until - time.monotonic():.0f}s")
+        if self._idle is None:
+            await self.start()
+        conn = await self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if not conn.connected:
+                        await conn.connect()
+                    response = await conn.execute(command, multipart=multipart)
+                    self.failures = 0
+                    return response
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+                    await conn.close()
+                    if attempt:
+                        self._record_failure()
+                        raise RconError(f"RCON command failed: {e}") from e
+                    logger.warning(f"RCON connection dropped ({e}), reconnecting")
+        finally:
+            self._idle.put_nowait(conn)
+
+    def _record_failure(self):
+        self.failures += 1
+        if self.failures >= self.breaker_failures:
+            self.open_until = time.monotonic() + self.breaker_seconds
+            logger.warning(f"RCON failed {self.failures} time(s) in a row, "
+                           f"using the CRCON API for {self.breaker_seconds:.0f}s")
+
+    async def execute_many(self, commands: List[str]) -> List[str]:
+        """Spread several commands over the pool; results keep the input order"""
+        return list(await asyncio.gather(*(self.execute(c) for c in commands)))
+
+    async def message_player(self, player_name: str, message: str) -> bool:
+        """False when the server refuses or the name cannot be quoted (caller falls back)"""
+        try:
+            command = RconCommands.message_player_command(player_name, message)
+        except ValueError as e:
+            logger.warning(f"Not messaging over RCON: {e}")
+            return False
+        response = await self.execute(command)
+        return response.strip() == "SUCCESS"
+
+    async def get_players(self) -> list:
+        """Current roster as PlayerRecord objects (dict-style .get() compatible)"""
+        response = await self.execute(RconCommands.get_playerids_command(), multipart=True)
+        return RconCommands.parse_players_response(response)
@@ -0,0 +1,86 @@
+﻿import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class StubRconServer:
+    """Local stand-in for an HLL server's RCON port (tests and benchmarks)"""
+
+    def __init__(self, password: str = "stub", players: Optional[Dict[str, str]] = None,
+                 latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.password = password
+        # player_name -> player_id
+        self.players: Dict[str, str] = dict(players or {})
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.map_name = "stmereeglise_warfare"
+        self.messages: List[tuple] = []
+        self.commands: List[str] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Stub RCON server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @staticmethod
+    def _xor(key: bytes, data: bytes) -> bytes:
+        return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        key = os.urandom(4)
+        writer.write(key)
+        await writer.drain()
+        authed = False
+        try:
+            while True:
+                data = await reader.read(32768)
+                if not data:
+                    break
+                command = self._xor(key, data).decode("utf-8", errors="replace")
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if command.startswith("login "):
+                    authed = command[6:] == self.password
+                    response = "SUCCESS" if authed else "FAIL"
+                elif not authed:
+                    response = "FAIL"
+                else:
+                    self.commands.append(command)
+                    response = self.respond(command)
+                writer.write(self._xor(key, response.encode("utf-8")))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def respond(self, command: str) -> str:
+        """Answer one authenticated command the way the game server does"""
+        if command == "get playerids":
+            items = [f"{name} : {pid}" for name, pid in self.players.items()]
+            return "\t".join([str(len(items))] + items)
+        if command == "get players":
+            return "\t".join([str(len(self.players))] + list(self.players))
+        if command == "get map":
+            return self.map_name
+        if command == "get name":
+            return "Stub HLL Server"
+        if command.startswith("message "):
+            # message "Player Name" "text"
+            _, _, rest = command.partition(' "')
+            name, _, text = rest.partition('" ')
+            if name not in self.players:
+                return "FAIL"
+            self.messages.append((name, text.strip('"')))
+            return "SUCCESS"
+        return "FAIL"
@@ -0,0 +1,134 @@
+﻿import logging
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+from utils.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('pool_wait', 'dns', 'connect', 'server')
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def endpoint_of(url) -> str:
+    """'/api/get_live_game_stats' -> 'get_live_game_stats', '/ws/logs' -> 'ws/logs'"""
+    path = url.path.strip('/')
+    return path[4:] if path.startswith('api/') else path or '/'
+
+class RequestTracer:
+    """aiohttp TraceConfig feeding per-endpoint CRCON request metrics
+
+    Per request: pool wait, DNS (cache misses only), connect (TCP + TLS, including DNS,
+    new connections only), server time (request sent -> response headers), total,
+    reused vs new connection, response size. aiohttp reports no separate TLS event, so
+    the TLS handshake is part of `connect`. Requests slower than `slow_seconds` are
+    logged with that breakdown.
+    """
+
+    def __init__(self, slow_seconds: float = 1.0, registry: MetricsRegistry = REGISTRY):
+        self.slow_seconds = slow_seconds
+        self.total = registry.histogram('crcon_http_request_seconds',
+                                        'CRCON request start to response headers, per endpoint')
+        self.phases = registry.histogram('crcon_http_phase_seconds',
+                                         'CRCON request phases (pool_wait, dns, connect, server)')
+        self.sizes = registry.histogram('crcon_http_response_bytes', 'CRCON response size', SIZE_BUCKETS)
+        self.body_bytes = registry.counter('crcon_http_body_bytes_total', 'CRCON response body bytes read')
+        self.connections = registry.counter('crcon_http_connections_total',
+                                            'CRCON requests by connection kind (reused/new)')
+        self.errors = registry.counter('crcon_http_errors_total', 'CRCON requests failed before a response')
+        self.endpoints: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config) -> Optional["RequestTracer"]:
+        if not config.get('crcon.tracing.enabled', True):
+            return None
+        return cls(slow_seconds=float(config.get('crcon.tracing.slow_request_ms', 1000)) / 1000)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig(trace_config_ctx_factory=self._context)
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_queued_start.append(self._mark('queued'))
+        trace.on_connection_queued_end.append(self._phase_end('queued', 'pool_wait'))
+        trace.on_connection_create_start.append(self._on_create_start)
+        trace.on_connection_create_end.append(self._phase_end('create', 'connect'))
+        trace.on_dns_resolvehost_start.append(self._mark('dns'))
+        trace.on_dns_resolvehost_end.append(self._phase_end('dns', 'dns'))
+        trace.on_request_headers_sent.append(self._mark('sent'))
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_response_chunk_received.append(self._on_chunk)
+        trace.on_request_exception.append(self._on_request_exception)
+        return trace
+
+    @staticmethod
+    def _context(trace_request_ctx=None) -> SimpleNamespace:
+        return SimpleNamespace(trace_request_ctx=trace_request_ctx, marks={}, timings={},
+                               reused=True, endpoint='?', started=0.0)
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.endpoint = endpoint_of(params.url)
+        ctx.started = time.monotonic()
+
+    def _mark(self, name: str):
+        async def callback(session, ctx, params):
+            ctx.marks[name] = time.monotonic()
+        return callback
+
+    def _phase_end(self, mark: str, phase: str):
+        async def callback(session, ctx, params):
+            started = ctx.marks.get(mark)
+            if started is not None:
+                ctx.timings[phase] = time.monotonic() - started
+        return callback
+
+    async def _on_create_start(self, session, ctx, params):
+        ctx.reused = False
+        ctx.marks['create'] = time.monotonic()
+
+    async def _on_request_end(self, session, ctx, params):
+        now = time.monotonic()
+        sent = ctx.marks.get('sent')
+        if sent is not None:
+            ctx.timings['server'] = now - sent
+        total = now - ctx.started
+        endpoint = ctx.endpoint
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+        self.total.observe(total, endpoint=endpoint)
+        for phase, seconds in ctx.timings.items():
+            self.phases.observe(seconds, endpoint=endpoint, phase=phase)
+        self.connections.inc(endpoint=endpoint, kind='reused' if ctx.reused else 'new')
+        size = params.response.content_length
+        if size is not None:
+            self.sizes.observe(size, endpoint=endpoint)
+        if total >= self.slow_seconds:
+            breakdown = ', '.join(f"{phase} {ctx.timings[phase] * 1000:.0f}ms" for phase in PHASES if phase in ctx.timings)
+            logger.warning(f"Slow CRCON request {params.method} {endpoint}: {total * 1000:.0f}ms "
+                           f"({'reused' if ctx.reused else 'new'} connection; {breakdown}; "
+                           f"status {params.response.status}, {size if size is not None else '?'} bytes)")
+        else:
+            logger.debug(f"CRCON {params.method} {endpoint}: {total * 1000:.0f}ms "
+                         f"({'reused' if ctx.reused else 'new'} connection)")
+
+    async def _on_chunk(self, session, ctx, params):
+        self.body_bytes.inc(len(params.chunk), endpoint=ctx.endpoint)
+
+    async def _on_request_exception(self, session, ctx, params):
+        self.errors.inc(endpoint=ctx.endpoint)
+        self.endpoints.setdefault(ctx.endpoint, 0)
+        logger.warning(f"CRCON request {params.method} {ctx.endpoint} failed after "
+                       f"{(time.monotonic() - ctx.started) * 1000:.0f}ms: {params.exception!r}")
+
+    def stats(self) -> dict:
+        """Per-endpoint request counts and latency bucket bounds (p50/p95) for /debug/state"""
+        stats = {}
+        for endpoint, count in sorted(self.endpoints.items()):
+            new = self.connections.get(endpoint=endpoint, kind='new')
+            stats[endpoint] = {
+                'requests': count,
+                'new_connections': int(new),
+                'p50_le_seconds': self.total.quantile(0.5, endpoint=endpoint),
+                'p95_le_seconds': self.total.quantile(0.95, endpoint=endpoint),
+                'errors': int(self.errors.get(endpoint=endpoint)),
+            }
+        return stats
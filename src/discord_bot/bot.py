@@ -1,8 +1,19 @@
 ﻿import discord
 from discord.ext import commands
+import asyncio
 import logging
-from typing import Dict, Optional, List
-from datetime import datetime
+import re
+import time
+from typing import Dict, Optional, List, Set, Tuple
+from datetime import datetime, timezone
+from utils.state import StateStore
+from utils.scheduler import TimerScheduler
+from utils.ratelimit import TokenBucket
+from .live_message import LiveMessage
+from .surge import SurgeDetector
+from .routing import RoutingContext, STATUS_TAGS
+from crcon.formatting import format_admin_reply
+from crcon.outbox import OutboundQueue
 
 logger = logging.getLogger(__name__)
 
@@ -47,24 +58,8 @@ class CloseTicketView(discord.ui.View):
                 pass
 
             
-            # Remove player from active tickets tracking (Discord bot)
-            if self.player_name in self.discord_bot.player_tickets:
-                del self.discord_bot.player_tickets[self.player_name]
-            
-            # Remove from active threads (Discord bot)
-            if self.player_name in self.discord_bot.active_threads:
-                del self.discord_bot.active_threads[self.player_name]
-                
-            # Remove from active button messages (Discord bot)
-            if self.player_name in self.discord_bot.active_button_messages:
-                del self.discord_bot.active_button_messages[self.player_name]
-
-            # Clear claimed state for this player (so future tickets start fresh)
-            if self.player_name in self.discord_bot.claimed_by:
-                del self.discord_bot.claimed_by[self.player_name]
-            
-            # FIXED: Also clean up CRCON client tracking
-            self.discord_bot.crcon_client.unregister_admin_thread(self.player_name)
+            # Drop all tracking (Discord bot, CRCON client, timers) so future tickets start fresh
+            self.discord_bot.forget_ticket(self.player_name)
 
             # Archive and lock the thread to match CRCON behavior
             try:
@@ -74,18 +69,16 @@ class CloseTicketView(discord.ui.View):
             except Exception:
                 pass
             
-            # Send confirmation message to player
+            # Send confirmation message to player (queued: retried while they are connected)
             try:
-                if hasattr(self.discord_bot, 'crcon_client') and self.discord_bot.crcon_client:
-                    await self.discord_bot.crcon_client.send_message_to_player(
-                        self.player_name,
-                        f"Votre ticket admin a été fermé par un modérateur. Merci !"
-                    )
-                    print(f"✅. Sent close confirmation to player: {self.player_name}")
-                else:
-                    print(f"⚠️ CRCON client not available to send close confirmation")
+                self.discord_bot.notify_player(
+                    self.player_name,
+                    "Votre ticket admin a été fermé par un modérateur. Merci !",
+                    key=f"close:{interaction.message.channel.id}"
+                )
+                print(f"✅. Queued close confirmation to player: {self.player_name}")
             except Exception as msg_error:
-                print(f"⚠️ Could not send close confirmation to player: {msg_error}")
+                print(f"⚠️ Could not queue close confirmation to player: {msg_error}")
                 
             print(f"🔧 Ticket closed for {self.player_name} by {interaction.user.display_name}")
 
@@ -119,16 +112,19 @@ class ClaimTicketView(discord.ui.View):
 
             # Notify player in-game via CRCON
             try:
-                if hasattr(self.discord_bot, 'crcon_client') and self.discord_bot.crcon_client:
-                    await self.discord_bot.crcon_client.send_message_to_player(
-                        self.player_name,
-                        "Un modérateur s'occupe maintenant de votre demande."
-                    )
+                self.discord_bot.notify_player(
+                    self.player_name,
+                    "Un modérateur s'occupe maintenant de votre demande.",
+                    key=f"claim:{interaction.message.channel.id}"
+                )
             except Exception:
                 pass
             # Record claimer for future panels and normalize status windows: keep only this message
             try:
                 self.discord_bot.claimed_by[self.player_name] = interaction.user.display_name
+                self.discord_bot.claimer_ids[self.player_name] = interaction.user.id
+                self.discord_bot.schedule_ticket_timers(self.player_name, 'claimed')
+                self.discord_bot.refresh_live_views()
                 msg_id = interaction.message.id
                 self.discord_bot.current_status_message[self.player_name] = msg_id
                 # Delete any other previous status messages
@@ -177,20 +173,8 @@ class ClaimTicketView(discord.ui.View):
             self.clear_items()
             await interaction.response.edit_message(embed=closed_embed, view=None)
             
-            # Remove player from active tickets tracking (Discord bot)
-            if self.player_name in self.discord_bot.player_tickets:
-                del self.discord_bot.player_tickets[self.player_name]
-            
-            # Remove from active threads (Discord bot)
-            if self.player_name in self.discord_bot.active_threads:
-                del self.discord_bot.active_threads[self.player_name]
-                
-            # Remove from active button messages (Discord bot)
-            if self.player_name in self.discord_bot.active_button_messages:
-                del self.discord_bot.active_button_messages[self.player_name]
-            
-            # FIXED: Also clean up CRCON client tracking
-            self.discord_bot.crcon_client.unregister_admin_thread(self.player_name)
+            # Drop all tracking (Discord bot, CRCON client, timers)
+            self.discord_bot.forget_ticket(self.player_name)
 
             # Archive and lock the thread to match CRCON behavior
             try:
@@ -200,18 +184,16 @@ class ClaimTicketView(discord.ui.View):
             except Exception:
                 pass
             
-            # Send confirmation message to player
+            # Send confirmation message to player (queued: retried while they are connected)
             try:
-                if hasattr(self.discord_bot, 'crcon_client') and self.discord_bot.crcon_client:
-                    await self.discord_bot.crcon_client.send_message_to_player(
-                        self.player_name,
-                        f"Votre ticket admin a été fermé par un modérateur. Merci !"
-                    )
-                    print(f"Sent close confirmation to player: {self.player_name}")
-                else:
-                    print(f" CRCON client not available to send close confirmation")
+                self.discord_bot.notify_player(
+                    self.player_name,
+                    "Votre ticket admin a été fermé par un modérateur. Merci !",
+                    key=f"close:{interaction.message.channel.id}"
+                )
+                print(f"Queued close confirmation to player: {self.player_name}")
             except Exception as msg_error:
-                print(f" Could not send close confirmation to player: {msg_error}")
+                print(f" Could not queue close confirmation to player: {msg_error}")
                 
             print(f" Ticket closed for {self.player_name} by {interaction.user.display_name}")
             
@@ -223,11 +205,21 @@ class ClaimTicketView(discord.ui.View):
                 pass
 
 class DiscordBot:
-    def __init__(self, config, crcon_client):
+    # Ticket maps carried over from the previous instance in a handoff (see write_handoff)
+    HANDOFF_FIELDS = (
+        'player_tickets', 'active_threads', 'active_button_messages', 'claimed_by', 'claimer_ids',
+        'status_messages', 'claim_status_message', 'current_status_message', 'ticket_status',
+    )
+
+    def __init__(self, config, crcon_client, standby: bool = False):
         self.config = config
         self.crcon_client = crcon_client
-        self.active_threads: Dict[str, discord.Thread] = {}
-        self.active_button_messages: Dict[str, discord.Message] = {}
+        # Standby: logged in and warm, but ignores Discord events until activate() (handoff)
+        self.standby = standby
+        self.connected = asyncio.Event()
+        # Long-lived state keeps ids only; objects are resolved from the client cache on use
+        self.active_threads: Dict[str, int] = {}  # player -> thread id
+        self.active_button_messages: Dict[str, int] = {}  # player -> controls panel message id
         self.player_tickets: Dict[str, bool] = {}  # Track players with active tickets
         self.claimed_by: Dict[str, str] = {}  # Track who claimed a ticket
         # Track status window messages per player so we can delete older ones
@@ -236,19 +228,57 @@ class DiscordBot:
         self.claim_status_message: Dict[str, int] = {}
         # Track the current dynamic status message (latest) to delete before posting a new one
         self.current_status_message: Dict[str, int] = {}
+        # Set once the open forum posts have been loaded back after a restart
+        self.warm_started = False
+        # Persistent per-player ticket counts (keyed by platform id, else name)
+        self.state = StateStore.from_config(config)
+        self.ticket_history: Dict[str, int] = {}
+        # Written off the event loop, at most once a second (see record_ticket)
+        self._history_dirty = False
+        self._history_task: Optional[asyncio.Task] = None
+        # Discord user id of the claimer, for SLA nudges
+        self.claimer_ids: Dict[str, int] = {}
+        # Last status tag applied per ticket, so unchanged tags aren't re-sent
+        self.ticket_status: Dict[str, str] = {}
+
+        # Flood control: player lines are coalesced per ticket and posted under a token bucket
+        self.pending_responses: Dict[str, List[Tuple[str, str]]] = {}
+        self.response_flush_tasks: Dict[str, asyncio.Task] = {}
+        self.response_buckets: Dict[str, TokenBucket] = {}
+        self.response_embeds: Dict[str, dict] = {}
+        self.flood_warned_at: Dict[str, float] = {}
+        # Tickets opened from catch-up chat with no live line from the player since:
+        # no re-pings, and an auto-close stays silent in game (the player may be long gone)
+        self.catchup_tickets: Set[str] = set()
+
+        # Surge mode: above surge.threshold new tickets per window, role pings fold into one digest
+        self.surge = SurgeDetector.from_config(config)
+        self.surge_digest = LiveMessage(
+            self.render_surge_digest, float(config.get('surge.digest_edit_interval_seconds', 10))
+        )
+        self.surge_pinged_at = 0.0
+        self.surge_digest_mentions = True
+        self.surge_watch_task: Optional[asyncio.Task] = None
+
+        # Pinned queue dashboard (dashboard.channel_id), rendered from the ticket registry
+        self.dashboard = LiveMessage(
+            self.render_dashboard, float(config.get('dashboard.edit_interval_seconds', 5))
+        )
+        self.dashboard_task: Optional[asyncio.Task] = None
+
+        # !profile (profiling.*), created on first use
+        self.profiler = None
+
+        # Durable in-game message queue and ticket timers (see load_persisted_state)
+        self.load_persisted_state()
         
-        # Forum tags (will be populated on startup)
-        self.forum_tags = {
-            'NEW': None,
-            'REPLIED': None, 
-            'CLOSED': None
-        }
-        
-        # Set up Discord bot
-        intents = discord.Intents.default()
-        intents.message_content = True
+        # Forum handle, status tags and admin mentions (resolved on startup, see rebuild_routing)
+        self.routing = RoutingContext(admin_roles=config.get('discord.admin_roles', ()) or ())
         
-        self.bot = commands.Bot(command_prefix='!', intents=intents)
+        if hasattr(config, 'on_reload'):
+            config.on_reload(self.on_config_reload)
+
+        self.bot = self.build_client(config)
         
         # Set up event handlers
         self.setup_events()
@@ -256,21 +286,163 @@ class DiscordBot:
         # Set CRCON callbacks
         self.crcon_client.set_message_callback(self.handle_admin_request)
         self.crcon_client.set_player_response_callback(self.handle_player_response)
+        self.crcon_client.set_catchup_callback(self.handle_catchup_digest)
         
         print(f"Discord bot initialized")
         print(f"Admin channel ID: {self.config.get('discord.admin_channel_id')}")
     
-    def get_admin_mentions(self) -> str:
-    #"""Get admin role mentions"""
-        admin_roles = self.config.get('discord.admin_roles', [])
-        if not admin_roles:
-            return ""
-        
-        mentions = []
-        for role_id in admin_roles:
-            mentions.append(f"<@&{role_id}>")
+    @staticmethod
+    def build_client(config) -> commands.Bot:
+    #"""Discord client with a lean cache profile (also used by benchmarks/bench_discord_memory.py)"""
+        # The bot only needs guild channels/threads, thread messages (with content)
+        # and its own views - no member, presence or message caches
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.message_content = True
+        max_messages = config.get('discord.max_messages', 0)
         
-        return " ".join(mentions)
+        return commands.Bot(
+            command_prefix='!',
+            intents=intents,
+            max_messages=int(max_messages) if max_messages else None,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            chunk_guilds_at_startup=False,
+        )
+    
+    def load_persisted_state(self):
+    #"""(Re)load ticket history, the in-game message queue and the timers from the state dir"""
+        self.ticket_history = self.state.load('ticket_history', {}) or {}
+
+        # Durable in-game message queue (retry, dedupe, spill to disk); results update reactions
+        self.outbox = OutboundQueue(self.crcon_client, self.state, self.config)
+        self.outbox.on_result = self.on_outbound_result
+        self.outbox.load()
+
+        # One scheduler drives every ticket timer (re-ping, nudge, auto-close); threads are
+        # archived inline where tickets are closed
+        self.scheduler = TimerScheduler(self.state, 'ticket_timers')
+        self.scheduler.register('reping', self.on_reping_timer)
+        self.scheduler.register('nudge', self.on_nudge_timer)
+        self.scheduler.register('inactivity', self.on_inactivity_timer)
+        self.scheduler.load()
+
+    def write_handoff(self):
+    #"""Persist the open-ticket maps so the next instance can skip the forum scan"""
+        try:
+            snapshot = {field: getattr(self, field) for field in self.HANDOFF_FIELDS}
+            snapshot['crcon_threads'] = self.crcon_client.active_threads
+            snapshot['saved_at'] = time.time()
+            self.state.save('handoff', snapshot)
+        except Exception as e:
+            logger.error(f"Could not write handoff state: {e}")
+
+    def restore_handoff(self) -> bool:
+    #"""Load the ticket maps written by the previous instance (if fresh); False to fall back to warm_start"""
+        saved = self.state.load('handoff', {}) or {}
+        max_age = float(self.config.get('handoff.max_age_seconds', 120))
+        if not saved.get('saved_at') or time.time() - float(saved['saved_at']) > max_age:
+            return False
+        # One-shot: a later cold start must not pick up stale maps
+        self.state.save('handoff', {})
+        for field in self.HANDOFF_FIELDS:
+            getattr(self, field).update(saved.get(field) or {})
+        for player_name, info in (saved.get('crcon_threads') or {}).items():
+            self.crcon_client.register_admin_thread(player_name, info)
+        # Re-bind the buttons of each ticket's controls panel
+        for player_name, message_id in self.active_button_messages.items():
+            view_cls = CloseTicketView if player_name in self.claimed_by else ClaimTicketView
+            self.bot.add_view(view_cls(player_name, self), message_id=message_id)
+        for player_name in self.active_threads:
+            self.schedule_ticket_timers(player_name, 'restored')
+        print(f"Handoff: took over {len(self.active_threads)} open ticket(s)")
+        logger.info(f"Handoff restored {len(self.active_threads)} open ticket(s)")
+        return True
+
+    async def activate(self):
+    #"""Become the dispatching instance: restore tickets, start timers/queue, open the CRCON gate"""
+        if self.standby:
+            # The previous instance persisted its queue, timers and cursor when it released the lock
+            self.standby = False
+            self.load_persisted_state()
+            self.crcon_client.reload_cursor()
+        await self.connected.wait()
+        if self.warm_started:
+            return
+        self.warm_started = True
+        self.rebuild_routing()
+        try:
+            if self.restore_handoff():
+                await self.setup_forum_tags()
+            else:
+                # Tag setup (may create tags over REST) and the forum scan run concurrently
+                await asyncio.gather(self.setup_forum_tags(), self.warm_start())
+        finally:
+            self.scheduler.start()
+            self.outbox.start()
+            self.crcon_client.open_dispatch_gate()
+        await self.setup_dashboard()
+
+    async def demote(self):
+    #"""Back to standby after losing the dispatch lease: stop timers, queue and live messages
+    #without persisting anything (the new leader loaded that state and owns it now)"""
+        if self.standby:
+            return
+        self.standby = True
+        self.warm_started = False
+        tasks = [self.dashboard_task, self.surge_watch_task, self._history_task, *self.response_flush_tasks.values()]
+        for task in tasks:
+            if task and not task.done():
+                task.cancel()
+        self.response_flush_tasks.clear()
+        self.pending_responses.clear()
+        self._history_dirty = False
+        self.dashboard.abandon()
+        self.surge_digest.abandon()
+        await self.scheduler.stop(flush=False)
+        await self.outbox.stop(flush=False)
+        # A later takeover rebuilds the open tickets from the handoff file or the forum
+        for field in self.HANDOFF_FIELDS:
+            getattr(self, field).clear()
+        self.catchup_tickets.clear()
+        self.crcon_client.active_threads.clear()
+        print("Dispatch lease lost: back in standby")
+        logger.warning("Demoted to standby")
+
+    def get_admin_mentions(self) -> str:
+    #"""Get admin role mentions (pre-rendered in the routing context)"""
+        return self.routing.mentions
+
+    @property
+    def forum_tags(self) -> Dict[str, Optional[discord.ForumTag]]:
+        return self.routing.tags
+
+    def rebuild_routing(self, forum: Optional[discord.ForumChannel] = None, tags: Optional[Dict] = None):
+    #"""Re-resolve the forum handle, status tags and mentions (forum/tags passed in when just created)"""
+        if forum is not None:
+            self.routing = RoutingContext(forum, tags, self.config.get('discord.admin_roles', ()) or ())
+        else:
+            self.routing = RoutingContext.resolve(self.bot, self.config)
+        logger.info(f"Routing: forum={self.routing.forum_id} tags={sorted(self.routing.tag_names.values())}")
+
+    def on_config_reload(self, snapshot, changed):
+    #"""Apply live config changes to components that copied settings at startup"""
+        if 'discord.admin_channel_id' in changed or 'discord.admin_roles' in changed:
+            self.rebuild_routing()
+            if 'discord.admin_channel_id' in changed and self.warm_started:
+                # New forum: make sure it has the status tags
+                asyncio.create_task(self.setup_forum_tags())
+        if any(key.startswith('surge.') for key in changed):
+            self.surge.configure(self.config)
+            self.surge_digest.min_interval = float(self.config.get('surge.digest_edit_interval_seconds', 10))
+        if 'dashboard.edit_interval_seconds' in changed:
+            self.dashboard.min_interval = float(self.config.get('dashboard.edit_interval_seconds', 5))
+        if any(key.startswith('crcon.context_ttl_seconds.') for key in changed):
+            self.crcon_client.game_context.configure(self.config)
+        if 'dashboard.channel_id' in changed and self.warm_started:
+            # Re-home the dashboard in the new channel
+            self.dashboard.message = None
+            asyncio.create_task(self.setup_dashboard())
     
     def setup_events(self):
     #"""Set up Discord bot events"""
@@ -280,12 +452,35 @@ class DiscordBot:
             print(f"{self.bot.user} has connected to Discord!")
             logger.info(f'{self.bot.user} has connected to Discord!')
             
-            # Setup forum tags
-            await self.setup_forum_tags()
+            self.connected.set()
+            if self.standby:
+                # Resolve the forum/tags/mentions now so a takeover does not pay for it
+                self.rebuild_routing()
+                print("Standby: connected, waiting for the dispatch lock")
+                return
+
+            # Rebuild open tickets from the forum, then let CRCON dispatch (first connect only)
+            if not self.warm_started:
+                await self.activate()
+            else:
+                self.rebuild_routing()
+                await self.setup_forum_tags()
             
+        @self.bot.event
+        async def on_guild_channel_update(before, after):
+            # Tags renamed/added/removed on the admin forum: re-resolve them
+            if after.id == self.routing.forum_id:
+                self.rebuild_routing()
+
+        @self.bot.event
+        async def on_guild_channel_delete(channel):
+            if channel.id == self.routing.forum_id:
+                print(f"Admin forum {channel.id} was deleted")
+                self.rebuild_routing()
+
         @self.bot.event
         async def on_message(message):
-            if message.author == self.bot.user:
+            if message.author == self.bot.user or self.standby:
                 return
             
             if isinstance(message.channel, discord.Thread):
@@ -293,6 +488,17 @@ class DiscordBot:
             
             await self.bot.process_commands(message)
         
+        @self.bot.event
+        async def on_command_error(ctx, error):
+            # Permission refusals are answered in the channel (is_admin_ctx), not logged as errors
+            if isinstance(error, commands.MissingPermissions):
+                await ctx.send("Commande réservée aux administrateurs du serveur")
+                return
+            if isinstance(error, (commands.CheckFailure, commands.CommandNotFound)):
+                return
+            print(f"Command !{ctx.command} failed: {error}")
+            logger.error(f"Command !{ctx.command} failed: {error}")
+        
         # Add cleanup command
         @self.bot.command(name='cleanup_tickets')
         @commands.has_permissions(administrator=True)
@@ -301,9 +507,9 @@ class DiscordBot:
             cleaned = 0
             to_remove = []
             
-            for player_name, thread in self.active_threads.items():
+            for player_name, thread_id in self.active_threads.items():
                 try:
-                    await thread.fetch()
+                    await self.bot.fetch_channel(thread_id)
                 except (discord.NotFound, discord.Forbidden):
                     to_remove.append(player_name)
                     cleaned += 1
@@ -318,6 +524,18 @@ class DiscordBot:
                     del self.active_button_messages[player_name]
             
             await ctx.send(f"Cleaned up {cleaned} deleted ticket(s)")
+
+        @self.bot.command(name='msg')
+        @commands.check(self.is_admin_ctx)
+        async def msg(ctx, target: str = None, *, text: str = None):
+        #"""Message several players from a ticket: !msg squad|team <texte> or !msg "Nom1,Nom2" <texte>"""
+            await self.handle_fanout_command(ctx, target, text)
+
+        @self.bot.command(name='profile')
+        @commands.has_permissions(administrator=True)
+        async def profile(ctx, seconds: float = 30):
+        #"""Profile the bot for N seconds (profiling.enabled) - Admin only"""
+            await self.handle_profile_command(ctx, seconds)
     
     async def setup_forum_tags(self):
     #"""Setup or get existing forum tags"""
@@ -342,10 +560,11 @@ class DiscordBot:
             
             # Get existing tags or create them
             existing_tags = {tag.name: tag for tag in channel.available_tags}
+            tags = {}
             
-            for tag_name in ['NEW', 'REPLIED', 'CLOSED']:
+            for tag_name in STATUS_TAGS:
                 if tag_name in existing_tags:
-                    self.forum_tags[tag_name] = existing_tags[tag_name]
+                    tags[tag_name] = existing_tags[tag_name]
                     print(f"Found existing tag: {tag_name}")
                 else:
                     # Create the tag
@@ -356,32 +575,112 @@ class DiscordBot:
                             name=tag_name,
                             moderated=False
                         )
-                        self.forum_tags[tag_name] = new_tag
+                        tags[tag_name] = new_tag
                         print(f"Created new tag: {tag_name}")
                     except Exception as tag_error:
                         print(f"Failed to create tag {tag_name}: {tag_error}")
             
+            self.rebuild_routing(channel, tags)
             print(f"Forum tags setup complete!")
             
         except Exception as e:
             print(f"Error setting up forum tags: {e}")
             logger.error(f"Error setting up forum tags: {e}")
     
+    # "{date} {time} - {name} ({id})" as built in handle_admin_request; the id is a
+    # Steam64 or a 32-char hex platform id, so "(FR)" style name suffixes stay in the name
+    POST_NAME_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2} - (?P<name>.+?)(?: \((?P<id>\d{17}|[0-9a-fA-F]{32})\))?$')
+
+    async def warm_start(self):
+    #"""Repopulate ticket tracking from open (non-CLOSED) forum posts after a restart"""
+        try:
+            channel = self.routing.forum
+            if channel is None:
+                return
+
+            threads = {t.id: t for t in channel.threads}
+            try:
+                for t in await channel.guild.active_threads():
+                    if t.parent_id == channel.id:
+                        threads[t.id] = t
+            except Exception as e:
+                print(f"Warm start: could not list active threads ({e}), using cache only")
+
+            # Newest post per player wins
+            candidates: Dict[str, tuple] = {}
+            for thread in sorted(threads.values(), key=lambda t: t.id):
+                if thread.archived or self.routing.is_closed(thread):
+                    continue
+                match = self.POST_NAME_RE.match(thread.name)
+                if not match:
+                    continue
+                candidates[match.group('name')] = (thread, match.group('id'))
+
+            if not candidates:
+                print("Warm start: no open tickets found")
+                return
+
+            limit = asyncio.Semaphore(int(self.config.get('discord.warm_start_concurrency', 5)))
+
+            async def latest_controls(thread: discord.Thread):
+                async with limit:
+                    try:
+                        async for msg in thread.history(limit=25):
+                            if msg.author == self.bot.user and msg.embeds and (msg.embeds[0].title or '').startswith('🎛️'):
+                                return msg
+                    except Exception as e:
+                        print(f"Warm start: could not read {thread.name}: {e}")
+                    return None
+
+            names = list(candidates)
+            controls = await asyncio.gather(*(latest_controls(candidates[n][0]) for n in names))
+
+            for player_name, control_msg in zip(names, controls):
+                thread, player_id = candidates[player_name]
+                self.player_tickets[player_name] = True
+                self.active_threads[player_name] = thread.id
+                status = self.routing.status_of(thread)
+                if status in ('NEW', 'REPLIED'):
+                    self.ticket_status[player_name] = status
+                self.crcon_client.register_admin_thread(player_name, {
+                    'thread_id': thread.id,
+                    'player_name': player_name,
+                    'player_id': player_id,
+                    'opened_at': thread.created_at.timestamp() if thread.created_at else None
+                })
+                if control_msg is None:
+                    continue
+                self.active_button_messages[player_name] = control_msg.id
+                self.current_status_message[player_name] = control_msg.id
+                self.status_messages[player_name] = [control_msg.id]
+                description = control_msg.embeds[0].description or ''
+                claimed = re.search(r"pris en charge par \*\*(.+?)\*\*", description) or \
+                    re.match(r"(.+?) s'est attribué le ticket", description)
+                if claimed:
+                    self.claimed_by[player_name] = claimed.group(1)
+                # Re-bind the buttons still attached to that panel to this player
+                if control_msg.components:
+                    view_cls = CloseTicketView if claimed else ClaimTicketView
+                    self.bot.add_view(view_cls(player_name, self), message_id=control_msg.id)
+
+            for player_name in names:
+                self.schedule_ticket_timers(player_name, 'restored')
+
+            print(f"Warm start: restored {len(names)} open ticket(s)")
+            logger.info(f"Warm start restored {len(names)} open ticket(s)")
+        except Exception as e:
+            print(f"Warm start failed: {e}")
+            logger.error(f"Warm start failed: {e}")
+
     async def apply_forum_tag(self, thread: discord.Thread, tag_name: str):
 #"""Apply a forum tag to a thread"""
         try:
-            if tag_name not in self.forum_tags or not self.forum_tags[tag_name]:
+            # Existing status tags swapped for the new one (id-set filter from the routing context)
+            new_tags = self.routing.with_status(thread, tag_name)
+            if new_tags is None:
                 print(f"Tag {tag_name} not available")
                 return
             
-            tag = self.forum_tags[tag_name]
-            
-            # Remove all existing status tags first
-            current_tags = [t for t in thread.applied_tags if t.name not in ['NEW', 'REPLIED', 'CLOSED']]
-            
-            # Add the new tag
-            new_tags = current_tags + [tag]
-            
             await thread.edit(applied_tags=new_tags)
             print(f" Applied {tag_name} tag to thread: {thread.name}")
             
@@ -401,7 +700,9 @@ class DiscordBot:
                 # Add their message to the existing ticket if they provided one
                 if admin_message and admin_message.strip() and player_name in self.active_threads:
                     try:
-                        thread = self.active_threads[player_name]
+                        thread = await self.get_thread(player_name)
+                        if thread is None:
+                            raise RuntimeError("ticket thread not found")
                         
                         # Create embed for the additional message
                         now = datetime.now()
@@ -421,7 +722,7 @@ class DiscordBot:
                 
                 # Send active ticket message
                 try:
-                    await self.crcon_client.send_message_to_player(
+                    self.notify_player(
                         player_name,
                         "Vous avez déjà un ticket admin actif. Vous pouvez répondre à votre demande en écrivant dans le chat sans réutiliser !admin."
                     )
@@ -429,19 +730,10 @@ class DiscordBot:
                     print(f"Could not send duplicate ticket message to player: {msg_error}")
                 return
             
-            channel_id = self.config.get('discord.admin_channel_id')
-            if not channel_id:
-                print("No admin channel ID configured")
-                return
-                
-            channel = self.bot.get_channel(int(channel_id))
-            
-            if not channel:
-                print(f"Could not find channel with ID: {channel_id}")
-                return
-            
-            if not isinstance(channel, discord.ForumChannel):
-                print(f"Channel {channel_id} is not a forum channel")
+            routing = self.routing
+            channel = routing.forum
+            if channel is None:
+                print(f"Admin forum not available (discord.admin_channel_id: {self.config.get('discord.admin_channel_id')})")
                 return
             
             # Create forum post with date/time and append player platform ID if available
@@ -449,47 +741,57 @@ class DiscordBot:
             date_str = now.strftime("%Y-%m-%d")
             time_str = now.strftime("%H:%M")
             id_suffix = ""
+            platform_id = None
             player_team = None
+            # Game context (map/side/squad) comes from the shared cache, fetched alongside the roster
+            context_task = asyncio.create_task(self.fetch_game_context(player_name))
             try:
                 players = await self.crcon_client.get_players()
                 for p in players:
                     if p.get('name') == player_name:
                         platform_id = p.get('player_id') or p.get('steam_id_64')
-                        player_team = p.get('side')
+                        player_team = p.get('team')
                         if platform_id:
                             id_suffix = f" ({platform_id})"
                         break
             except Exception:
                 # If we fail to fetch players, just omit the ID
                 pass
+            game_info = await context_task
             post_name = f"{date_str} {time_str} - {player_name}{id_suffix}"
-            
-            # Create initial message content with admin mentions
-            admin_mentions = self.get_admin_mentions()
+
+            # Warm the player profile in the background; the embed is edited once it lands
+            profile_future = None
+            if platform_id:
+                profile_future = self.crcon_client.profiles.prefetch(platform_id, player_name)
+            prior_tickets = self.record_ticket(platform_id or player_name)
+            
+            # Create initial message content with admin mentions (folded into the digest during a surge)
+            in_surge = self.surge.record()
+            admin_mentions = "" if in_surge else routing.mentions
             initial_content = f"🚨 **Nouveau ping MODO** 🚨\n{admin_mentions}" if admin_mentions else "🚨 **Nouveau ping MODO** 🚨"
             print(f"Creating forum post: {post_name}")
             
-            # Create forum post with NEW tag
-            new_tag = self.forum_tags.get('NEW')
-            initial_tags = [new_tag] if new_tag else []
-            
-            # Create the forum post with content (not empty message)
+            # Create the forum post with content (not empty message) and the NEW tag
             thread, message = await channel.create_thread(
                 name=post_name,
                 content=initial_content,
-                applied_tags=initial_tags
+                applied_tags=routing.new_post_tags
             )
 
             # Mark player as having an active ticket
             self.player_tickets[player_name] = True
+            self.ticket_status[player_name] = 'NEW'
             
-            # Store thread reference
-            self.active_threads[player_name] = thread
+            # Store thread id
+            self.active_threads[player_name] = thread.id
             
             # Register with CRCON client
             self.crcon_client.register_admin_thread(player_name, {
                 'thread_id': thread.id,
-                'player_name': player_name
+                'player_name': player_name,
+                'player_id': platform_id,
+                'opened_at': time.time()
             })
             
             # Create detailed embed with player info and request
@@ -507,14 +809,25 @@ class DiscordBot:
             embed.add_field(name="🕐 Heure", value=f"{date_str} {time_str}", inline=True)
             embed.add_field(name="💬 Message", value=admin_message or "No additional message", inline=False)
             
-            # Add player side if available
-            if player_team:
-                try:
-                    embed.add_field(name="⚑ Team", value=player_team, inline=True)
-                except Exception:
-                    pass
+            # Add game context if available
+            self.add_game_context_fields(embed, game_info, player_team)
+
+            # Triage history: prior tickets now, CRCON profile when (if) it arrives
+            history = f"{prior_tickets} ticket(s) précédent(s)"
+            profile_ready = profile_future is not None and profile_future.done()
+            if profile_ready:
+                history += "\n" + self.crcon_client.profiles.describe(profile_future.result())
+            elif profile_future is not None:
+                history += "\nChargement du profil…"
+            embed.add_field(name="📋 Historique", value=history, inline=False)
+            history_index = len(embed.fields) - 1
+
             # Post the detailed embed without controls
-            await thread.send(embed=embed)
+            detail_message = await thread.send(embed=embed)
+            if profile_future is not None and not profile_ready:
+                asyncio.create_task(self.enrich_ticket_profile(
+                    detail_message, embed, history_index, prior_tickets, profile_future
+                ))
 
                         # Send initial controls panel (claim stage or already claimed)
             claimer = self.claimed_by.get(player_name)
@@ -533,20 +846,25 @@ class DiscordBot:
                 )
                 view = ClaimTicketView(player_name, self)
             button_message = await thread.send(embed=controls_embed, view=view)
-            self.active_button_messages[player_name] = button_message
+            self.active_button_messages[player_name] = button_message.id
             # This is the baseline status window; track only this one
             self.current_status_message[player_name] = button_message.id
             self.status_messages[player_name] = [button_message.id]
+            self.schedule_ticket_timers(player_name, 'opened')
+            self.refresh_live_views()
+            if in_surge:
+                await self.update_surge_digest(channel)
             
             print(f"Created admin request thread for {player_name}")
             
             # Send confirmation to player
             try:
-                await self.crcon_client.send_message_to_player(
+                self.notify_player(
                     player_name,
-                    "Votre ticket admin a bien été reçu ! Vous pouvez répondre à ce ticket en écrivant dans le chat (inutile de réutiliser !admin)."
+                    "Votre ticket admin a bien été reçu ! Vous pouvez répondre à ce ticket en écrivant dans le chat (inutile de réutiliser !admin).",
+                    key=f"ack:{thread.id}"
                 )
-                print(f"Sent confirmation to player: {player_name}")
+                print(f"Queued confirmation to player: {player_name}")
             except Exception as msg_error:
                 print(f"Could not send confirmation to player: {msg_error}")
             
@@ -554,8 +872,376 @@ class DiscordBot:
             print(f"Error handling admin request: {e}")
             logger.error(f"Error handling admin request: {e}")
 
+    def record_ticket(self, player_key: str) -> int:
+    #"""Count a new ticket for this player and return how many they opened before"""
+        prior = int(self.ticket_history.get(player_key, 0))
+        self.ticket_history[player_key] = prior + 1
+        self._history_dirty = True
+        if self._history_task is None or self._history_task.done():
+            self._history_task = asyncio.create_task(self.flush_ticket_history())
+        return prior
+
+    async def flush_ticket_history(self, delay: float = 1.0):
+    #"""Persist ticket counts in a worker thread (the write fsyncs), batching a burst of tickets"""
+        while self._history_dirty:
+            await asyncio.sleep(delay)
+            self._history_dirty = False
+            snapshot = dict(self.ticket_history)
+            try:
+                await asyncio.to_thread(self.state.save, 'ticket_history', snapshot)
+            except Exception as e:
+                print(f"Could not persist ticket history: {e}")
+
+    async def enrich_ticket_profile(self, message: discord.Message, embed: discord.Embed,
+                                    field_index: int, prior_tickets: int, profile_future):
+    #"""Edit the ticket embed in place once the CRCON profile is available"""
+        timeout = float(self.config.get('crcon.profile_timeout_seconds', 10))
+        try:
+            summary = await asyncio.wait_for(asyncio.shield(profile_future), timeout)
+        except asyncio.TimeoutError:
+            summary = None
+            print(f"Profile fetch timed out for ticket {message.channel}")
+        except Exception:
+            summary = None
+        try:
+            embed.set_field_at(
+                field_index,
+                name="📋 Historique",
+                value=f"{prior_tickets} ticket(s) précédent(s)\n{self.crcon_client.profiles.describe(summary)}",
+                inline=False
+            )
+            await message.edit(embed=embed)
+        except Exception as e:
+            print(f"Could not update ticket profile: {e}")
+
+    STATUS_LABELS = {'NEW': '🆕 NEW', 'REPLIED': '💬 REPLIED'}
+
+    def ticket_rows(self, limit: int) -> List[str]:
+    #"""One line per open ticket (oldest first): link, player, age, status and claimer"""
+        now = time.time()
+        registry = self.crcon_client.active_threads
+        names = sorted(self.active_threads, key=lambda n: registry.get(n, {}).get('opened_at') or now)
+        rows = []
+        for name in names[:limit]:
+            thread_id = self.active_threads[name]
+            opened = registry.get(name, {}).get('opened_at')
+            age = f"{int((now - opened) // 60)} min" if opened else "?"
+            status = self.STATUS_LABELS.get(self.ticket_status.get(name, 'NEW'), self.ticket_status.get(name))
+            row = f"<#{thread_id}> **{name}** - {age} - {status}"
+            claimer = self.claimed_by.get(name)
+            if claimer:
+                row += f" - 🙋 {claimer}"
+            rows.append(row)
+        if len(names) > limit:
+            rows.append(f"… et {len(names) - limit} autre(s)")
+        return rows
+
+    def readiness(self) -> Dict[str, bool]:
+    #"""Discord-side readiness checks for /readyz"""
+        return {
+            'discord_connected': self.bot.is_ready() and not self.bot.is_closed(),
+            'forum_resolved': self.routing.ready and all(self.routing.tags.values()),
+            'active': not self.standby and self.warm_started,
+        }
+
+    def debug_state(self) -> dict:
+    #"""Open tickets and queue depths for /debug/state (built from the live registries)"""
+        now = time.time()
+        registry = self.crcon_client.active_threads
+        tickets = []
+        for name, thread_id in self.active_threads.items():
+            opened = registry.get(name, {}).get('opened_at')
+            tickets.append({
+                'player': name,
+                'thread_id': thread_id,
+                'status': self.ticket_status.get(name),
+                'claimed_by': self.claimed_by.get(name),
+                'age_seconds': int(now - opened) if opened else None,
+            })
+        return {
+            'standby': self.standby,
+            'tickets': tickets,
+            'outbox': self.outbox.stats(),
+            'timers': self.scheduler.stats(),
+            'buffered_player_lines': sum(len(lines) for lines in self.pending_responses.values()),
+            'surge': {'active': self.surge.active, 'recent': self.surge.recent},
+            'dashboard_edits': {'edits': self.dashboard.edits, 'skipped': self.dashboard.skipped},
+            'forum_id': self.routing.forum_id,
+        }
+
+    def refresh_live_views(self):
+    #"""Ticket registry changed: schedule (throttled) edits of the dashboard and surge digest"""
+        for live in (self.dashboard, self.surge_digest):
+            if live.attached:
+                live.mark_dirty()
+
+    def render_surge_digest(self) -> dict:
+    #"""Digest of open tickets shown (and edited) instead of per-ticket pings during a surge"""
+        active = self.surge.active
+        header = "🚨 **Afflux de tickets** - les pings sont regroupés ici" if active else "✅ **Afflux terminé**"
+        mentions = self.get_admin_mentions() if self.surge_digest_mentions else ""
+        embed = discord.Embed(
+            title=f"{len(self.active_threads)} ticket(s) ouvert(s)",
+            description="\n".join(self.ticket_rows(25)) or "Aucun ticket ouvert",
+            color=discord.Color.red() if active else discord.Color.green(),
+        )
+        return {'content': f"{header}\n{mentions}".strip(), 'embed': embed}
+
+    def render_dashboard(self) -> dict:
+    #"""Queue dashboard: every open ticket, oldest first"""
+        rows = self.ticket_rows(int(self.config.get('dashboard.max_rows', 40)))
+        unclaimed = sum(1 for name in self.active_threads if name not in self.claimed_by)
+        embed = discord.Embed(
+            title=f"📋 Tickets ouverts : {len(self.active_threads)}",
+            description="\n".join(rows) or "Aucun ticket ouvert 🎉",
+            color=discord.Color.orange() if unclaimed else discord.Color.green(),
+        )
+        embed.set_footer(text=f"{unclaimed} non pris en charge")
+        return {'content': None, 'embed': embed}
+
+    async def setup_dashboard(self):
+    #"""Find (or post and pin) the dashboard message, then keep ages fresh"""
+        channel_id = self.config.get('dashboard.channel_id')
+        if not channel_id or self.dashboard.attached:
+            return
+        try:
+            channel = self.bot.get_channel(int(channel_id))
+            if not isinstance(channel, discord.TextChannel):
+                print(f"Dashboard channel {channel_id} not found or not a text channel")
+                return
+            payload = self.render_dashboard()
+            saved = self.state.load('dashboard', {}) or {}
+            message = None
+            if saved.get('channel_id') == channel.id and saved.get('message_id'):
+                try:
+                    message = await channel.fetch_message(int(saved['message_id']))
+                except discord.NotFound:
+                    message = None
+            if message is None:
+                message = await channel.send(**payload)
+                try:
+                    await message.pin()
+                except Exception as pin_err:
+                    print(f"Could not pin dashboard: {pin_err}")
+                self.state.save('dashboard', {'channel_id': channel.id, 'message_id': message.id})
+                self.dashboard.attach(channel.get_partial_message(message.id), payload)
+            else:
+                self.dashboard.attach(channel.get_partial_message(message.id))
+                self.dashboard.mark_dirty()
+            if self.dashboard_task is None or self.dashboard_task.done():
+                self.dashboard_task = asyncio.create_task(self.refresh_dashboard_ages())
+            print(f"Dashboard ready in #{channel.name}")
+        except Exception as e:
+            print(f"Could not set up dashboard: {e}")
+            logger.error(f"Could not set up dashboard: {e}")
+
+    async def refresh_dashboard_ages(self):
+    #"""Ticket ages move even without churn; re-render periodically (no edit if unchanged)"""
+        interval = float(self.config.get('dashboard.refresh_seconds', 60))
+        while self.dashboard.attached:
+            await asyncio.sleep(interval)
+            self.dashboard.mark_dirty()
+
+    async def update_surge_digest(self, forum: discord.ForumChannel):
+    #"""Post the surge digest (one ping per surge) or schedule an edit of the existing one"""
+        if self.surge_digest.attached:
+            self.surge_digest.mark_dirty()
+            return
+        try:
+            # At most one role ping per surge.min_ping_interval_seconds, however many surges
+            min_interval = float(self.config.get('surge.min_ping_interval_seconds', 300))
+            self.surge_digest_mentions = time.monotonic() - self.surge_pinged_at >= min_interval
+            if self.surge_digest_mentions:
+                self.surge_pinged_at = time.monotonic()
+            payload = self.render_surge_digest()
+
+            channel_id = self.config.get('surge.digest_channel_id')
+            target = self.bot.get_channel(int(channel_id)) if channel_id else None
+            if isinstance(target, discord.TextChannel):
+                message = await target.send(**payload)
+            else:
+                _, message = await forum.create_thread(
+                    name=f"🚨 Afflux de tickets - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                    **payload
+                )
+            self.surge_digest.attach(message.channel.get_partial_message(message.id), payload)
+            print(f"Surge mode: digest posted ({self.surge.recent} tickets in window)")
+            logger.warning(f"Ticket surge detected: {self.surge.recent} tickets within {self.surge.window:.0f}s")
+            if self.surge_watch_task is None or self.surge_watch_task.done():
+                self.surge_watch_task = asyncio.create_task(self.watch_surge())
+        except Exception as e:
+            print(f"Could not post surge digest: {e}")
+            logger.error(f"Could not post surge digest: {e}")
+
+    async def watch_surge(self):
+    #"""Refresh the digest while the surge lasts, then mark it finished"""
+        while self.surge_digest.attached:
+            await asyncio.sleep(float(self.config.get('surge.digest_edit_interval_seconds', 10)))
+            if not self.surge.check():
+                await self.surge_digest.detach()
+                print("Surge mode: ended")
+                return
+            self.surge_digest.mark_dirty()
+
+    def forget_ticket(self, player_name: str):
+    #"""Drop every piece of tracking for a closed ticket"""
+        for tracking in (self.player_tickets, self.active_threads, self.active_button_messages,
+                         self.claimed_by, self.claimer_ids, self.ticket_status,
+                         self.response_embeds, self.response_buckets, self.flood_warned_at):
+            tracking.pop(player_name, None)
+        self.catchup_tickets.discard(player_name)
+        # Lines buffered before the close belong to the closed ticket: never post them
+        # (the flush would find no thread and open a new ticket)
+        self.pending_responses.pop(player_name, None)
+        task = self.response_flush_tasks.pop(player_name, None)
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        self.cancel_ticket_timers(player_name)
+        self.crcon_client.unregister_admin_thread(player_name)
+        self.refresh_live_views()
+
+    TICKET_TIMER_KINDS = ('reping', 'nudge', 'inactivity')
+
+    def ticket_minutes(self, key: str, default: float) -> float:
+        return float(self.config.get(f'tickets.{key}', default) or 0)
+
+    def schedule_ticket_timers(self, player_name: str, event: str):
+    #"""(Re)arm SLA timers after a ticket event: opened, catchup, restored, player, admin, claimed"""
+        reping = self.ticket_minutes('reping_minutes', 5)
+        nudge = self.ticket_minutes('nudge_minutes', 10)
+        auto_close = self.ticket_minutes('auto_close_minutes', 120)
+        claimed = player_name in self.claimed_by
+        if event == 'catchup' or (event == 'restored' and
+                                  (self.scheduler.data(f"inactivity:{player_name}") or {}).get('quiet')):
+            self.catchup_tickets.add(player_name)
+        elif event == 'player':
+            self.catchup_tickets.discard(player_name)
+        quiet = player_name in self.catchup_tickets
+
+        if claimed or quiet or event in ('admin', 'claimed'):
+            self.scheduler.cancel(f"reping:{player_name}")
+        elif reping and (event == 'opened' or self.scheduler.pending(f"reping:{player_name}") is None):
+            self.scheduler.schedule_in(f"reping:{player_name}", 'reping', reping * 60, player_name=player_name, count=1)
+
+        if event == 'admin':
+            self.scheduler.cancel(f"nudge:{player_name}")
+        elif event == 'player' and claimed and nudge and self.scheduler.pending(f"nudge:{player_name}") is None:
+            self.scheduler.schedule_in(f"nudge:{player_name}", 'nudge', nudge * 60, player_name=player_name)
+
+        if auto_close and (event != 'restored' or self.scheduler.pending(f"inactivity:{player_name}") is None):
+            self.scheduler.schedule_in(f"inactivity:{player_name}", 'inactivity', auto_close * 60,
+                                       player_name=player_name, quiet=quiet)
+
+    def cancel_ticket_timers(self, player_name: str):
+        for kind in self.TICKET_TIMER_KINDS:
+            self.scheduler.cancel(f"{kind}:{player_name}")
+
+    async def on_reping_timer(self, key: str, player_name: str, count: int = 1):
+    #"""Ticket still NEW and unclaimed: ping the admin roles again"""
+        if player_name not in self.active_threads or player_name in self.claimed_by:
+            return
+        minutes = self.ticket_minutes('reping_minutes', 5)
+        if self.surge.check():
+            # No individual pings during a surge; the digest lists the ticket instead
+            self.surge_digest.mark_dirty()
+            self.scheduler.schedule_in(key, 'reping', minutes * 60, player_name=player_name, count=count)
+            return
+        thread = await self.get_thread(player_name)
+        if thread is None:
+            return
+        mentions = self.get_admin_mentions()
+        await thread.send(f"⏰ Ticket de **{player_name}** en attente depuis {int(minutes * count)} min sans prise en charge {mentions}".strip())
+        if count < int(self.config.get('tickets.reping_max', 3)):
+            self.scheduler.schedule_in(key, 'reping', minutes * 60, player_name=player_name, count=count + 1)
+
+    async def on_nudge_timer(self, key: str, player_name: str):
+    #"""Claimed ticket where the player is still waiting for an answer"""
+        claimer = self.claimed_by.get(player_name)
+        if not claimer:
+            return
+        thread = await self.get_thread(player_name)
+        if thread is None:
+            return
+        claimer_id = self.claimer_ids.get(player_name)
+        who = f"<@{claimer_id}>" if claimer_id else f"**{claimer}**"
+        minutes = int(self.ticket_minutes('nudge_minutes', 10))
+        await thread.send(f"⏰ {who} - **{player_name}** attend une réponse depuis {minutes} min")
+
+    async def on_inactivity_timer(self, key: str, player_name: str, quiet: bool = False):
+        if player_name in self.active_threads:
+            await self.auto_close_ticket(player_name, notify=not quiet and player_name not in self.catchup_tickets)
+
+    async def auto_close_ticket(self, player_name: str, notify: bool = True):
+    #"""Close an inactive ticket: notify the player (unless notify=False), tag CLOSED, archive and forget it"""
+        thread = await self.get_thread(player_name)
+        if thread is None:
+            self.forget_ticket(player_name)
+            return
+        minutes = int(self.ticket_minutes('auto_close_minutes', 120))
+        print(f"Auto-closing inactive ticket for {player_name}")
+        if notify:
+            try:
+                self.notify_player(
+                    player_name,
+                    "Votre ticket admin a été fermé automatiquement faute d'activité. Utilisez !admin si besoin.",
+                    key=f"close:{thread.id}"
+                )
+            except Exception as msg_error:
+                print(f"Could not send auto-close notice to player: {msg_error}")
+
+        await self.apply_forum_tag(thread, 'CLOSED')
+        closed_embed = discord.Embed(
+            title="🎛️ Statut du ticket",
+            description=f"Le ticket de **{player_name}** a été clôturé automatiquement après {minutes} min d'inactivité",
+            color=discord.Color.green(),
+            timestamp=discord.utils.utcnow()
+        )
+        panel_id = self.active_button_messages.get(player_name)
+        try:
+            if panel_id is not None:
+                await thread.get_partial_message(panel_id).edit(embed=closed_embed, view=None)
+            else:
+                await thread.send(embed=closed_embed)
+        except Exception:
+            pass
+        self.forget_ticket(player_name)
+        try:
+            await thread.edit(archived=True, locked=True)
+        except Exception as e:
+            print(f"Could not archive {thread.name}: {e}")
+        logger.info(f"Ticket auto-closed for {player_name} after {minutes} min of inactivity")
+
+    async def fetch_game_context(self, player_name: str) -> dict:
+    #"""Map/side/squad for a ticket; empty when CRCON is slow or unavailable"""
+        timeout = float(self.config.get('crcon.context_timeout_seconds', 3))
+        try:
+            return await asyncio.wait_for(self.crcon_client.game_context.player_context(player_name), timeout)
+        except asyncio.TimeoutError:
+            print(f"Game context timed out for {player_name}")
+        except Exception as e:
+            print(f"Could not fetch game context for {player_name}: {e}")
+        return {}
+
+    def add_game_context_fields(self, embed: discord.Embed, game_info: dict, player_team: Optional[str] = None):
+    #"""Add map/side/squad fields to a ticket embed"""
+        side = game_info.get('side') or player_team
+        if side:
+            embed.add_field(name="⚑ Camp", value=side, inline=True)
+        if game_info.get('squad'):
+            squad = game_info['squad']
+            if game_info.get('role'):
+                squad = f"{squad} ({game_info['role']})"
+            embed.add_field(name="👥 Escouade", value=squad, inline=True)
+        if game_info.get('map'):
+            details = [game_info['map']]
+            if game_info.get('score'):
+                details.append(f"Score {game_info['score']}")
+            if game_info.get('time_remaining'):
+                details.append(f"reste {game_info['time_remaining']}")
+            embed.add_field(name="🗺️ Carte", value=" - ".join(details), inline=False)
+
     async def handle_player_response(self, player_name: str, message: str, event_time: str):
-    #"""Handle player response in game"""
+    #"""Handle player response in game: buffer it, lines of a burst are posted together"""
         try:
             print(f"Player response received: {player_name} - {message}")
             
@@ -563,115 +1249,136 @@ class DiscordBot:
                 print(f"No active thread for {player_name}. Creating a new ticket with player's message…")
                 await self.handle_admin_request(player_name, message)
                 return
-            
-            thread = self.active_threads[player_name]
-            
-            # Check if thread still exists by trying to send a message
-            # (Forum posts/threads don't have .fetch() method)
-            try:
-                # Try to get the thread's parent (this will fail if thread is deleted)
-                parent = thread.parent
-                if not parent:
-                    raise discord.NotFound("Thread parent not found")
-                    
-            except (discord.NotFound, discord.Forbidden, AttributeError):
+
+            buffer = self.pending_responses.setdefault(player_name, [])
+            if len(buffer) >= int(self.config.get('flood.max_buffered_lines', 20)):
+                buffer.pop(0)
+            buffer.append((message, event_time))
+
+            task = self.response_flush_tasks.get(player_name)
+            if task is None or task.done():
+                self.response_flush_tasks[player_name] = asyncio.create_task(self.flush_player_responses(player_name))
+        except Exception as e:
+            print(f"Error handling player response: {e}")
+            logger.error(f"Error handling player response: {e}")
+
+    async def flush_player_responses(self, player_name: str):
+    #"""Wait for the burst to settle and for the ticket's rate budget, then post it"""
+        try:
+            await asyncio.sleep(float(self.config.get('flood.coalesce_seconds', 1.5)))
+            bucket = self.response_buckets.get(player_name)
+            if bucket is None:
+                rate = float(self.config.get('flood.actions_per_minute', 10))
+                bucket = self.response_buckets[player_name] = TokenBucket(rate)
+            while True:
+                wait = bucket.time_until(1)
+                if wait <= 0:
+                    break
+                await self.warn_flooding(player_name)
+                await asyncio.sleep(wait)
+
+            # Lines arriving after this point start a new flush
+            lines = self.pending_responses.pop(player_name, [])
+            self.response_flush_tasks.pop(player_name, None)
+            if lines:
+                bucket.consume(await self.post_player_responses(player_name, lines))
+        except Exception as e:
+            print(f"Error flushing player responses: {e}")
+            logger.error(f"Error flushing player responses: {e}")
+
+    async def warn_flooding(self, player_name: str):
+    #"""Tell a spamming player (at most once per cooldown) that they are throttled"""
+        now = time.monotonic()
+        cooldown = float(self.config.get('flood.warn_cooldown_seconds', 60))
+        if now - self.flood_warned_at.get(player_name, 0) < cooldown:
+            return
+        self.flood_warned_at[player_name] = now
+        try:
+            await self.crcon_client.send_message_to_player(
+                player_name,
+                "Merci de patienter : vos messages sont regroupés et transmis aux admins, inutile de les répéter."
+            )
+        except Exception:
+            pass
+
+    async def set_ticket_status(self, player_name: str, thread: discord.Thread, tag_name: str) -> bool:
+    #"""Apply a status tag only when it changes; True when a Discord edit was made"""
+        if self.ticket_status.get(player_name) == tag_name:
+            return False
+        await self.apply_forum_tag(thread, tag_name)
+        self.ticket_status[player_name] = tag_name
+        self.refresh_live_views()
+        return True
+
+    async def post_player_responses(self, player_name: str, lines: List[Tuple[str, str]]) -> int:
+    #"""Post a burst of player lines as one embed (edited in place when possible); returns Discord calls made"""
+        message = "\n".join(text for text, _ in lines)
+        calls = 0
+        try:
+            if player_name not in self.active_threads:
+                # Closed while the burst was buffered: a new line in chat opens the next ticket
+                print(f"Ticket of {player_name} closed, dropping {len(lines)} buffered line(s)")
+                return 0
+
+            # Resolve the thread (cache first, then REST); None means it was deleted
+            thread = await self.get_thread(player_name)
+            if thread is None:
                 print(f"Thread for {player_name} was deleted, cleaning up tracking and recreating ticket…")
-                # Clean up all tracking for this player
-                if player_name in self.player_tickets:
-                    del self.player_tickets[player_name]
-                if player_name in self.active_threads:
-                    del self.active_threads[player_name]
-                if player_name in self.active_button_messages:
-                    del self.active_button_messages[player_name]
-                
-                # Clean up CRCON tracking
-                self.crcon_client.unregister_admin_thread(player_name)
-                
+                self.forget_ticket(player_name)
                 print(f"Recreating ticket for {player_name} with latest message…")
                 await self.handle_admin_request(player_name, message)
-                return
-            
-            # Apply NEW tag (player has responded, needs admin attention)
-            await self.apply_forum_tag(thread, "NEW")
-            
-            # Create embed for player response (without redundant player name)
-            response_embed = discord.Embed(
-                title="💬 Réponse du joueur",
-                description=message,  # Just the message, no player name since it's already in the thread title
-                color=discord.Color.blue(),
-                timestamp=discord.utils.utcnow()
-            )
-            
-            if event_time:
-                response_embed.set_footer(text=f"Game time: {event_time}")
-            
-            await thread.send(embed=response_embed)
-            print(f"Player response posted to Discord forum")
+                return 3
             
-            # Before adding a new status window, remove previous ones except the preserved claimed-status
-            try:
-                preserved_id = self.claim_status_message.get(player_name)
-                ids = self.status_messages.get(player_name, [])
-                keep: List[int] = []
-                for mid in ids:
-                    if preserved_id and mid == preserved_id:
-                        keep.append(mid)
-                        continue
+            # Apply NEW tag (player has responded, needs admin attention) unless already NEW
+            if await self.set_ticket_status(player_name, thread, "NEW"):
+                calls += 1
+
+            # Append to the previous response embed while nobody else spoke in the thread
+            merge_window = float(self.config.get('flood.merge_window_seconds', 120))
+            current = self.response_embeds.get(player_name)
+            merged = False
+            if current and time.monotonic() - current['at'] < merge_window:
+                combined = current['lines'] + [text for text, _ in lines]
+                description = "\n".join(combined)
+                if len(description) <= 4000:
+                    embed = current['embed']
+                    embed.description = description
                     try:
-                        msg_obj = await thread.fetch_message(mid)
-                        await msg_obj.delete()
-                    except Exception:
+                        await thread.get_partial_message(current['message_id']).edit(embed=embed)
+                        current['lines'] = combined
+                        current['at'] = time.monotonic()
+                        merged = True
+                    except discord.NotFound:
                         pass
-                self.status_messages[player_name] = keep
-            except Exception:
-                pass
+                    calls += 1
 
-            # Move button to bottom (no-op now; we edit the single status window)
-            
-            # Create new button message
-                        # Create new controls message (respect claimed state)
-            claimer = self.claimed_by.get(player_name)
-            if claimer:
-                button_embed = discord.Embed(
-                    title="🎛️ Statut du ticket",
-                    description=f"Ticket de **{player_name}** - pris en charge par **{claimer}**",
-                    color=discord.Color.blue()
+            if not merged:
+                # Create embed for player response (without redundant player name)
+                response_embed = discord.Embed(
+                    title="💬 Réponse du joueur",
+                    description=message,  # Just the message, no player name since it's already in the thread title
+                    color=discord.Color.blue(),
+                    timestamp=discord.utils.utcnow()
                 )
-                view = CloseTicketView(player_name, self)
-            else:
-                button_embed = discord.Embed(
-                    title="🎛️ Statut du ticket",
-                    description=f"Ticket de **{player_name}** - en attente",
-                    color=discord.Color.blue()
-                )
-                view = ClaimTicketView(player_name, self)
-            updated_msg = None
-            msg_id = self.current_status_message.get(player_name)
-            if msg_id:
-                try:
-                    existing = await thread.fetch_message(msg_id)
-                    await existing.edit(embed=button_embed, view=view)
-                    updated_msg = existing
-                except Exception:
-                    updated_msg = None
-            if updated_msg is None:
-                updated_msg = await thread.send(embed=button_embed, view=view)
-            self.active_button_messages[player_name] = updated_msg
-            self.current_status_message[player_name] = updated_msg.id
-            # Delete any other previous status windows and track only this one
-            try:
-                ids = self.status_messages.get(player_name, [])
-                for mid in ids:
-                    if mid == updated_msg.id:
-                        continue
-                    try:
-                        msg_obj = await thread.fetch_message(mid)
-                        await msg_obj.delete()
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-            self.status_messages[player_name] = [updated_msg.id]
+                event_time = lines[0][1]
+                if event_time:
+                    response_embed.set_footer(text=f"Game time: {event_time}")
+                sent = await thread.send(embed=response_embed)
+                calls += 1
+                self.response_embeds[player_name] = {
+                    'message_id': sent.id,
+                    'embed': response_embed,
+                    'lines': [text for text, _ in lines],
+                    'at': time.monotonic()
+                }
+            print(f"Player response posted to Discord forum ({len(lines)} line(s))")
+
+            # Status windows only need work when several exist (e.g. after an auto-claim)
+            ids = self.status_messages.get(player_name, [])
+            if len(ids) > 1:
+                calls += await self.normalize_status_panel(player_name, thread)
+
+            self.schedule_ticket_timers(player_name, 'player')
             
         except Exception as e:
             print(f"Error handling player response: {e}")
@@ -680,17 +1387,139 @@ class DiscordBot:
             try:
                 if isinstance(e, discord.NotFound) or "Unknown Channel" in str(e):
                     print(f"Fallback: recreating ticket for {player_name} due to missing channel/thread")
-                    # Cleanup stale tracking
-                    if player_name in self.player_tickets:
-                        del self.player_tickets[player_name]
-                    if player_name in self.active_threads:
-                        del self.active_threads[player_name]
-                    if player_name in self.active_button_messages:
-                        del self.active_button_messages[player_name]
-                    self.crcon_client.unregister_admin_thread(player_name)
+                    self.forget_ticket(player_name)
                     await self.handle_admin_request(player_name, message)
             except Exception as fallback_err:
                 print(f"Fallback failed: {fallback_err}")
+        return calls
+
+    async def normalize_status_panel(self, player_name: str, thread: discord.Thread) -> int:
+    #"""Keep a single status window reflecting the claimed state; returns Discord calls made"""
+        calls = 0
+        claimer = self.claimed_by.get(player_name)
+        if claimer:
+            button_embed = discord.Embed(
+                title="🎛️ Statut du ticket",
+                description=f"Ticket de **{player_name}** - pris en charge par **{claimer}**",
+                color=discord.Color.blue()
+            )
+            view = CloseTicketView(player_name, self)
+        else:
+            button_embed = discord.Embed(
+                title="🎛️ Statut du ticket",
+                description=f"Ticket de **{player_name}** - en attente",
+                color=discord.Color.blue()
+            )
+            view = ClaimTicketView(player_name, self)
+        updated_msg = None
+        msg_id = self.current_status_message.get(player_name)
+        if msg_id:
+            try:
+                updated_msg = await thread.get_partial_message(msg_id).edit(embed=button_embed, view=view)
+            except Exception:
+                updated_msg = None
+            calls += 1
+        if updated_msg is None:
+            updated_msg = await thread.send(embed=button_embed, view=view)
+            calls += 1
+        self.active_button_messages[player_name] = updated_msg.id
+        self.current_status_message[player_name] = updated_msg.id
+        # Delete any other previous status windows and track only this one
+        for mid in self.status_messages.get(player_name, []):
+            if mid == updated_msg.id:
+                continue
+            try:
+                await thread.get_partial_message(mid).delete()
+            except Exception:
+                pass
+            calls += 1
+        self.status_messages[player_name] = [updated_msg.id]
+        return calls
+
+    async def handle_catchup_digest(self, digests: Dict[str, List[Tuple[Optional[float], str]]]):
+    #"""Handle stale chat replayed after a reconnect: one quiet post per player, no in-game messages"""
+        try:
+            channel = self.routing.forum
+            if channel is None:
+                print(f"Catch-up: admin forum not available, dropping {len(digests)} digest(s)")
+                return
+
+            # One roster snapshot for the whole batch (for platform ids in post names)
+            player_ids: Dict[str, str] = {}
+            if any(name not in self.active_threads for name in digests):
+                try:
+                    for p in await self.crcon_client.get_players():
+                        platform_id = p.get('player_id') or p.get('steam_id_64')
+                        if p.get('name') and platform_id:
+                            player_ids[p.get('name')] = platform_id
+                except Exception:
+                    pass
+
+            now = datetime.now()
+            new_post_tags = self.routing.new_post_tags
+            for player_name, lines in digests.items():
+                try:
+                    rendered = []
+                    for ts, text in lines:
+                        stamp = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone().strftime("%H:%M:%S") if ts else "--:--:--"
+                        rendered.append(f"`{stamp}` {text}")
+                    description = "\n".join(rendered)
+                    if len(description) > 4000:
+                        description = "…\n" + description[-4000:]
+                    embed = discord.Embed(
+                        title="🕘 Messages reçus pendant une déconnexion",
+                        description=description,
+                        color=discord.Color.dark_grey(),
+                        timestamp=now
+                    )
+                    embed.set_footer(text=f"{len(lines)} message(s) en retard - le joueur n'a pas été notifié en jeu")
+
+                    thread = await self.get_thread(player_name)
+                    if thread is not None:
+                        await thread.send(embed=embed)
+                        continue
+                    self.forget_ticket(player_name)
+
+                    platform_id = player_ids.get(player_name)
+                    id_suffix = f" ({platform_id})" if platform_id else ""
+                    post_name = f"{now.strftime('%Y-%m-%d')} {now.strftime('%H:%M')} - {player_name}{id_suffix}"
+                    thread, _ = await channel.create_thread(
+                        name=post_name,
+                        content="🕘 **Ping MODO en retard** (reçu pendant une déconnexion du bot)",
+                        embed=embed,
+                        applied_tags=new_post_tags
+                    )
+
+                    self.player_tickets[player_name] = True
+                    self.active_threads[player_name] = thread.id
+                    self.ticket_status[player_name] = 'NEW'
+                    self.crcon_client.register_admin_thread(player_name, {
+                        'thread_id': thread.id,
+                        'player_name': player_name,
+                        'player_id': platform_id,
+                        'opened_at': time.time()
+                    })
+                    self.record_ticket(platform_id or player_name)
+
+                    controls_embed = discord.Embed(
+                        title="🎛️ Statut du ticket",
+                        description=f"Ticket de **{player_name}** - en attente",
+                        timestamp=now
+                    )
+                    button_message = await thread.send(embed=controls_embed, view=ClaimTicketView(player_name, self))
+                    self.active_button_messages[player_name] = button_message.id
+                    self.current_status_message[player_name] = button_message.id
+                    self.status_messages[player_name] = [button_message.id]
+                    # Stale chat: no re-pings, silent auto-close until the player writes live
+                    self.schedule_ticket_timers(player_name, 'catchup')
+                    self.refresh_live_views()
+                    print(f"Catch-up digest posted for {player_name} ({len(lines)} line(s))")
+                except Exception as post_err:
+                    print(f"Failed to post catch-up digest for {player_name}: {post_err}")
+                    logger.error(f"Failed to post catch-up digest for {player_name}: {post_err}")
+        except Exception as e:
+            print(f"Error handling catch-up digests: {e}")
+            logger.error(f"Error handling catch-up digests: {e}")
 
     async def handle_thread_message(self, message: discord.Message):
     #"""Handle messages in admin threads"""
@@ -703,12 +1532,15 @@ class DiscordBot:
             if not isinstance(message.channel, discord.Thread):
                 return
             
+            # Bot commands (e.g. !msg) go through the command framework, not to the player
+            prefix = self.bot.command_prefix
+            if message.content.startswith(prefix):
+                invoked = message.content[len(prefix):].split(maxsplit=1)
+                if invoked and self.bot.get_command(invoked[0]):
+                    return
+
             # Find which player this thread belongs to
-            player_name = None
-            for name, thread in self.active_threads.items():
-                if thread.id == message.channel.id:
-                    player_name = name
-                    break
+            player_name = self.player_for_thread(message.channel.id)
             
             if not player_name:
                 print(f"Could not find player for thread: {message.channel.name}")
@@ -718,34 +1550,38 @@ class DiscordBot:
             if message.type != discord.MessageType.default or message.embeds:
                 return
             
-            # Send admin response to player
-            admin_message = f"[ADMIN]: {message.content}"
+            # Send admin response to player: cleaned of Discord markup, chunked to the in-game limit
+            chunks = format_admin_reply(message.clean_content, self.message_max_length())
+            if not chunks:
+                return
             
+            # Queued for delivery: ⏳ now, replaced by ✅/❌ once every part is delivered or given up
+            queued = self.outbox.enqueue(player_name, chunks, key=f"{message.channel.id}:{message.id}", meta={
+                'kind': 'reply',
+                'channel_id': message.channel.id,
+                'message_id': message.id,
+            })
+            if not queued:
+                return
             try:
-                await self.crcon_client.send_message_to_player(player_name, admin_message)
-                print(f"Sent admin response to {player_name}: {message.content}")
-                
-                # Apply REPLIED tag
-                await self.apply_forum_tag(message.channel, 'REPLIED')
-                
-                # Add reaction to confirm message was sent
-                await message.add_reaction("✅")
-                
-            except Exception as e:
-                print(f"Failed to send message to player {player_name}: {e}")
-                await message.add_reaction("❌")
+                await message.add_reaction("⏳")
+            except Exception:
+                pass
+            print(f"Queued admin response to {player_name} ({len(chunks)} part(s)): {message.content}")
             
             # Auto-claim on first admin reply if not already claimed
             if player_name not in self.claimed_by:
                 claimer = message.author.display_name
                 self.claimed_by[player_name] = claimer
+                self.claimer_ids[player_name] = message.author.id
+                self.refresh_live_views()
                 
                 # Update controls panel to reflect claimed state
                 try:
                     # Remove previous controls if present
                     if player_name in self.active_button_messages:
                         try:
-                            old_msg = self.active_button_messages[player_name]
+                            old_msg = message.channel.get_partial_message(self.active_button_messages[player_name])
                             await old_msg.edit(view=None)
                         except Exception:
                             pass
@@ -758,7 +1594,7 @@ class DiscordBot:
                     )
                     view = CloseTicketView(player_name, self)
                     new_msg = await message.channel.send(embed=controls_embed, view=view)
-                    self.active_button_messages[player_name] = new_msg
+                    self.active_button_messages[player_name] = new_msg.id
                     # Preserve claimed status window and track it
                     try:
                         self.claim_status_message[player_name] = new_msg.id
@@ -773,6 +1609,195 @@ class DiscordBot:
             print(f"Error handling thread message: {e}")
             logger.error(f"Error handling thread message: {e}")
 
+    def notify_player(self, player_name: str, text: str, key: Optional[str] = None) -> bool:
+    #"""Queue a bot notice to a player (delivered and retried by the outbound queue)"""
+        return self.outbox.enqueue(player_name, [text], key=key)
+
+    async def on_outbound_result(self, job: dict, delivered: bool):
+    #"""Outbound queue finished a job: apply reply side effects and swap ⏳ for ✅/❌"""
+        meta = job.get('meta') or {}
+        player_name = job['player']
+        if meta.get('kind') == 'reply':
+            if delivered:
+                print(f"Delivered admin response to {player_name} ({len(job['messages'])} part(s))")
+                thread = await self.get_thread(player_name)
+                if thread is not None and thread.id == meta.get('channel_id'):
+                    # Apply REPLIED tag
+                    await self.set_ticket_status(player_name, thread, 'REPLIED')
+                    # The admin spoke: the next player burst starts a fresh response embed
+                    self.response_embeds.pop(player_name, None)
+                    self.schedule_ticket_timers(player_name, 'admin')
+            else:
+                print(f"Failed to send message to player {player_name} ({job['sent']}/{len(job['messages'])} part(s))")
+        elif not delivered:
+            print(f"Could not deliver notice to {player_name}: {job['messages'][0]}")
+
+        channel_id, message_id = meta.get('channel_id'), meta.get('message_id')
+        if not channel_id or not message_id:
+            return
+        try:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            message = channel.get_partial_message(message_id)
+            try:
+                await message.remove_reaction("⏳", self.bot.user)
+            except Exception:
+                pass
+            await message.add_reaction("✅" if delivered else "❌")
+        except Exception as e:
+            print(f"Could not update delivery reaction: {e}")
+
+    def message_max_length(self) -> int:
+        return int(self.config.get('crcon.message_max_length', 200))
+
+    def player_for_thread(self, thread_id: int) -> Optional[str]:
+    #"""Player whose open ticket lives in this thread"""
+        for name, ticket_thread_id in self.active_threads.items():
+            if ticket_thread_id == thread_id:
+                return name
+        return None
+
+    async def get_thread(self, player_name: str) -> Optional[discord.Thread]:
+    #"""Ticket thread from the client cache, fetched when it dropped out (None if deleted)"""
+        thread_id = self.active_threads.get(player_name)
+        if thread_id is None:
+            return None
+        thread = self.bot.get_channel(thread_id)
+        if thread is None:
+            try:
+                thread = await self.bot.fetch_channel(thread_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+        return thread
+
+    FANOUT_SCOPES = {'squad': 'squad', 'escouade': 'squad', 'team': 'team', 'equipe': 'team', 'équipe': 'team'}
+
+    def is_admin(self, member) -> bool:
+    #"""Server administrator, or holder of one of discord.admin_roles (read live: hot reload applies)"""
+        permissions = getattr(member, 'guild_permissions', None)
+        if permissions is not None and permissions.administrator:
+            return True
+        admin_roles = {int(role_id) for role_id in self.config.get('discord.admin_roles', ()) or ()}
+        return any(role.id in admin_roles for role in getattr(member, 'roles', ()))
+
+    async def is_admin_ctx(self, ctx) -> bool:
+        if self.is_admin(ctx.author):
+            return True
+        await ctx.send("Commande réservée aux admins")
+        return False
+
+    async def handle_fanout_command(self, ctx, target: Optional[str], text: Optional[str]):
+    #"""!msg: send one in-game message to the ticket player's squad/team or a list of names"""
+        try:
+            player_name = self.player_for_thread(ctx.channel.id) if isinstance(ctx.channel, discord.Thread) else None
+            if not player_name:
+                await ctx.send("Commande utilisable uniquement dans un ticket ouvert")
+                return
+            if not target or not text:
+                await ctx.send('Usage : `!msg squad <texte>`, `!msg team <texte>` ou `!msg "Nom1,Nom2" <texte>`')
+                return
+
+            scope = self.FANOUT_SCOPES.get(target.lower())
+            if scope:
+                info = self.crcon_client.active_threads.get(player_name, {})
+                team_view = await self.crcon_client.get_team_view()
+                targets = self.crcon_client.game_context.group_members(
+                    team_view, player_name, info.get('player_id'), scope
+                )
+                if not targets:
+                    label = "l'escouade" if scope == 'squad' else "l'équipe"
+                    await ctx.send(f"Impossible de trouver {label} de **{player_name}** (joueur hors ligne ?)")
+                    await ctx.message.add_reaction("❌")
+                    return
+            else:
+                targets = [name.strip() for name in target.split(',') if name.strip()]
+
+            chunks = format_admin_reply(text, self.message_max_length())
+            if not chunks:
+                await ctx.send("Message vide après nettoyage")
+                return
+            # Chunks go out in order; a recipient that missed one doesn't get the rest.
+            # One roster snapshot for the whole command
+            roster = await self.crcon_client.get_roster()
+            results = await self.crcon_client.message_players(targets, chunks[0], roster)
+            for chunk in chunks[1:]:
+                reached = [n for n, r in results.items() if r == 'sent']
+                if not reached:
+                    break
+                results.update(await self.crcon_client.message_players(reached, chunk, roster))
+            sent = [n for n, r in results.items() if r == 'sent']
+            absent = [n for n, r in results.items() if r == 'absent']
+            failed = [n for n, r in results.items() if r == 'failed']
+
+            lines = [f"📨 Message envoyé à {len(sent)}/{len(results)} joueur(s)"]
+            if absent:
+                lines.append(f"Absents : {', '.join(absent)}")
+            if failed:
+                lines.append(f"Échecs : {', '.join(failed)}")
+            await ctx.send("\n".join(lines)[:2000])
+            await ctx.message.add_reaction("✅" if sent and not failed else "❌")
+            print(f"Fan-out from {player_name}'s ticket: {len(sent)}/{len(results)} sent")
+
+            if player_name in sent:
+                await self.set_ticket_status(player_name, ctx.channel, 'REPLIED')
+                self.response_embeds.pop(player_name, None)
+                self.schedule_ticket_timers(player_name, 'admin')
+        except Exception as e:
+            print(f"Error handling !msg: {e}")
+            logger.error(f"Error handling !msg: {e}")
+
+    async def handle_profile_command(self, ctx, seconds: float):
+    #"""!profile N: profile the event loop for N seconds, save the file and post the hottest functions"""
+        if not self.config.get('profiling.enabled', False):
+            await ctx.send("Profilage désactivé (profiling.enabled dans config.yaml)")
+            return
+        max_seconds = float(self.config.get('profiling.max_seconds', 120))
+        seconds = min(max(seconds, 1.0), max_seconds)
+        try:
+            # Imported on first use: nothing profiling-related is loaded while unused
+            from utils.profiler import Profiler
+            if self.profiler is None:
+                self.profiler = Profiler.from_config(self.config)
+            if self.profiler.running:
+                await ctx.send("Un profilage est déjà en cours")
+                return
+            await ctx.send(f"⏱️ Profilage ({self.profiler.mode}) pendant {seconds:g}s...")
+            path, summary = await self.profiler.run(seconds)
+            body = "\n".join(summary)
+            header = f"Profil enregistré : `{path}`\n"
+            await ctx.send(header + f"```\n{body[:2000 - len(header) - 8]}\n```")
+            print(f"Profile written to {path}")
+        except Exception as e:
+            print(f"Error handling !profile: {e}")
+            logger.error(f"Error handling !profile: {e}")
+            await ctx.send(f"Échec du profilage : {e}")
+
+    async def shutdown(self, timeout: float):
+    #"""Post buffered player lines, drain in-game messages (bounded), persist timers/queue, close the client"""
+        if self.standby:
+            # Never dispatched: the persisted queue/timers belong to the active instance
+            await self.bot.close()
+            return
+        deadline = time.monotonic() + timeout
+        flushes = [t for t in self.response_flush_tasks.values() if not t.done()]
+        if flushes:
+            await asyncio.wait(flushes, timeout=max(0.0, deadline - time.monotonic()))
+        queued = len(self.outbox)
+        if queued and not await self.outbox.drain(max(0.0, deadline - time.monotonic())):
+            print(f"Shutdown: {len(self.outbox)} in-game message(s) kept for the next start")
+        for task in (self.dashboard_task, self.surge_watch_task):
+            if task and not task.done():
+                task.cancel()
+        await self.scheduler.stop()
+        await self.outbox.stop()
+        if self._history_task and not self._history_task.done():
+            self._history_task.cancel()
+        if self._history_dirty:
+            await self.flush_ticket_history(delay=0)
+        if self.warm_started:
+            self.write_handoff()
+        await self.bot.close()
+        logger.info(f"Discord side stopped ({queued} queued message(s) at shutdown, {len(self.outbox)} left)")
+
     async def start(self):
     #"""Start the Discord bot"""
         try:
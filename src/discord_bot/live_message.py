@@ -0,0 +1,91 @@
+﻿import asyncio
+import json
+import logging
+import time
+from typing import Callable, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+class LiveMessage:
+    """One bot message kept up to date by throttled edits, skipped when nothing changed"""
+
+    def __init__(self, render: Callable[[], dict], min_interval: float = 5.0):
+        # render() returns the kwargs for Message.edit (content / embed)
+        self.render = render
+        self.min_interval = min_interval
+        self.message: Optional[discord.Message] = None
+        self._last_key: Optional[str] = None
+        self._last_edit = 0.0
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.edits = 0
+        self.skipped = 0
+
+    def attach(self, message: discord.Message, rendered: Optional[dict] = None):
+        """Track a message (optionally as already showing `rendered`)"""
+        self.message = message
+        self._last_key = self._key(rendered) if rendered is not None else None
+        self._last_edit = time.monotonic()
+
+    @property
+    def attached(self) -> bool:
+        return self.message is not None
+
+    def mark_dirty(self):
+        """Request a refresh; bursts collapse into at most one edit per min_interval"""
+        self._dirty = True
+        if self.message is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while self._dirty and self.message is not None:
+            delay = self._last_edit + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._dirty = False
+            try:
+                payload = self.render()
+                key = self._key(payload)
+                if key == self._last_key:
+                    self.skipped += 1
+                    continue
+                await self.message.edit(**payload)
+                self._last_key = key
+                self._last_edit = time.monotonic()
+                self.edits += 1
+            except discord.NotFound:
+                logger.warning("Live message was deleted, detaching")
+                self.message = None
+            except Exception as e:
+                logger.error(f"Could not update live message: {e}")
+                self._last_edit = time.monotonic()
+
+    async def detach(self):
+        """Apply any pending change immediately, then stop tracking the message"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._last_edit = 0.0
+        self._dirty = True
+        await self._flush()
+        self.message = None
+
+    def abandon(self):
+        """Stop tracking the message without a last edit (another instance owns it now)"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._dirty = False
+        self.message = None
+
+    @staticmethod
+    def _key(payload: dict) -> str:
+        embed = payload.get('embed')
+        return json.dumps({
+            'content': payload.get('content'),
+            'embed': embed.to_dict() if embed is not None else None,
+        }, sort_keys=True, default=str)
@@ -0,0 +1,64 @@
+﻿import logging
+from typing import Dict, FrozenSet, Optional, Sequence
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+STATUS_TAGS = ('NEW', 'REPLIED', 'CLOSED')
+
+class RoutingContext:
+    """Discord objects a ticket is routed through, resolved once instead of per request
+
+    Holds the admin forum handle, the status tags (objects and id sets) and the
+    pre-rendered admin role mentions. Rebuilt on connect, when the forum channel
+    is edited (tags renamed/added) and when the routing config changes.
+    """
+
+    def __init__(self, forum: Optional[discord.ForumChannel] = None,
+                 tags: Optional[Dict[str, discord.ForumTag]] = None,
+                 admin_roles: Sequence[int] = ()):
+        self.forum = forum
+        self.forum_id = forum.id if forum is not None else None
+        self.tags: Dict[str, Optional[discord.ForumTag]] = {name: None for name in STATUS_TAGS}
+        self.tags.update(tags or {})
+        self.status_tag_ids: FrozenSet[int] = frozenset(t.id for t in self.tags.values() if t is not None)
+        closed = self.tags.get('CLOSED')
+        self.closed_tag_id = closed.id if closed is not None else None
+        self.tag_names: Dict[int, str] = {t.id: name for name, t in self.tags.items() if t is not None}
+        # Initial applied_tags for a new post
+        self.new_post_tags = [self.tags['NEW']] if self.tags.get('NEW') else []
+        self.mentions = " ".join(f"<@&{role_id}>" for role_id in admin_roles)
+
+    @classmethod
+    def resolve(cls, client: discord.Client, config) -> "RoutingContext":
+        """Look up the admin forum in the client cache and pick up its status tags"""
+        roles = config.get('discord.admin_roles', ()) or ()
+        channel_id = config.get('discord.admin_channel_id')
+        channel = client.get_channel(int(channel_id)) if channel_id else None
+        if not isinstance(channel, discord.ForumChannel):
+            return cls(admin_roles=roles)
+        tags = {tag.name: tag for tag in channel.available_tags if tag.name in STATUS_TAGS}
+        return cls(channel, tags, roles)
+
+    @property
+    def ready(self) -> bool:
+        return self.forum is not None
+
+    def status_of(self, thread: discord.Thread) -> Optional[str]:
+        """Status tag name applied to a post (first match), or None"""
+        for tag in thread.applied_tags:
+            name = self.tag_names.get(tag.id)
+            if name:
+                return name
+        return None
+
+    def is_closed(self, thread: discord.Thread) -> bool:
+        return self.closed_tag_id is not None and any(t.id == self.closed_tag_id for t in thread.applied_tags)
+
+    def with_status(self, thread: discord.Thread, tag_name: str) -> Optional[list]:
+        """applied_tags for thread with its status tag swapped for tag_name (None if the tag is missing)"""
+        tag = self.tags.get(tag_name)
+        if tag is None:
+            return None
+        return [t for t in thread.applied_tags if t.id not in self.status_tag_ids] + [tag]
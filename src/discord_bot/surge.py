@@ -0,0 +1,57 @@
+﻿import time
+from collections import deque
+from typing import Deque, Optional
+
+class SurgeDetector:
+    """Sliding-window count of ticket creations with hysteresis on exit"""
+
+    def __init__(self, threshold: int = 5, window_seconds: float = 60, cooldown_seconds: float = 120):
+        self.threshold = max(1, int(threshold))
+        self.window = float(window_seconds)
+        self.cooldown = float(cooldown_seconds)
+        self._created: Deque[float] = deque()
+        self.active = False
+        self._last_busy = 0.0
+        self.surges = 0
+
+    @classmethod
+    def from_config(cls, config) -> "SurgeDetector":
+        detector = cls()
+        detector.configure(config)
+        return detector
+
+    def configure(self, config):
+        """(Re)apply surge.* settings; the current window and state are kept"""
+        self.threshold = max(1, int(config.get('surge.threshold', 5)))
+        self.window = float(config.get('surge.window_seconds', 60))
+        self.cooldown = float(config.get('surge.cooldown_seconds', 120))
+
+    def _trim(self, now: float):
+        while self._created and now - self._created[0] > self.window:
+            self._created.popleft()
+
+    def record(self, now: Optional[float] = None) -> bool:
+        """Count one ticket creation; True if it falls inside a surge"""
+        now = time.monotonic() if now is None else now
+        self._created.append(now)
+        self._trim(now)
+        if len(self._created) >= self.threshold:
+            if not self.active:
+                self.surges += 1
+            self.active = True
+            self._last_busy = now
+        return self.active
+
+    def check(self, now: Optional[float] = None) -> bool:
+        """Re-evaluate the surge state; it ends after the rate stays low for cooldown seconds"""
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        if len(self._created) >= self.threshold:
+            self._last_busy = now
+        elif self.active and now - self._last_busy >= self.cooldown:
+            self.active = False
+        return self.active
+
+    @property
+    def recent(self) -> int:
+        return len(self._created)
@@ -1,22 +1,41 @@
 ﻿# main.py
 
 import asyncio
+import importlib
 import logging
 import signal
 import sys
-from dotenv import load_dotenv
+import time
 import os
 
-# Load environment variables from .env file (look in parent directory)
-load_dotenv('../.env')
-
 from utils.config import Config
-from crcon.client import CRCONClient
-from discord_bot.bot import DiscordBot
+from utils.instance_lock import InstanceLock
+from utils.lease import LeaderLease
+from utils.health import HealthServer
+from utils.loop_monitor import LoopMonitor
+
+def install_signal_handlers(stop: asyncio.Event):
+    """SIGINT/SIGTERM request a graceful shutdown instead of exiting from inside the loop"""
+    loop = asyncio.get_running_loop()
+
+    def request_stop(signum):
+        print(f"\n Received signal {signum}, shutting down...")
+        stop.set()
 
-async def main():
-    # Load configuration from the config folder (go up one level from src)
-    config = Config("../config/config.yaml")
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, request_stop, signum)
+        except (NotImplementedError, RuntimeError):
+            # Windows: no loop signal handlers
+            signal.signal(signum, lambda s, frame: loop.call_soon_threadsafe(request_stop, s))
+
+async def main(handoff: bool = False):
+    started = time.perf_counter()
+    stop = asyncio.Event()
+    install_signal_handlers(stop)
+    # Load configuration from the config folder (go up one level from src); ../.env fills in
+    # variables the environment does not set, at startup and on every reload
+    config = Config("../config/config.yaml", env_file="../.env")
     
     # Verify critical config is loaded
     if not config.get('discord.token'):
@@ -42,45 +61,158 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    # Initialize CRCON client
+    # Loop lag sampling and blocked-loop stack capture (loop_monitor.*)
+    loop_monitor = LoopMonitor.from_config(config)
+    if loop_monitor:
+        loop_monitor.start()
+    
+    # Exactly one instance dispatches: the one holding the lock. A second instance (redeploy
+    # handoff) warms up in standby and takes over when the active one has drained and exited.
+    # HA mode (ha.enabled): a renewed SQLite lease, so a stalled leader is replaced too
+    ha = bool(config.get('ha.enabled', False))
+    lock = LeaderLease.from_config(config) if ha else InstanceLock.from_config(config)
+    standby = not lock.acquire()
+    ready_file = os.path.join(config.get('state.dir', '../data'), 'standby.ready')
+    if standby:
+        print(f" Dispatch {'lease' if ha else 'lock'} held by {lock.holder()}: starting in standby")
+    # Set once this instance may consume /ws/logs: right away outside HA (a handoff standby
+    # connects early, frames are held by the dispatch gate), on takeover for an HA standby
+    stream_allowed = asyncio.Event()
+    if not standby or not ha:
+        stream_allowed.set()
+    
+    # Initialize CRCON client (does not import discord.py) and start probing/connecting right away;
+    # nothing is dispatched until the Discord side opens the gate after its warm start
+    from crcon.client import CRCONClient
     crcon_client = CRCONClient(config)
     
+    async def monitor():
+        # Runs again after each takeover when an HA leader was demoted to standby
+        while True:
+            await stream_allowed.wait()
+            # Own task per round: demote() waits for it to end without ending this loop
+            await asyncio.create_task(crcon_client.start_monitoring())
+            if stream_allowed.is_set():
+                return
+    monitor_task = asyncio.create_task(monitor())
+    
+    # discord.py is the heaviest import: load it off the loop while the CRCON handshakes run
+    bot_module = await asyncio.to_thread(importlib.import_module, 'discord_bot.bot')
+    
     # Initialize Discord bot
-    discord_bot = DiscordBot(config, crcon_client)
+    discord_bot = bot_module.DiscordBot(config, crcon_client, standby=standby)
+    
+    # /healthz, /readyz and /debug/state (health.*)
+    health = HealthServer.from_config(config, crcon_client, discord_bot,
+                                      role=lambda: 'standby' if discord_bot.standby else 'leader')
+    if health:
+        if loop_monitor:
+            health.sections['loop'] = loop_monitor.snapshot
+        await health.start()
+    
+    async def step_down():
+        # Lease taken over by another instance: stop dispatching now, leave the state to the
+        # new leader, and go back to warm standby (ready to take the lease again)
+        stream_allowed.clear()
+        await crcon_client.demote()
+        await discord_bot.demote()
+        asyncio.create_task(wait_for_dispatch())
+    
+    async def keep_warm():
+        # HA standby: keep the CRCON connections, roster and game context warm for a fast takeover
+        interval = float(config.get('ha.warm_interval_seconds', 30))
+        while not stream_allowed.is_set():
+            await crcon_client.warm_up(roster=True)
+            await asyncio.sleep(interval)
+    
+    async def take_over():
+        # Warm = logged into Discord (routing resolved) and, outside HA, WS handshake done;
+        # start.sh waits for the ready file
+        await discord_bot.connected.wait()
+        if stream_allowed.is_set():
+            await crcon_client.ws_connected.wait()
+        if handoff:
+            with open(ready_file, 'w') as file:
+                file.write(str(os.getpid()))
+        if discord_bot.standby:
+            print(f" Standby ready after {time.perf_counter() - started:.2f}s, waiting for the dispatch {'lease' if ha else 'lock'}")
+            await wait_for_dispatch()
+    
+    async def wait_for_dispatch():
+        warm_task = asyncio.create_task(keep_warm()) if ha else None
+        await lock.wait()
+        print(" Dispatch lock acquired, taking over")
+        if warm_task:
+            warm_task.cancel()
+        if handoff and os.path.exists(ready_file):
+            os.remove(ready_file)
+        lock.keep(step_down)
+        stream_allowed.set()
+        await discord_bot.activate()
+    asyncio.create_task(take_over())
+    if lock.held:
+        lock.keep(step_down)
+    
+    async def report_ready():
+        await crcon_client.streaming.wait()
+        print(f" Ready for tickets after {time.perf_counter() - started:.2f}s")
+    asyncio.create_task(report_ready())
+    
+    # Pick up config.yaml / .env edits without a restart (roles, triggers, thresholds)
+    if config.get('hot_reload.enabled', True):
+        config.watch()
     
     print(f" Starting HLL RCON Discord Bot...")
     
     # Start both services concurrently
+    services = asyncio.gather(
+        monitor_task,
+        discord_bot.start()
+    )
+    stopper = asyncio.create_task(stop.wait())
     try:
-        await asyncio.gather(
-            crcon_client.start_monitoring(),
-            discord_bot.start()
-        )
-        
-    except KeyboardInterrupt:
-        print("\n Shutdown requested by user")
+        await asyncio.wait({services, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        if services.done() and services.exception():
+            print(f"\n Unexpected error: {services.exception()}")
     except asyncio.CancelledError:
         print("\n Tasks cancelled during shutdown")
-    except Exception as e:
-        print(f"\n Unexpected error: {e}")
     finally:
+        stopper.cancel()
         print(" Cleaning up...")
-        # Add any cleanup code here if needed
+        # Stop reading chat, let in-flight tickets finish, drain in-game messages, persist, close
+        timeout = float(config.get('shutdown.timeout_seconds', 20))
+        deadline = time.monotonic() + timeout
+        try:
+            await crcon_client.shutdown(timeout / 2)
+            await discord_bot.shutdown(max(1.0, deadline - time.monotonic()))
+        except Exception as e:
+            print(f" Error during shutdown: {e}")
+        finally:
+            await crcon_client.close_session()
+            lock.release()
+            if health:
+                await health.stop()
+            if loop_monitor:
+                loop_monitor.stop()
+            if not services.done():
+                services.cancel()
+            try:
+                await services
+            except BaseException:
+                pass
         print(" Shutdown complete")
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully"""
-    print(f"\n Received signal {signum}, shutting down...")
-    sys.exit(0)
+def run(handoff: bool = False):
+    """Entry point shared by `python main.py` and run.py (expects src/ as working directory)
 
-if __name__ == "__main__":
-    # Set up signal handlers for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
+    handoff: started by `start.sh --handoff`, write <state.dir>/standby.ready once warm.
+    """
     try:
-        asyncio.run(main())
+        asyncio.run(main(handoff))
     except KeyboardInterrupt:
         print("\n Bot stopped successfully")
     except Exception as e:
         print(f"\n Fatal error: {e}")
+
+if __name__ == "__main__":
+    run(handoff='--handoff' in sys.argv)
@@ -1,56 +1,237 @@
-﻿import yaml
+﻿import asyncio
+import logging
+import yaml
 import os
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 import re
 
+try:
+    from dotenv import dotenv_values
+except ImportError:  # without python-dotenv, .env is ignored (environment variables only)
+    dotenv_values = None
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR_RE = re.compile(r'\$\{([^}]+)\}')
+UNRESOLVED_RE = re.compile(r'^\$\{[^}]+\}$')
+
+# Discord snowflakes, compiled to int
+ID_KEYS = ('discord.guild_id', 'discord.admin_channel_id', 'dashboard.channel_id', 'surge.digest_channel_id')
+# Must be present for the bot to run; a reload without them is rejected
+REQUIRED_KEYS = ('discord.token', 'crcon.base_url')
+# Leaf names (last key segment) whose values must be non-negative numbers when set
+NUMERIC_SUFFIXES = ('_seconds', '_minutes', '_mb', '_max', '_size', '_length', '_rows', '_entries',
+                    '_concurrency', '_per_minute', '_in_memory', '_messages', '_segments', 'threshold')
+
+_MISSING = object()
+
 class Config:
-    def __init__(self, config_file: str = "config.yaml"):
+    """Configuration compiled into an immutable, flattened snapshot
+
+    Every dotted key (leaves and sections) maps directly to its value, so get()
+    is a single dict lookup. Ids are ints, discord.admin_roles is a tuple of
+    ints, lists become tuples and sections read-only mappings. watch() polls the
+    YAML file and .env and swaps in a new snapshot when it validates.
+    """
+
+    def __init__(self, config_file: str = "config.yaml", env_file: Optional[str] = None):
         self.config_file = config_file
+        self.env_file = env_file
+        self._reload_callbacks: List[Callable[[Mapping[str, Any], Tuple[str, ...]], Any]] = []
+        self._mtimes = self._stat()
+        self._watch_task: Optional[asyncio.Task] = None
+        # Variables this instance took from .env (the process environment always wins)
+        self._env_owned: set = set()
+        self._load_env_file()
         self.data = self._load_config()
-    
+        snapshot, errors = self._compile(self.data)
+        for error in errors:
+            print(f"Configuration error: {error}")
+        self._snapshot: Mapping[str, Any] = snapshot
+        self.version = 1
+
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from YAML file with environment variable substitution"""
         try:
             with open(self.config_file, 'r') as file:
                 content = file.read()
-                
+
             # Replace environment variables in the format ${VAR_NAME}
             def replace_env_var(match):
                 var_name = match.group(1)
                 return os.getenv(var_name, match.group(0))  # Return original if env var not found
-            
-            content = re.sub(r'\$\{([^}]+)\}', replace_env_var, content)
-            
-            config = yaml.safe_load(content)
+
+            content = ENV_VAR_RE.sub(replace_env_var, content)
+
+            config = yaml.safe_load(content) or {}
             print(f"Configuration loaded from {self.config_file}")
             return config
-            
+
         except FileNotFoundError:
             print(f"Configuration file {self.config_file} not found")
             return {}
         except yaml.YAMLError as e:
             print(f"Error parsing YAML configuration: {e}")
             return {}
-    
+
+    @classmethod
+    def _compile(cls, data: Dict[str, Any]) -> Tuple[Mapping[str, Any], List[str]]:
+        """Flatten and type the raw YAML; returns (snapshot, validation errors)"""
+        flat: Dict[str, Any] = {}
+        errors: List[str] = []
+
+        def freeze(value):
+            if isinstance(value, dict):
+                return MappingProxyType({k: freeze(v) for k, v in value.items()})
+            if isinstance(value, list):
+                return tuple(freeze(v) for v in value)
+            if isinstance(value, str) and UNRESOLVED_RE.match(value):
+                # ${VAR} left in place: the variable is not set
+                return None
+            return value
+
+        def walk(prefix: str, node: Dict[str, Any]):
+            for key, value in node.items():
+                path = f"{prefix}.{key}" if prefix else str(key)
+                if isinstance(value, dict):
+                    walk(path, value)
+                flat[path] = freeze(value)
+
+        walk("", data if isinstance(data, dict) else {})
+
+        for key in ID_KEYS:
+            value = flat.get(key)
+            if value in (None, ''):
+                continue
+            try:
+                flat[key] = int(value)
+            except (TypeError, ValueError):
+                errors.append(f"{key} must be a numeric id (got {value!r})")
+                flat[key] = None
+
+        roles = flat.get('discord.admin_roles')
+        if isinstance(roles, (str, int)):
+            roles = [r.strip() for r in str(roles).split(',')]
+        parsed_roles = []
+        for role in roles or ():
+            try:
+                parsed_roles.append(int(role))
+            except (TypeError, ValueError):
+                if str(role).strip():
+                    errors.append(f"discord.admin_roles: {role!r} is not a role id")
+        flat['discord.admin_roles'] = tuple(parsed_roles)
+
+        triggers = flat.get('tickets.triggers')
+        if isinstance(triggers, str):
+            triggers = (triggers,)
+        flat['tickets.triggers'] = tuple(str(t).lower() for t in triggers or ('admin',) if str(t).strip())
+
+        for key, value in flat.items():
+            if value is None or isinstance(value, Mapping) or not key.rsplit('.', 1)[-1].endswith(NUMERIC_SUFFIXES):
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                errors.append(f"{key} must be a non-negative number (got {value!r})")
+
+        for key in REQUIRED_KEYS:
+            if not flat.get(key):
+                errors.append(f"{key} is not set")
+
+        return MappingProxyType(flat), errors
+
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value using dot notation (e.g., 'discord.token')"""
-        keys = key.split('.')
-        value = self.data
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        # Handle comma-separated values for admin roles
-        if key == 'discord.admin_roles' and isinstance(value, str):
-            return [role.strip() for role in value.split(',') if role.strip()]
-        
-        return value
-    
+        value = self._snapshot.get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    @property
+    def snapshot(self) -> Mapping[str, Any]:
+        """Current read-only snapshot (replaced as a whole on reload)"""
+        return self._snapshot
+
     def __getitem__(self, key: str) -> Any:
         return self.get(key)
-    
+
     def __contains__(self, key: str) -> bool:
-        return self.get(key) is not None
\ No newline at end of file
+        return self.get(key) is not None
+
+    def on_reload(self, callback: Callable[[Mapping[str, Any], Tuple[str, ...]], Any]):
+        """callback(snapshot, changed_keys) runs after a new snapshot is swapped in"""
+        self._reload_callbacks.append(callback)
+
+    def _stat(self) -> Tuple[Optional[float], ...]:
+        mtimes = []
+        for path in (self.config_file, self.env_file):
+            try:
+                mtimes.append(os.stat(path).st_mtime if path else None)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _load_env_file(self):
+        """Export .env values that the process environment does not already define
+
+        Same rule at startup and on reload: a variable set by the environment (shell,
+        systemd, docker) is never overridden; one that came from .env follows the file,
+        and is unset again when the file no longer defines it.
+        """
+        if not self.env_file:
+            return
+        if dotenv_values is None:
+            print(f"python-dotenv is not installed, {self.env_file} is ignored")
+            return
+        values = dotenv_values(self.env_file)
+        for name, value in values.items():
+            if value is None or (name in os.environ and name not in self._env_owned):
+                continue
+            os.environ[name] = value
+            self._env_owned.add(name)
+        for name in [n for n in self._env_owned if values.get(n) is None]:
+            os.environ.pop(name, None)
+            self._env_owned.discard(name)
+
+    def reload(self) -> bool:
+        """Re-read .env and the YAML file; swap the snapshot only if it validates"""
+        self._load_env_file()
+        data = self._load_config()
+        snapshot, errors = self._compile(data)
+        if errors:
+            for error in errors:
+                logger.error(f"Config reload rejected: {error}")
+                print(f"Config reload rejected: {error}")
+            return False
+
+        old = self._snapshot
+        changed = tuple(sorted(
+            key for key in set(old) | set(snapshot)
+            if not isinstance(snapshot.get(key), Mapping) and old.get(key, _MISSING) != snapshot.get(key, _MISSING)
+        ))
+        self.data = data
+        self._snapshot = snapshot
+        self.version += 1
+        if changed:
+            logger.info(f"Config reloaded (v{self.version}), changed: {', '.join(changed)}")
+            print(f"Config reloaded, changed: {', '.join(changed)}")
+            for callback in self._reload_callbacks:
+                try:
+                    callback(snapshot, changed)
+                except Exception as e:
+                    logger.error(f"Config reload callback failed: {e}")
+        return True
+
+    def watch(self, interval: Optional[float] = None) -> asyncio.Task:
+        """Poll the config and .env mtimes and reload on change"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(interval))
+        return self._watch_task
+
+    async def _watch(self, interval: Optional[float]):
+        while True:
+            await asyncio.sleep(interval or float(self.get('hot_reload.interval_seconds', 5) or 5))
+            mtimes = self._stat()
+            if mtimes != self._mtimes:
+                self._mtimes = mtimes
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Config reload failed: {e}")
@@ -0,0 +1,124 @@
+﻿import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from aiohttp import web
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+class HealthServer:
+    """Embedded HTTP server: /healthz (liveness), /readyz (readiness), /debug/state (JSON),
+    /metrics (Prometheus text format)
+
+    Liveness is the event loop's own heartbeat: a ticker records when it last ran,
+    so a loop that is alive but starved reports unhealthy. Everything is read from
+    the live objects on request, nothing is precomputed.
+    """
+
+    def __init__(self, config, crcon_client, discord_bot, role: Optional[Callable[[], str]] = None):
+        self.config = config
+        self.crcon_client = crcon_client
+        self.discord_bot = discord_bot
+        self.role = role or (lambda: 'leader')
+        self.host = config.get('health.host', '127.0.0.1')
+        self.port = int(config.get('health.port', 8765))
+        self.tick_interval = 1.0
+        self.started = time.monotonic()
+        self.last_tick = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+        self._tasks = []
+        # Extra /debug/state sections (name -> callable returning JSON-able data)
+        self.sections: Dict[str, Callable[[], object]] = {}
+
+    @classmethod
+    def from_config(cls, config, crcon_client, discord_bot, role=None) -> Optional["HealthServer"]:
+        if not config.get('health.enabled', True):
+            return None
+        return cls(config, crcon_client, discord_bot, role)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/healthz', self.healthz)
+        app.router.add_get('/readyz', self.readyz)
+        app.router.add_get('/debug/state', self.debug_state)
+        app.router.add_get('/metrics', self.metrics)
+        return app
+
+    async def start(self):
+        self._tasks.append(asyncio.create_task(self._tick()))
+        self._tasks.append(asyncio.create_task(self._serve()))
+
+    async def _serve(self):
+        # The port may still be held by the instance we are replacing (handoff/HA): retry
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        while True:
+            try:
+                await web.TCPSite(runner, self.host, self.port).start()
+                self._runner = runner
+                logger.info(f"Health endpoint on http://{self.host}:{self.port}")
+                return
+            except OSError as e:
+                logger.warning(f"Health endpoint: cannot bind {self.host}:{self.port} ({e}), retrying")
+                await asyncio.sleep(5)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _tick(self):
+        while True:
+            self.last_tick = time.monotonic()
+            await asyncio.sleep(self.tick_interval)
+
+    def loop_lag(self) -> float:
+        return max(0.0, time.monotonic() - self.last_tick - self.tick_interval)
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        lag = self.loop_lag()
+        ok = lag <= float(self.config.get('health.max_loop_lag_seconds', 5))
+        return web.json_response({'ok': ok, 'loop_lag_seconds': round(lag, 3)}, status=200 if ok else 503)
+
+    def readiness(self) -> Dict[str, bool]:
+        checks = dict(self.discord_bot.readiness())
+        max_silence = float(self.config.get('health.ws_max_silence_seconds', 120))
+        last = self.crcon_client.last_frame_at
+        checks['ws_recent_frame'] = last is not None and time.monotonic() - last <= max_silence
+        return checks
+
+    async def readyz(self, request: web.Request) -> web.Response:
+        checks = self.readiness()
+        ready = all(checks.values())
+        return web.json_response({'ready': ready, 'role': self.role(), 'checks': checks},
+                                 status=200 if ready else 503)
+
+    async def debug_state(self, request: web.Request) -> web.Response:
+        state = {
+            'role': self.role(),
+            'uptime_seconds': int(time.monotonic() - self.started),
+            'loop_lag_seconds': round(self.loop_lag(), 3),
+            'config_version': getattr(self.config, 'version', None),
+            'ready': self.readiness(),
+            'discord': self.discord_bot.debug_state(),
+            'crcon': self.crcon_client.debug_state(),
+        }
+        for name, section in self.sections.items():
+            try:
+                state[name] = section()
+            except Exception as e:
+                state[name] = {'error': str(e)}
+        return web.json_response(state, dumps=_dumps)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.render(), content_type='text/plain', charset='utf-8')
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
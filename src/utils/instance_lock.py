@@ -0,0 +1,74 @@
+﻿import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, single-instance deployments only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class InstanceLock:
+    """Exclusive lock file held by the instance that dispatches chat (at most one at a time)
+
+    flock() based, so it is released by the kernel if the process dies. The holder's
+    pid is written into the file for diagnostics.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config) -> "InstanceLock":
+        return cls(os.path.join(config.get('state.dir', '../data'), 'dispatch.lock'))
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try to take the lock without blocking"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    async def wait(self, poll_interval: float = 0.2):
+        """Wait until the current holder exits or releases the lock, then take it"""
+        while not self.acquire():
+            await asyncio.sleep(poll_interval)
+
+    def holder(self) -> Optional[int]:
+        try:
+            return int(self.path.read_text().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def keep(self, on_lost):
+        """flock cannot be lost while the process lives: nothing to renew"""
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+        self._fd = None
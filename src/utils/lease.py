@@ -0,0 +1,157 @@
+﻿import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """Time-bounded leader lease in a SQLite file shared by the HA instances
+
+    The leader renews the lease every renew_interval; a standby takes it over once
+    it has not been renewed for ttl seconds (crashed or stalled leader). Same
+    acquire()/wait()/release()/holder() interface as InstanceLock.
+
+    A renewal that fails (database locked, I/O error) is not a lost lease: it is
+    retried until our own expiry; only a lease owned by someone else, or one we could
+    not renew before it expired, makes the leader step down.
+    """
+
+    def __init__(self, path: str, ttl: float = 10.0, renew_interval: float = 3.0,
+                 owner: Optional[str] = None, name: str = 'dispatch'):
+        self.path = path
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.name = name
+        # time.time() at which our last successful renewal expires
+        self.expires_at = 0.0
+        self._held = False
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, config) -> "LeaderLease":
+        return cls(
+            os.path.join(config.get('state.dir', '../data'), 'lease.db'),
+            ttl=float(config.get('ha.lease_ttl_seconds', 10)),
+            renew_interval=float(config.get('ha.renew_interval_seconds', 3)),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=2.0, isolation_level=None)
+        db.execute("CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+        return db
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease; False when another instance holds it
+
+        Raises sqlite3.Error when the database could not be read or written (blocking:
+        call it through asyncio.to_thread from the event loop).
+        """
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT owner, expires_at FROM lease WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            if row and row[0] != self.owner and row[1] > now:
+                db.execute("ROLLBACK")
+                self._held = False
+                return False
+            db.execute("INSERT OR REPLACE INTO lease (name, owner, expires_at) VALUES (?, ?, ?)",
+                       (self.name, self.owner, now + self.ttl))
+            db.execute("COMMIT")
+            if not self._held:
+                logger.info(f"Lease acquired by {self.owner}")
+            self._held = True
+            self.expires_at = now + self.ttl
+            return True
+        except sqlite3.Error:
+            try:
+                db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            db.close()
+
+    def acquire(self) -> bool:
+        """Take or renew the lease if it is free, expired or already ours"""
+        try:
+            return self.try_acquire()
+        except sqlite3.Error as e:
+            logger.error(f"Lease update failed: {e}")
+            return False
+
+    async def wait(self, poll_interval: Optional[float] = None):
+        """Wait until the lease is free or expired, then take it"""
+        while not await asyncio.to_thread(self.acquire):
+            await asyncio.sleep(poll_interval or min(1.0, self.renew_interval))
+
+    def holder(self) -> Optional[str]:
+        try:
+            db = self._connect()
+            try:
+                row = db.execute("SELECT owner, expires_at FROM lease WHERE name = ?", (self.name,)).fetchone()
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row and row[1] > time.time() else None
+
+    def keep(self, on_lost: Callable[[], Awaitable[None]]):
+        """Renew in the background; on_lost() runs once another instance owns the lease,
+        or when renewals kept failing until our lease expired"""
+        async def heartbeat():
+            delay = self.renew_interval
+            while self._held:
+                await asyncio.sleep(delay)
+                started = time.time()
+                if not self._held:
+                    return
+                try:
+                    renewed = await asyncio.to_thread(self.try_acquire)
+                except sqlite3.Error as e:
+                    if time.time() < self.expires_at:
+                        # Still ours until expires_at: retry sooner rather than step down
+                        logger.warning(f"Lease renewal failed ({e}), retrying "
+                                       f"({self.expires_at - time.time():.1f}s left)")
+                        delay = min(1.0, self.renew_interval)
+                        continue
+                    logger.critical(f"Lease expired after failed renewals ({e}), stepping down")
+                    self._held = False
+                    await on_lost()
+                    return
+                if not renewed:
+                    logger.critical(f"Lease lost by {self.owner}, stepping down")
+                    await on_lost()
+                    return
+                delay = self.renew_interval
+                if time.time() - started > self.renew_interval:
+                    logger.warning(f"Slow lease renewal ({time.time() - started:.1f}s)")
+
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(heartbeat())
+
+    def release(self):
+        """Expire our lease now so a standby takes over without waiting for the TTL"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        if not self._held:
+            return
+        self._held = False
+        try:
+            db = self._connect()
+            try:
+                db.execute("UPDATE lease SET expires_at = 0 WHERE name = ? AND owner = ?", (self.name, self.owner))
+            finally:
+                db.close()
+        except sqlite3.Error as e:
+            logger.error(f"Could not release lease: {e}")
@@ -0,0 +1,129 @@
+﻿import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from utils.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class LoopMonitor:
+    """Event loop lag sampler plus a watchdog thread that catches what blocks the loop
+
+    The sampler sleeps `interval` seconds and measures how late it wakes up: that delay is
+    the time every other callback had to wait. When the loop stops ticking for longer than
+    `stall_seconds`, the watchdog thread grabs the loop thread's current stack, i.e. the
+    code (task/coroutine frames included) that is holding the loop at that very moment.
+    Optionally enables asyncio debug mode, which logs every callback slower than
+    `slow_callback_seconds` (costly, meant for investigations).
+    """
+
+    def __init__(self, interval: float = 0.25, lag_budget: float = 0.1, stall_seconds: float = 1.0,
+                 asyncio_debug: bool = False, slow_callback_seconds: float = 0.1,
+                 registry: MetricsRegistry = REGISTRY):
+        self.interval = interval
+        self.lag_budget = lag_budget
+        self.stall_seconds = stall_seconds
+        self.asyncio_debug = asyncio_debug
+        self.slow_callback_seconds = slow_callback_seconds
+        self.lag_histogram = registry.histogram('loop_lag_seconds', 'Event loop wake-up delay', LAG_BUCKETS)
+        self.lag_max = registry.gauge('loop_lag_max_seconds', 'Largest event loop delay since start')
+        self.over_budget = registry.counter('loop_lag_over_budget_total', 'Samples above the lag budget')
+        self.stalls = registry.counter('loop_stalls_total', 'Loop blocked longer than the stall threshold')
+        self.last_tick = time.monotonic()
+        self.max_lag = 0.0
+        self.recent = deque(maxlen=240)
+        self.last_stall: Optional[dict] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_warning = 0.0
+
+    @classmethod
+    def from_config(cls, config) -> Optional["LoopMonitor"]:
+        if not config.get('loop_monitor.enabled', True):
+            return None
+        return cls(
+            interval=float(config.get('loop_monitor.interval_seconds', 0.25)),
+            lag_budget=float(config.get('loop_monitor.lag_budget_ms', 100)) / 1000,
+            stall_seconds=float(config.get('loop_monitor.stall_seconds', 1.0)),
+            asyncio_debug=bool(config.get('loop_monitor.asyncio_debug', False)),
+            slow_callback_seconds=float(config.get('loop_monitor.slow_callback_ms', 100)) / 1000,
+        )
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self.asyncio_debug:
+            # asyncio then logs "Executing <Task ...> took X seconds" on the 'asyncio' logger
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback_seconds
+            logging.getLogger('asyncio').setLevel(logging.WARNING)
+        self.last_tick = time.monotonic()
+        self._task = asyncio.create_task(self._sample())
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_tick = now
+            lag = max(0.0, now - expected)
+            self.recent.append(lag)
+            self.lag_histogram.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                self.lag_max.set(lag)
+            if lag > self.lag_budget:
+                self.over_budget.inc()
+                # At most one line per 10s: a degraded loop should not also flood the logs
+                if now - self._last_warning >= 10:
+                    self._last_warning = now
+                    logger.warning(f"Event loop lag {lag * 1000:.0f}ms (budget {self.lag_budget * 1000:.0f}ms)")
+
+    def _watch(self):
+        reported = False
+        while not self._stopped.wait(self.stall_seconds / 4):
+            blocked = time.monotonic() - self.last_tick - self.interval
+            if blocked < self.stall_seconds:
+                reported = False
+                continue
+            if reported:
+                continue
+            # Once per stall: the stack of the loop thread is the offending callback
+            reported = True
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = ''.join(traceback.format_stack(frame)) if frame else '<loop thread not found>'
+            self.stalls.inc()
+            self.last_stall = {'at': time.time(), 'blocked_seconds': round(blocked, 3), 'stack': stack}
+            logger.warning(f"Event loop blocked for {blocked:.2f}s, loop thread stack:\n{stack}")
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent)
+        def pct(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 1) if recent else None
+        return {
+            'lag_ms_p50': pct(0.5),
+            'lag_ms_p99': pct(0.99),
+            'lag_ms_max': round(self.max_lag * 1000, 1),
+            'over_budget': int(self.over_budget.get()),
+            'stalls': int(self.stalls.get()),
+            'last_stall': self.last_stall,
+            'asyncio_debug': self.asyncio_debug,
+        }
@@ -0,0 +1,159 @@
+﻿import asyncio
+import cProfile
+import importlib.util
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sample', 'cprofile', 'yappi')
+
+class Profiler:
+    """On-demand profiling of the event loop thread for a bounded window
+
+    Nothing is installed until run() is called, so a disabled profiler costs nothing.
+    Modes:
+      sample   - a thread snapshots the loop thread's stack every `interval` seconds;
+                 writes collapsed stacks (flamegraph.pl / speedscope input). Lowest overhead.
+      cprofile - deterministic cProfile of the loop thread; writes a .pstats file.
+      yappi    - yappi wall-clock profile (coroutine aware) saved as .pstats; needs
+                 `pip install yappi`, falls back to cprofile otherwise.
+    """
+
+    def __init__(self, out_dir: str, mode: str = 'sample', interval: float = 0.005, top: int = 15):
+        self.out_dir = out_dir
+        self.mode = mode if mode in MODES else 'sample'
+        self.interval = interval
+        self.top = top
+        self.running = False
+
+    @classmethod
+    def from_config(cls, config) -> "Profiler":
+        state_dir = config.get('state.dir', '../data')
+        return cls(
+            out_dir=config.get('profiling.dir', os.path.join(state_dir, 'profiles')),
+            mode=str(config.get('profiling.mode', 'sample')).lower(),
+            interval=float(config.get('profiling.sample_interval_ms', 5)) / 1000,
+            top=int(config.get('profiling.top', 15)),
+        )
+
+    async def run(self, seconds: float) -> Tuple[str, List[str]]:
+        """Profile the running loop for `seconds`; returns (output file, summary lines)"""
+        if self.running:
+            raise RuntimeError("a profile is already running")
+        self.running = True
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            stamp = time.strftime('%Y%m%d-%H%M%S')
+            mode = self.mode
+            if mode == 'yappi' and importlib.util.find_spec('yappi') is None:
+                logger.warning("yappi not installed, profiling with cProfile instead")
+                mode = 'cprofile'
+            if mode == 'sample':
+                path = os.path.join(self.out_dir, f'profile-{stamp}.collapsed')
+                stacks = await self._sample(seconds)
+                summary = await asyncio.to_thread(self._write_collapsed, stacks, path)
+            else:
+                path = os.path.join(self.out_dir, f'profile-{stamp}.pstats')
+                if mode == 'yappi':
+                    await self._yappi(seconds, path)
+                else:
+                    await self._cprofile(seconds, path)
+                summary = await asyncio.to_thread(self._pstats_summary, path)
+            logger.info(f"Profile ({mode}, {seconds:g}s) written to {path}")
+            return path, summary
+        finally:
+            self.running = False
+
+    async def _sample(self, seconds: float) -> Counter:
+        target = threading.get_ident()
+        stacks: Counter = Counter()
+        done = threading.Event()
+
+        def sampler():
+            while not done.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[';'.join(reversed(stack))] += 1
+
+        # The sampler needs the GIL: with the default 5ms switch interval it mostly gets it when
+        # the loop thread goes idle in select(), so short callbacks would be missed. 100us
+        # forces a prompt handover while profiling
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, 0.0001))
+        thread = threading.Thread(target=sampler, name='profile-sampler', daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            done.set()
+            sys.setswitchinterval(switch_interval)
+            await asyncio.to_thread(thread.join)
+        return stacks
+
+    def _write_collapsed(self, stacks: Counter, path: str) -> List[str]:
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        total = sum(stacks.values())
+        if not total:
+            return ["aucun échantillon"]
+        # A loop thread waiting in select() is idle, not slow: report it apart
+        idle = sum(n for stack, n in stacks.items() if stack.rsplit(';', 1)[-1].startswith(('select ', 'poll ', 'epoll')))
+        busy = total - idle
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            if frames[-1].startswith(('select ', 'poll ', 'epoll')):
+                continue
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        lines = [f"{total} échantillons, boucle occupée {100 * busy / total:.1f}% du temps"]
+        for name, count in own.most_common(self.top):
+            lines.append(f"{100 * count / total:5.1f}% self {100 * inclusive[name] / total:5.1f}% cumul  {name}")
+        return lines
+
+    async def _cprofile(self, seconds: float, path: str):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        profile.dump_stats(path)
+
+    async def _yappi(self, seconds: float, path: str):
+        import yappi
+        yappi.set_clock_type('wall')
+        yappi.clear_stats()
+        yappi.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            yappi.stop()
+        yappi.get_func_stats().save(path, type='pstat')
+        yappi.clear_stats()
+
+    def _pstats_summary(self, path: str) -> List[str]:
+        stats = pstats.Stats(path, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (cc, nc, tottime, cumtime, callers) in stats.stats.items():
+            rows.append((tottime, cumtime, nc, f"{name} ({os.path.basename(filename)}:{line})"))
+        rows.sort(reverse=True)
+        lines = [f"{len(rows)} fonctions, {stats.total_tt:.3f}s mesurées"]
+        for tottime, cumtime, calls, label in rows[:self.top]:
+            lines.append(f"{tottime * 1000:8.1f}ms self {cumtime * 1000:8.1f}ms cumul {calls:6d}x  {label}")
+        return lines
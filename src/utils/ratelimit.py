@@ -0,0 +1,39 @@
+﻿import time
+from typing import Optional
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute, up to capacity tokens
+
+    consume() may push the balance below zero so that an expensive action is
+    paid for by a longer wait before the next one.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, cost: float = 1.0) -> float:
+        """Seconds until cost tokens are available (0 when they already are)"""
+        self._refill()
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (cost - self.tokens) / self.rate
+
+    def consume(self, cost: float = 1.0):
+        self._refill()
+        self.tokens -= cost
+
+    def try_consume(self, cost: float = 1.0) -> bool:
+        if self.time_until(cost) > 0:
+            return False
+        self.tokens -= cost
+        return True
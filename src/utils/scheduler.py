@@ -0,0 +1,200 @@
+﻿import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TimerScheduler:
+    """Single heap-driven scheduler for all persistent timers (O(log n) per operation)
+
+    Timers are identified by a string key; scheduling an existing key replaces it.
+    Deadlines are wall-clock timestamps so they survive a restart through the StateStore.
+    """
+
+    def __init__(self, store=None, name: str = "timers", flush_interval: float = 5.0):
+        self.store = store
+        self.name = name
+        self.flush_interval = flush_interval
+        # (deadline, seq, key); entries whose seq no longer matches are stale
+        self._heap: List[Tuple[float, int, str]] = []
+        # key -> {'kind', 'deadline', 'seq', 'data'}
+        self._timers: Dict[str, dict] = {}
+        self._handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._saving: Optional[asyncio.Future] = None
+        self._dirty = False
+        self.fired = 0
+
+    def register(self, kind: str, handler: Callable[..., Awaitable[Any]]):
+        """Handler is awaited as handler(key, **data) when a timer of this kind fires"""
+        self._handlers[kind] = handler
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def schedule(self, key: str, kind: str, deadline: float, **data):
+        """Create or replace a timer; deadline is a time.time() timestamp"""
+        seq = next(self._seq)
+        self._timers[key] = {'kind': kind, 'deadline': deadline, 'seq': seq, 'data': data}
+        heapq.heappush(self._heap, (deadline, seq, key))
+        self._dirty = True
+        if self._heap[0][1] == seq:
+            self._wake.set()
+
+    def schedule_in(self, key: str, kind: str, delay_seconds: float, **data):
+        self.schedule(key, kind, time.time() + delay_seconds, **data)
+
+    def cancel(self, key: str) -> bool:
+        if self._timers.pop(key, None) is None:
+            return False
+        self._dirty = True
+        # Lazy deletion; compact when stale entries dominate the heap
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._compact()
+        return True
+
+    def pending(self, key: str) -> Optional[float]:
+        timer = self._timers.get(key)
+        return timer['deadline'] if timer else None
+
+    def data(self, key: str) -> Optional[dict]:
+        """Keyword data of a pending timer"""
+        timer = self._timers.get(key)
+        return timer['data'] if timer else None
+
+    def _compact(self):
+        self._heap = [(t['deadline'], t['seq'], k) for k, t in self._timers.items()]
+        heapq.heapify(self._heap)
+
+    def load(self):
+        """Restore persisted timers (overdue ones fire as soon as the scheduler starts)"""
+        if not self.store:
+            return
+        saved = self.store.load(self.name, []) or []
+        for item in saved:
+            try:
+                self.schedule(item['key'], item['kind'], float(item['deadline']), **(item.get('data') or {}))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self._dirty = False
+        if saved:
+            logger.info(f"Restored {len(self._timers)} timer(s)")
+
+    def _snapshot(self) -> List[dict]:
+        return [
+            {'key': k, 'kind': t['kind'], 'deadline': t['deadline'], 'data': dict(t['data'])}
+            for k, t in self._timers.items()
+        ]
+
+    def flush(self):
+        """Persist pending timers now, blocking (shutdown path)"""
+        if not self.store:
+            return
+        try:
+            self.store.save(self.name, self._snapshot())
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Could not persist timers: {e}")
+
+    async def flush_async(self):
+        """Persist pending timers from a worker thread (the write fsyncs)
+
+        The snapshot is taken on the loop; changes made while the write runs
+        leave the scheduler dirty for the next flush.
+        """
+        if not self.store:
+            return
+        snapshot = self._snapshot()
+        self._dirty = False
+        # Shielded so a cancelled flush loop never leaves two writers on the temp file
+        self._saving = asyncio.ensure_future(asyncio.to_thread(self.store.save, self.name, snapshot))
+        try:
+            await asyncio.shield(self._saving)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Could not persist timers: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, flush: bool = True):
+        """Stop the tasks; flush=False when another instance now owns the persisted state"""
+        for task in (self._task, self._flush_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._flush_task = None
+        if self._saving and not self._saving.done():
+            await asyncio.wait([self._saving])
+        if flush:
+            self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._dirty:
+                await self.flush_async()
+
+    async def _run(self):
+        while True:
+            # Drop stale heads
+            while self._heap:
+                deadline, seq, key = self._heap[0]
+                timer = self._timers.get(key)
+                if timer and timer['seq'] == seq:
+                    break
+                heapq.heappop(self._heap)
+
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                timer = self._timers.get(key)
+                if not timer or timer['seq'] != seq:
+                    continue
+                del self._timers[key]
+                self._dirty = True
+                self._fire(key, timer)
+
+    def _fire(self, key: str, timer: dict):
+        handler = self._handlers.get(timer['kind'])
+        if not handler:
+            logger.warning(f"No handler for timer kind {timer['kind']} ({key})")
+            return
+        self.fired += 1
+
+        async def run():
+            try:
+                await handler(key, **timer['data'])
+            except Exception as e:
+                logger.error(f"Timer {key} failed: {e}")
+
+        asyncio.create_task(run())
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': len(self._timers), 'heap': len(self._heap), 'fired': self.fired}
@@ -0,0 +1,42 @@
+﻿import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+class StateStore:
+    """Small JSON documents persisted under the bot's state directory"""
+
+    def __init__(self, directory: str = "../data"):
+        self.directory = Path(directory)
+
+    @classmethod
+    def from_config(cls, config) -> "StateStore":
+        return cls(config.get('state.dir', '../data'))
+
+    def path(self, name: str) -> Path:
+        return self.directory / f"{name}.json"
+
+    def load(self, name: str, default: Any = None) -> Any:
+        """Read a document, falling back to default when missing or unreadable"""
+        try:
+            with open(self.path(name), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return default
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read state file {self.path(name)}: {e}")
+            return default
+
+    def save(self, name: str, data: Any):
+        """Write a document atomically (temp file + rename)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.path(name)
+        tmp = target.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, target)
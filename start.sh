@@ -80,15 +80,13 @@ def iter_bot_pids(dir_path: Path):
             cwd = Path(f"/proc/{pid}/cwd").resolve()
         except FileNotFoundError:
             continue
-        if cwd == dir_path or str(dir_path) in line:
+        # run.py switches to src/ in-process
+        if cwd in (dir_path, dir_path / "src") or str(dir_path) in line:
             yield pid
 
-def kill_existing_instances(dir_path: Path, session: str, socket: str):
+def kill_existing_instances(dir_path: Path, session: str, socket: str, stop_timeout: float = 30):
     os.environ.pop("TMUX", None)
 
-    # Kill tmux session for this bot
-    tmux(f"kill-session -t {session}", socket)
-
     def kill_with(sig):
         for pid in list(iter_bot_pids(dir_path)):
             try:
@@ -96,9 +94,14 @@ def kill_existing_instances(dir_path: Path, session: str, socket: str):
             except ProcessLookupError:
                 pass
 
-    # soft
+    # soft: the bot drains in-flight chat and queued in-game messages, then persists and exits
     kill_with(signal.SIGTERM)
-    time.sleep(1)
+    deadline = time.time() + stop_timeout
+    while time.time() < deadline and list(iter_bot_pids(dir_path)):
+        time.sleep(0.5)
+
+    # Kill tmux session for this bot (after the process had its chance to exit)
+    tmux(f"kill-session -t {session}", socket)
 
     # hard if needed
     remaining = list(iter_bot_pids(dir_path))
@@ -113,12 +116,12 @@ def kill_existing_instances(dir_path: Path, session: str, socket: str):
     else:
         log("OK: no existing bot processes for this project")
 
-def start_detached(dir_path: Path, venv_py: Path, session: str, socket: str):
+def start_detached(dir_path: Path, venv_py: Path, session: str, socket: str, stop_timeout: float = 30):
     if not which("tmux"):
         die("tmux not installed for -d mode")
 
     ensure_tmp_perms()
-    kill_existing_instances(dir_path, session, socket)
+    kill_existing_instances(dir_path, session, socket, stop_timeout)
 
     sh(f"tmux -L {socket} start-server")
     sh(f"tmux -L {socket} new-session -d -s {session} -c {dir_path}")
@@ -146,8 +149,75 @@ def start_detached(dir_path: Path, venv_py: Path, session: str, socket: str):
     log(f"OK: running in background. Attach: tmux -L {socket} attach -t {session}")
     log(f"Logs: tail -f {logdir / f'tmux-{session}.log'}")
 
-def start_foreground(dir_path: Path, venv_py: Path, session: str, socket: str):
-    kill_existing_instances(dir_path, session, socket)
+def start_handoff(dir_path: Path, venv_py: Path, session: str, socket: str,
+                  stop_timeout: float = 30, ready_timeout: float = 180):
+    """
+    Zero-downtime redeploy: the new instance starts in standby next to the running one
+    (data/dispatch.lock is held by the old one), loads its state and signals readiness
+    through data/standby.ready. Only then is the old instance drained (SIGTERM); the new
+    one takes the lock, the persisted queue/timers/tickets and the WS cursor, and dispatches.
+    """
+    if not which("tmux"):
+        die("tmux not installed for --handoff mode")
+
+    old = set(iter_bot_pids(dir_path))
+    if not old:
+        log("No running instance: plain start")
+        start_detached(dir_path, venv_py, session, socket, stop_timeout)
+        return
+
+    ensure_tmp_perms()
+    ready = dir_path / "data" / "standby.ready"
+    ready.unlink(missing_ok=True)
+    staging = f"{session}-next"
+    tmux(f"kill-session -t {staging}", socket)
+
+    sh(f"tmux -L {socket} new-session -d -s {staging} -c {dir_path}")
+    logdir = dir_path / "logs"
+    logdir.mkdir(exist_ok=True)
+    tmux(
+        f"pipe-pane -o -t {staging} \"cat >> '{(logdir / f'tmux-{session}.log')}'\"",
+        socket,
+    )
+    cmd = f"source {dir_path/'venv/bin/activate'} && exec {venv_py} run.py --handoff"
+    tmux(f"send-keys -t {staging} \"{cmd}\" C-m", socket)
+
+    log(f"Standby starting (old: {sorted(old)}), waiting up to {ready_timeout:.0f}s for readiness")
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline and not ready.exists():
+        time.sleep(0.5)
+    if not ready.exists():
+        for pid in set(iter_bot_pids(dir_path)) - old:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        tmux(f"kill-session -t {staging}", socket)
+        die("standby did not become ready; the running instance was left untouched")
+
+    log(f"Standby ready (pid {ready.read_text().strip()}), draining the old instance")
+    for pid in old:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.time() + stop_timeout
+    while time.time() < deadline and old & set(iter_bot_pids(dir_path)):
+        time.sleep(0.2)
+    for pid in old & set(iter_bot_pids(dir_path)):
+        log(f"WARN: {pid} did not exit after {stop_timeout:.0f}s, killing")
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    tmux(f"kill-session -t {session}", socket)
+    tmux(f"rename-session -t {staging} {session}", socket)
+    log(f"OK: handed off. Attach: tmux -L {socket} attach -t {session}")
+    log(f"Logs: tail -f {logdir / f'tmux-{session}.log'}")
+
+def start_foreground(dir_path: Path, venv_py: Path, session: str, socket: str, stop_timeout: float = 30):
+    kill_existing_instances(dir_path, session, socket, stop_timeout)
 
     os.chdir(dir_path)
     log("Starting foreground. Ctrl-C to stop.")
@@ -182,6 +252,11 @@ def main():
     ap.add_argument("--branch", default="main")
     ap.add_argument("--session", default="hll-admin")
     ap.add_argument("--socket", default="hll")
+    ap.add_argument("--handoff", action="store_true",
+                    help="zero-downtime redeploy: start the new instance in standby, then drain the old one (implies -d)")
+    ap.add_argument("--ready-timeout", type=float, default=180, help="max wait for the standby instance in --handoff mode")
+    ap.add_argument("--stop-timeout", type=float, default=30,
+                    help="seconds the running bot gets to drain and exit after SIGTERM (keep > shutdown.timeout_seconds)")
     args = ap.parse_args()
 
     dir_path = Path(args.dir).expanduser().resolve()
@@ -198,10 +273,12 @@ def main():
 
     (dir_path / "logs").mkdir(exist_ok=True)
 
-    if args.detached:
-        start_detached(dir_path, venv_py, args.session, args.socket)
+    if args.handoff:
+        start_handoff(dir_path, venv_py, args.session, args.socket, args.stop_timeout, args.ready_timeout)
+    elif args.detached:
+        start_detached(dir_path, venv_py, args.session, args.socket, args.stop_timeout)
     else:
-        start_foreground(dir_path, venv_py, args.session, args.socket)
+        start_foreground(dir_path, venv_py, args.session, args.socket, args.stop_timeout)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,76 @@
+﻿import gzip
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from crcon.capture import FrameRecorder, capture_segments, read_frames, segment_order
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURES = ROOT / 'benchmarks' / 'fixtures'
+
+def segment_names(directory):
+    return [p.name for p in capture_segments([directory])]
+
+def test_rotates_on_size_and_keeps_newest_segments(tmp_path):
+    recorder = FrameRecorder(tmp_path, segment_bytes=200, segment_seconds=3600, keep_segments=3)
+    frames = [(1_700_000_000 + i * 0.01, json.dumps({'n': i, 'pad': 'x' * 60})) for i in range(20)]
+    for received_at, data in frames:
+        recorder.write(data, received_at)
+    recorder.close()
+
+    # Every rotation happened within the same second: -<n> suffixes, pruned to 3
+    names = segment_names(tmp_path)
+    assert len(names) == 3
+    assert names == sorted(names, key=lambda n: segment_order(Path(n)))
+    replayed = list(read_frames([tmp_path]))
+    assert replayed == frames[-len(replayed):]
+    assert recorder.frames == 20 and recorder.dropped == 0
+
+def test_rotates_on_age(tmp_path):
+    recorder = FrameRecorder(tmp_path, segment_bytes=1 << 20, segment_seconds=60)
+    start = 1_700_000_000
+    for offset in (0, 30, 61, 90, 125):
+        recorder.write(f'frame {offset}', start + offset)
+    recorder.close()
+    segments = capture_segments([tmp_path])
+    assert len(segments) == 3
+    assert [t - start for t, _ in read_frames([tmp_path])] == [0, 30, 61, 90, 125]
+
+def test_segment_order_puts_same_second_rotations_after_their_base():
+    names = ['ws-20260101-120000-10.jsonl.gz', 'ws-20260101-120000-2.jsonl.gz',
+             'ws-20260101-120001.jsonl.gz', 'ws-20260101-120000.jsonl.gz']
+    assert sorted(names, key=lambda n: segment_order(Path(n))) == [
+        'ws-20260101-120000.jsonl.gz', 'ws-20260101-120000-2.jsonl.gz',
+        'ws-20260101-120000-10.jsonl.gz', 'ws-20260101-120001.jsonl.gz']
+
+def test_read_frames_skips_a_partial_last_line(tmp_path):
+    with gzip.open(tmp_path / 'ws-20260101-120000.jsonl.gz', 'wt', encoding='utf-8') as file:
+        file.write(json.dumps({'t': 1.0, 'data': 'a'}) + "\n")
+        file.write('{"t": 2.0, "da')
+    assert list(read_frames([tmp_path])) == [(1.0, 'a')]
+
+def test_full_queue_drops_frames_instead_of_blocking(tmp_path):
+    recorder = FrameRecorder(tmp_path, max_queued=1)
+    # Writer thread not started yet: fill the queue directly
+    recorder._queue.put_nowait((0.0, 'held'))
+    recorder._thread = object()
+    recorder.write('dropped')
+    assert recorder.dropped == 1
+
+def test_rotated_capture_replays_to_the_expected_counts(tmp_path):
+    sample = FIXTURES / 'ws_capture_sample.jsonl.gz'
+    recorder = FrameRecorder(tmp_path, segment_bytes=64 * 1024, segment_seconds=300)
+    frames = list(read_frames([sample]))
+    for received_at, data in frames:
+        recorder.write(data, received_at)
+    recorder.close()
+    assert len(capture_segments([tmp_path])) > 1
+    assert list(read_frames([tmp_path])) == frames
+
+    result = subprocess.run(
+        [sys.executable, str(ROOT / 'benchmarks' / 'replay_capture.py'), str(tmp_path),
+         '--check', str(FIXTURES / 'ws_capture_sample_expected.json')],
+        capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert 'counts match' in result.stdout
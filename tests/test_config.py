@@ -0,0 +1,76 @@
+﻿import os
+
+import pytest
+
+from utils.config import Config
+
+CONFIG = """\
+discord:
+  token: ${BOT_TOKEN}
+  admin_channel_id: ${ADMIN_CHANNEL}
+crcon:
+  base_url: http://crcon.local
+  profile_timeout_seconds: 10
+tickets:
+  triggers: [admin, "!admin"]
+"""
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    for name in ('BOT_TOKEN', 'ADMIN_CHANNEL', 'EXTRA'):
+        monkeypatch.delenv(name, raising=False)
+    config_file = tmp_path / 'config.yaml'
+    env_file = tmp_path / '.env'
+    config_file.write_text(CONFIG, encoding='utf-8')
+    env_file.write_text("BOT_TOKEN=from-file\nADMIN_CHANNEL=123\nEXTRA=1\n", encoding='utf-8')
+    yield config_file, env_file
+    # Variables exported from .env by Config are not undone by monkeypatch
+    for name in ('BOT_TOKEN', 'ADMIN_CHANNEL', 'EXTRA'):
+        os.environ.pop(name, None)
+
+def test_snapshot_is_typed(files):
+    config = Config(str(files[0]), str(files[1]))
+    assert config.get('discord.token') == 'from-file'
+    assert config.get('discord.admin_channel_id') == 123
+    assert config.get('tickets.triggers') == ('admin', '!admin')
+    assert config.get('crcon')['profile_timeout_seconds'] == 10
+
+def test_process_environment_wins_at_startup_and_on_reload(files, monkeypatch):
+    monkeypatch.setenv('BOT_TOKEN', 'from-shell')
+    config = Config(str(files[0]), str(files[1]))
+    assert config.get('discord.token') == 'from-shell'
+    files[1].write_text("BOT_TOKEN=edited\nADMIN_CHANNEL=456\n", encoding='utf-8')
+    assert config.reload()
+    assert config.get('discord.token') == 'from-shell'
+    assert config.get('discord.admin_channel_id') == 456
+
+def test_keys_removed_from_env_file_are_unset(files, monkeypatch):
+    monkeypatch.setenv('EXTRA', 'shell')
+    config = Config(str(files[0]), str(files[1]))
+    files[1].write_text("BOT_TOKEN=from-file\n", encoding='utf-8')
+    assert config.reload()
+    assert 'ADMIN_CHANNEL' not in os.environ
+    assert config.get('discord.admin_channel_id') is None
+    # Never owned by .env: left alone
+    assert os.environ['EXTRA'] == 'shell'
+
+def test_invalid_reload_keeps_the_previous_snapshot(files):
+    config = Config(str(files[0]), str(files[1]))
+    changes = []
+    config.on_reload(lambda snapshot, changed: changes.append(changed))
+    files[0].write_text(CONFIG.replace('profile_timeout_seconds: 10', 'profile_timeout_seconds: -1'), encoding='utf-8')
+    assert not config.reload()
+    files[1].write_text("ADMIN_CHANNEL=123\n", encoding='utf-8')
+    files[0].write_text(CONFIG, encoding='utf-8')
+    # Token removed from .env: required key missing, rejected
+    assert not config.reload()
+    assert config.get('discord.token') == 'from-file' and config.version == 1 and changes == []
+
+def test_valid_reload_reports_changed_keys(files):
+    config = Config(str(files[0]), str(files[1]))
+    changes = []
+    config.on_reload(lambda snapshot, changed: changes.append(changed))
+    files[0].write_text(CONFIG.replace('[admin, "!admin"]', '[aide]'), encoding='utf-8')
+    assert config.reload()
+    assert changes == [('tickets.triggers',)]
+    assert config.get('tickets.triggers') == ('aide',) and config.version == 2
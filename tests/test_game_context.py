@@ -0,0 +1,46 @@
+﻿import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from crcon.game_context import GameContextCache
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+class GameContextCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_leading_caller_cancelled(self):
+        calls = []
+
+        async def fetch(endpoint):
+            calls.append(endpoint)
+            await asyncio.sleep(0.2)
+            return {'endpoint': endpoint}
+
+        cache = GameContextCache(fetch, Config())
+        leader = asyncio.create_task(asyncio.wait_for(cache.get('get_gamestate'), 0.05))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get('get_gamestate'))
+        with self.assertRaises(asyncio.TimeoutError):
+            await leader
+        # The joined caller still gets the value, and the slow result is cached
+        self.assertEqual(await asyncio.wait_for(waiter, 1), {'endpoint': 'get_gamestate'})
+        self.assertEqual(await cache.get('get_gamestate'), {'endpoint': 'get_gamestate'})
+        self.assertEqual(calls, ['get_gamestate'])
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'coalesced': 1})
+
+    async def test_failure_reaches_every_caller(self):
+        async def fetch(endpoint):
+            await asyncio.sleep(0.01)
+            raise RuntimeError('down')
+
+        cache = GameContextCache(fetch, Config())
+        results = await asyncio.gather(cache.get('get_map'), cache.get('get_map'), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(cache._inflight, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+﻿import asyncio
+import sqlite3
+
+from aiohttp import web
+
+from crcon.client import CRCONClient
+from utils.lease import LeaderLease
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+def make_pair(tmp_path, ttl=0.6, renew=0.1):
+    path = str(tmp_path / 'lease.db')
+    return (LeaderLease(path, ttl=ttl, renew_interval=renew, owner='a'),
+            LeaderLease(path, ttl=ttl, renew_interval=renew, owner='b'))
+
+def test_only_one_holder_and_release_hands_over(tmp_path):
+    a, b = make_pair(tmp_path)
+    assert a.acquire() and a.held
+    assert not b.acquire() and b.holder() == 'a'
+    a.release()
+    assert b.acquire() and b.holder() == 'b'
+
+def test_standby_takes_over_a_stalled_leader_which_steps_down(tmp_path):
+    async def scenario():
+        a, b = make_pair(tmp_path)
+        lost = asyncio.Event()
+
+        async def on_lost():
+            lost.set()
+
+        assert a.acquire()
+        # Leader stalled: no heartbeat, so the lease expires and the standby takes it
+        await asyncio.wait_for(b.wait(poll_interval=0.05), 2)
+        assert b.holder() == 'b'
+        # The old leader's next renewal finds the lease taken and steps down
+        a.keep(on_lost)
+        await asyncio.wait_for(lost.wait(), 2)
+        assert not a.held
+
+        # Demoted, it waits again and takes the lease back once b releases it
+        b.release()
+        await asyncio.wait_for(a.wait(poll_interval=0.05), 2)
+        assert a.held and a.holder() == 'a'
+        a.release()
+
+    asyncio.run(scenario())
+
+def test_transient_renewal_errors_do_not_step_down(tmp_path):
+    async def scenario():
+        a, b = make_pair(tmp_path, ttl=1.0, renew=0.1)
+        assert a.acquire()
+        lost = []
+        failures = {'left': 3}
+        real = a.try_acquire
+
+        def flaky():
+            if failures['left']:
+                failures['left'] -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return real()
+
+        async def on_lost():
+            lost.append(True)
+
+        a.try_acquire = flaky
+        a.keep(on_lost)
+        await asyncio.sleep(0.8)
+        assert not lost and a.held and failures['left'] == 0
+        assert not b.acquire()
+        a.release()
+
+    asyncio.run(scenario())
+
+def test_renewals_failing_until_expiry_step_down(tmp_path):
+    async def scenario():
+        a, _ = make_pair(tmp_path, ttl=0.3, renew=0.1)
+        assert a.acquire()
+        lost = asyncio.Event()
+
+        def broken():
+            raise sqlite3.OperationalError('disk I/O error')
+
+        async def on_lost():
+            lost.set()
+
+        a.try_acquire = broken
+        a.keep(on_lost)
+        await asyncio.wait_for(lost.wait(), 2)
+        assert not a.held
+
+    asyncio.run(scenario())
+
+def test_demoted_client_holds_frames_until_the_next_takeover(tmp_path):
+    async def scenario():
+        sockets = []
+
+        async def status(request):
+            return web.json_response({'result': {'name': 'stub'}})
+
+        async def logs(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            sockets.append(ws)
+            async for _ in ws:
+                pass
+            return ws
+
+        app = web.Application()
+        app.router.add_get('/api/get_status', status)
+        app.router.add_get('/ws/logs', logs)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        client = CRCONClient(Config({
+            'crcon.base_url': f'http://127.0.0.1:{port}', 'crcon.api_token': 't',
+            'state.dir': str(tmp_path), 'crcon.tracing.enabled': False,
+        }))
+        dispatched = []
+
+        async def handle_ws_frame(raw, now=None):
+            dispatched.append(raw)
+            return True
+
+        client.handle_ws_frame = handle_ws_frame
+        try:
+            monitor = asyncio.create_task(client.start_monitoring())
+            client.open_dispatch_gate()
+            await asyncio.wait_for(client.streaming.wait(), 5)
+            await sockets[-1].send_str('leader frame')
+            await asyncio.sleep(0.1)
+            assert dispatched == ['leader frame']
+
+            await client.demote()
+            assert monitor.done() and not client.streaming.is_set() and not client.dispatch_gate.is_set()
+            # The new leader owns the cursor
+            assert not (tmp_path / 'ws_cursor.json').exists()
+
+            monitor = asyncio.create_task(client.start_monitoring())
+            await asyncio.wait_for(client.ws_connected.wait(), 5)
+            await sockets[-1].send_str('standby frame')
+            await asyncio.sleep(0.1)
+            assert dispatched == ['leader frame']
+            client.open_dispatch_gate()
+            await asyncio.wait_for(client.streaming.wait(), 5)
+            await asyncio.sleep(0.1)
+            assert dispatched == ['leader frame', 'standby frame']
+            await client.shutdown(2)
+        finally:
+            await client.close_session()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
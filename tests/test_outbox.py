@@ -0,0 +1,119 @@
+﻿import asyncio
+import threading
+
+from crcon.outbox import OutboundQueue
+from utils.state import StateStore
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+class FakeClient:
+    """send_messages_to_player fails the first `failures` calls, then delivers"""
+
+    def __init__(self, failures=0, roster=('Alpha', 'Bravo')):
+        self.failures = failures
+        self.roster = [{'name': name} for name in roster]
+        self.sent = []
+
+    async def send_messages_to_player(self, player_name, messages):
+        if self.failures:
+            self.failures -= 1
+            return 0
+        self.sent.extend((player_name, m) for m in messages)
+        return len(messages)
+
+    async def get_players(self):
+        return self.roster
+
+class RecordingStore(StateStore):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.save_threads = []
+
+    def save(self, name, data):
+        self.save_threads.append(threading.current_thread())
+        super().save(name, data)
+
+def store_threads_off_loop(store):
+    return store.save_threads and threading.main_thread() not in store.save_threads
+
+def make_queue(tmp_path, client, **config):
+    settings = {'outbound.retry_base_seconds': 0.05, 'outbound.retry_max_seconds': 0.1}
+    settings.update(config)
+    queue = OutboundQueue(client, RecordingStore(tmp_path), Config(settings))
+    results = []
+
+    async def on_result(job, delivered):
+        results.append((job['key'], delivered))
+
+    queue.on_result = on_result
+    return queue, results
+
+def test_failed_delivery_is_retried_with_backoff(tmp_path):
+    async def scenario():
+        client = FakeClient(failures=2)
+        queue, results = make_queue(tmp_path, client)
+        queue.start()
+        assert queue.enqueue('Alpha', ['un', 'deux'], key='k1')
+        assert not queue.enqueue('Alpha', ['un', 'deux'], key='k1')
+        assert await queue.drain(2)
+        await queue.stop()
+        assert client.sent == [('Alpha', 'un'), ('Alpha', 'deux')]
+        assert results == [('k1', True)]
+        assert queue.stats()['retries'] == 2
+        # Already delivered: a replayed key is not queued again
+        assert not queue.enqueue('Alpha', ['un'], key='k1')
+
+    asyncio.run(scenario())
+
+def test_player_who_left_is_dropped(tmp_path):
+    async def scenario():
+        client = FakeClient(failures=1, roster=('Bravo',))
+        queue, results = make_queue(tmp_path, client)
+        queue.start()
+        queue.enqueue('Alpha', ['parti ?'], key='k1')
+        assert await queue.drain(2)
+        await queue.stop()
+        assert results == [('k1', False)] and client.sent == []
+
+    asyncio.run(scenario())
+
+def test_spill_keeps_order_and_is_written_off_the_loop(tmp_path):
+    async def scenario():
+        client = FakeClient()
+        queue, results = make_queue(tmp_path, client, **{'outbound.max_in_memory': 2})
+        for i in range(6):
+            queue.enqueue('Alpha', [f'm{i}'], key=f'k{i}')
+        assert len(queue.jobs) == 2 and len(queue) == 6
+        await queue.flush_async()
+        assert queue.spill_path.exists()
+        assert store_threads_off_loop(queue.store)
+        queue.start()
+        assert await queue.drain(2)
+        await queue.stop()
+        assert client.sent == [('Alpha', f'm{i}') for i in range(6)]
+        assert not queue.spill_path.exists()
+
+    asyncio.run(scenario())
+
+def test_stop_persists_memory_and_spill_for_the_next_start(tmp_path):
+    async def enqueue_and_stop():
+        queue, _ = make_queue(tmp_path, FakeClient(), **{'outbound.max_in_memory': 2})
+        for i in range(5):
+            queue.enqueue('Bravo', [f'm{i}'], key=f'k{i}')
+        # Never started: stop() does the blocking final flush, spill buffer included
+        await queue.stop()
+
+    async def restart():
+        client = FakeClient()
+        queue, _ = make_queue(tmp_path, client, **{'outbound.max_in_memory': 2})
+        queue.load()
+        assert len(queue) == 5
+        queue.start()
+        assert await queue.drain(2)
+        await queue.stop()
+        return client.sent
+
+    asyncio.run(enqueue_and_stop())
+    assert asyncio.run(restart()) == [('Bravo', f'm{i}') for i in range(5)]
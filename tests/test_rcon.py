@@ -0,0 +1,157 @@
+﻿import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from crcon.client import CRCONClient
+from crcon.commands import RconCommands, quote_name, quote_text
+from crcon.rcon import RconConnection, RconError, RconPool, RconUnavailable
+from crcon.rcon_stub import StubRconServer
+
+class Config(dict):
+    def get(self, key, default=None):
+        return dict.get(self, key, default)
+
+PLAYERS = {'Alpha One': '76561198000000001', 'Bravo': '76561198000000002'}
+
+def test_quote_text_neutralises_quotes_and_control_characters():
+    assert quote_text('dit "stop"\nmerci\t!') == '"dit \'stop\' merci !"'
+    assert RconCommands.message_player_command('Bravo', 'a" "b') == 'message "Bravo" "a\' \'b"'
+
+def test_quote_name_rejects_unquotable_names():
+    assert quote_name('Alpha One') == '"Alpha One"'
+    for name in ('Evil" "x', 'line\nbreak', 'nul\x00'):
+        with pytest.raises(ValueError):
+            quote_name(name)
+
+def test_xor_framing_multipart_roster_across_reads():
+    async def scenario():
+        players = {f'Joueur {i:04d}': f'7656119800{i:07d}' for i in range(2000)}
+        server = StubRconServer(password='pw', players=players)
+        await server.start()
+        try:
+            conn = RconConnection(server.host, server.port, 'pw', timeout=2)
+            await conn.connect()
+            response = await conn.execute('get playerids', multipart=True)
+            await conn.close()
+        finally:
+            await server.stop()
+        # Larger than one read: the XOR offset must continue across chunks
+        assert len(response) > RconConnection.READ_SIZE
+        records = RconCommands.parse_players_response(response)
+        assert {r.name: r.player_id for r in records} == players
+
+    asyncio.run(scenario())
+
+def test_login_refused():
+    async def scenario():
+        server = StubRconServer(password='pw')
+        await server.start()
+        try:
+            conn = RconConnection(server.host, server.port, 'wrong', timeout=2)
+            with pytest.raises(RconError):
+                await conn.connect()
+        finally:
+            await server.stop()
+
+    asyncio.run(scenario())
+
+def test_pool_reconnects_after_dropped_connection():
+    async def scenario():
+        server = StubRconServer(password='pw', players=PLAYERS)
+        await server.start()
+        pool = RconPool(server.host, server.port, 'pw', size=1, timeout=2)
+        try:
+            assert await pool.message_player('Bravo', 'salut')
+            # Server side drop: the next command reconnects once and succeeds
+            pool._connections[0].writer.close()
+            assert await pool.message_player('Alpha One', 'encore')
+            assert server.messages == [('Bravo', 'salut'), ('Alpha One', 'encore')]
+            assert pool.failures == 0
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+def test_circuit_breaker_fails_fast_then_recovers():
+    async def scenario():
+        server = StubRconServer(password='pw', players=PLAYERS)
+        await server.start()
+        port = server.port
+        await server.stop()
+        pool = RconPool('127.0.0.1', port, 'pw', size=1, timeout=0.5, breaker_failures=2, breaker_seconds=0.3)
+        for _ in range(2):
+            with pytest.raises(RconError):
+                await pool.execute('get map')
+        assert pool.circuit_open
+        started = time.monotonic()
+        with pytest.raises(RconUnavailable):
+            await pool.execute('get map')
+        assert time.monotonic() - started < 0.05
+
+        # Server back after the window: the trial command closes the circuit
+        server = StubRconServer(password='pw', players=PLAYERS, port=port)
+        await server.start()
+        try:
+            await asyncio.sleep(0.35)
+            assert await pool.execute('get map') == server.map_name
+            assert not pool.circuit_open and pool.failures == 0
+        finally:
+            await pool.close()
+            await server.stop()
+
+    asyncio.run(scenario())
+
+def test_http_fallback_when_rcon_is_down_or_name_unquotable():
+    async def scenario():
+        posted = []
+
+        async def live_game_stats(request):
+            stats = [{'player': name, 'player_id': pid} for name, pid in PLAYERS.items()]
+            stats.append({'player': 'Quote"Name', 'player_id': '76561198000000003'})
+            return web.json_response({'result': {'stats': stats}})
+
+        async def message_player(request):
+            posted.append(await request.json())
+            return web.json_response({'result': True, 'failed': False})
+
+        app = web.Application()
+        app.router.add_get('/api/get_live_game_stats', live_game_stats)
+        app.router.add_post('/api/message_player', message_player)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        http_port = site._server.sockets[0].getsockname()[1]
+
+        # The roster (read over RCON) includes a name RCON cannot quote
+        server = StubRconServer(password='pw', players={**PLAYERS, 'Quote"Name': '76561198000000003'})
+        await server.start()
+        client = CRCONClient(Config({
+            'crcon.base_url': f'http://127.0.0.1:{http_port}', 'crcon.api_token': 't',
+            'state.dir': '/tmp/hll-test-state', 'crcon.tracing.enabled': False,
+            'rcon.enabled': True, 'rcon.host': server.host, 'rcon.port': server.port,
+            'rcon.password': 'pw', 'rcon.timeout_seconds': 0.5, 'rcon.breaker_failures': 1,
+        }))
+        try:
+            assert await client.send_message_to_player('Bravo', 'via rcon')
+            assert server.messages == [('Bravo', 'via rcon')] and posted == []
+
+            # A name RCON cannot quote goes through the CRCON API
+            assert await client.send_message_to_player('Quote"Name', 'via http')
+            assert [p['player_name'] for p in posted] == ['Quote"Name']
+
+            # RCON down: the breaker opens and sends fall back to HTTP
+            await server.stop()
+            await client.rcon_pool.close()
+            assert await client.send_message_to_player('Alpha One', 'repli')
+            assert client.rcon_pool.circuit_open
+            assert posted[-1]['message'] == 'repli'
+        finally:
+            await client.close_session()
+            await server.stop()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+﻿import asyncio
+import threading
+import time
+
+from utils.scheduler import TimerScheduler
+from utils.state import StateStore
+
+class RecordingStore(StateStore):
+    """StateStore that notes which thread each save ran on"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.save_threads = []
+
+    def save(self, name, data):
+        self.save_threads.append(threading.current_thread())
+        super().save(name, data)
+
+def test_flush_loop_saves_off_the_event_loop(tmp_path):
+    async def scenario():
+        store = RecordingStore(tmp_path)
+        scheduler = TimerScheduler(store, 'timers', flush_interval=0.05)
+        scheduler.start()
+        scheduler.schedule_in('reping:Bravo', 'reping', 600, player_name='Bravo', count=1)
+        await asyncio.sleep(0.2)
+        assert store.save_threads
+        assert threading.main_thread() not in store.save_threads
+        assert [t['key'] for t in store.load('timers')] == ['reping:Bravo']
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+def test_stop_flushes_changes_made_since_the_last_flush(tmp_path):
+    async def scenario():
+        store = StateStore(tmp_path)
+        scheduler = TimerScheduler(store, 'timers', flush_interval=3600)
+        scheduler.start()
+        scheduler.schedule_in('nudge:Alpha', 'nudge', 600, player_name='Alpha')
+        await scheduler.stop()
+        assert store.load('timers')[0]['data'] == {'player_name': 'Alpha'}
+
+    asyncio.run(scenario())
+
+def test_restored_timers_keep_deadlines_and_overdue_ones_fire(tmp_path):
+    store = StateStore(tmp_path)
+    deadline = time.time() + 600
+    store.save('timers', [
+        {'key': 'inactivity:Bravo', 'kind': 'inactivity', 'deadline': deadline, 'data': {'player_name': 'Bravo', 'quiet': True}},
+        {'key': 'reping:Alpha', 'kind': 'reping', 'deadline': time.time() - 5, 'data': {'player_name': 'Alpha', 'count': 2}},
+        {'key': 'broken', 'kind': 'reping'},
+    ])
+
+    async def scenario():
+        fired = []
+
+        async def on_reping(key, player_name, count):
+            fired.append((key, player_name, count))
+
+        scheduler = TimerScheduler(store, 'timers', flush_interval=3600)
+        scheduler.register('reping', on_reping)
+        scheduler.load()
+        assert scheduler.pending('inactivity:Bravo') == deadline
+        assert scheduler.data('inactivity:Bravo') == {'player_name': 'Bravo', 'quiet': True}
+        assert scheduler.pending('broken') is None
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return fired
+
+    assert asyncio.run(scenario()) == [('reping:Alpha', 'Alpha', 2)]
+    assert [t['key'] for t in store.load('timers')] == ['inactivity:Bravo']